@@ -0,0 +1,87 @@
+import argparse, csv, os, sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.harness import time_avg
+from utils.workloads import WORKLOAD_PRESETS, generate_workload
+from src.task3_topk.topk_kdtree import find_topk_pairs_baseline
+from src.task3_topk.dualtree_topk import find_topk_pairs_dualtree
+from src.task3_topk.topk_approx import find_topk_pairs_approx
+
+# Speed against accuracy of the (1 + epsilon)-approximate top-k. The reference
+# is the exact find_topk_pairs_baseline while all pairs are affordable and
+# the exact dual-tree walk it relaxes above that. Accuracy is the worst ratio of the
+# i-th reported distance to the true i-th one (at most 1 + epsilon) and the
+# recall, the share of reported pairs no farther than the true k-th distance,
+# which counts any of the pairs tied there as a true one.
+
+BASELINE_MAX_N = 2_000
+
+def quality(found, exact):
+    ratios = [f[0] / e[0] if e[0] > 0 else (1.0 if f[0] == 0 else float("inf")) for f, e in zip(found, exact)]
+    kth = exact[-1][0] * (1 + 1e-12) if exact else 0.0
+    recall = sum(d <= kth for d, _ in found) / len(exact) if exact else 1.0
+    return max(ratios, default=1.0), recall
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Speed and accuracy of the approximate top-k closest pairs")
+    parser.add_argument("--n", default="1000,2000,10000,100000,1000000", help="comma-separated point counts")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--epsilon", default="0,0.05,0.1,0.5,1", help="comma-separated epsilons")
+    parser.add_argument("--workload", choices=list(WORKLOAD_PRESETS), default="uniform")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+    epsilons = [float(e) for e in args.epsilon.split(",") if e]
+
+    os.makedirs(os.path.join(ROOT, "results"), exist_ok=True)
+    os.makedirs(os.path.join(ROOT, "plots"), exist_ok=True)
+
+    rows = []
+    for n in [int(n) for n in args.n.split(",") if n]:
+        dronz = generate_workload(args.workload, n, dims=3, seed=args.seed).to_points()
+        exact_fn = find_topk_pairs_baseline if n <= BASELINE_MAX_N else find_topk_pairs_dualtree
+        reference = "baseline" if n <= BASELINE_MAX_N else "dualtree"
+        exact = exact_fn(list(dronz), args.k)
+        # the exact engines sort their input in place, so each run gets a copy
+        exact_t = time_avg(lambda: exact_fn(list(dronz), args.k), repeats=args.repeats)
+        print(f"n={n:>8} {reference:>9}={exact_t:.6f}s")
+        for eps in epsilons:
+            found = find_topk_pairs_approx(list(dronz), args.k, eps)
+            approx_t = time_avg(lambda: find_topk_pairs_approx(list(dronz), args.k, eps), repeats=args.repeats)
+            worst, recall = quality(found, exact)
+            rows.append((n, args.k, eps, reference, exact_t, approx_t, exact_t / approx_t, worst, recall))
+            print(f"           epsilon={eps:<5} approx={approx_t:.6f}s  speedup={exact_t / approx_t:>7.2f}x  "
+                  f"max ratio={worst:.4f}  recall={recall:.2f}")
+
+    out_csv = os.path.join(ROOT, "results", "approx_times.csv")
+    with open(out_csv, "w", newline="") as f:
+        w = csv.writer(f)
+        w.writerow(["n", "k", "epsilon", "reference", "exact_seconds", "approx_seconds", "speedup",
+                    "max_distance_ratio", "recall"])
+        w.writerows(rows)
+
+    import matplotlib.pyplot as plt
+    fig, (ax_speed, ax_recall) = plt.subplots(1, 2, figsize=(12, 4.5))
+    for n in sorted({r[0] for r in rows}):
+        series = [r for r in rows if r[0] == n]
+        ax_speed.plot([r[2] for r in series], [r[6] for r in series], marker="o", label=f"n={n} vs {series[0][3]}")
+        ax_recall.plot([r[2] for r in series], [r[8] for r in series], marker="o", label=f"n={n}")
+    ax_speed.set_ylabel("Speedup over exact")
+    ax_recall.set_ylabel("Recall of the true top-k")
+    for ax in (ax_speed, ax_recall):
+        ax.set_xlabel("epsilon")
+        ax.grid(True)
+    ax_speed.legend(fontsize="small")
+    fig.suptitle(f"Task 3 (3D): approximate top-{args.k} pairs, {args.workload} workload")
+
+    out_png = os.path.join(ROOT, "plots", "approx_times.png")
+    fig.savefig(out_png, dpi=200, bbox_inches="tight")
+    plt.close(fig)
+
+    print(f"\nSaved: {out_csv}")
+    print(f"Saved: {out_png}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+import os, sys, csv
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.harness import time_avg
+from utils.data_generator import generate_drone_points_3d as generate_dronz_3d
+from src.task2_3d.kdtree_3d import KDTree3D
+from src.task2_3d.flat_kdtree_3d import FlatKDTree3D
+
+# Build-only timings: per-level sort (the original build) vs one presort per axis
+BUILDERS = [
+    ("KDTree3D sort", lambda dronz: KDTree3D(list(dronz))),
+    ("KDTree3D presort", lambda dronz: KDTree3D(list(dronz), build="presort")),
+    ("FlatKDTree3D sort", lambda dronz: FlatKDTree3D(dronz)),
+    ("FlatKDTree3D presort", lambda dronz: FlatKDTree3D(dronz, build="presort")),
+    ("FlatKDTree3D presort leaf=16", lambda dronz: FlatKDTree3D(dronz, build="presort", leaf_size=16)),
+]
+
+def main():
+    os.makedirs(os.path.join(ROOT, "results"), exist_ok=True)
+    os.makedirs(os.path.join(ROOT, "plots"), exist_ok=True)
+
+    N_BUILD = [100_000, 1_000_000, 10_000_000]
+
+    SEED = 42
+    REPEATS = 1
+
+    rows = []
+    for n in N_BUILD:
+        dronz = generate_dronz_3d(n, bound=1000, seed=SEED)
+        sort_t = None
+        for name, build in BUILDERS:
+            build_t = time_avg(build, dronz, repeats=REPEATS)
+            if name.endswith(" sort"):
+                sort_t = build_t
+            speedup = sort_t / build_t if sort_t else ""
+            rows.append((n, name, build_t, speedup))
+            print(f"n={n:>8}  {name:<30} build={build_t:.3f}s  speedup={speedup if speedup == '' else f'{speedup:.2f}x'}")
+
+    out_csv = os.path.join(ROOT, "results", "build_times.csv")
+    with open(out_csv, "w", newline="") as f:
+        w = csv.writer(f)
+        w.writerow(["n", "builder", "build_seconds", "speedup_vs_sort"])
+        w.writerows(rows)
+
+    import matplotlib.pyplot as plt
+    plt.figure()
+
+    for name, _ in BUILDERS:
+        ns = [r[0] for r in rows if r[1] == name]
+        ts = [r[2] for r in rows if r[1] == name]
+        plt.plot(ns, ts, marker="o", label=name)
+
+    plt.xscale("log")
+    plt.yscale("log")
+    plt.xlabel("Number of dronz (n)")
+    plt.ylabel("Build time (seconds)")
+    plt.title("KD-tree build: per-level sort vs presort")
+    plt.grid(True)
+    plt.legend(fontsize=8)
+
+    out_png = os.path.join(ROOT, "plots", "build_times.png")
+    plt.savefig(out_png, dpi=200, bbox_inches="tight")
+    plt.close()
+
+    print(f"\nSaved: {out_csv}")
+    print(f"Saved: {out_png}")
+
+if __name__ == "__main__":
+    main()
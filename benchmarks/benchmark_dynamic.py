@@ -0,0 +1,184 @@
+import argparse, csv, os, sys, time
+from contextlib import nullcontext
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.harness import percentile
+from src.common.instrumentation import collect_stats
+from utils.workloads import WORKLOAD_PRESETS, generate_workload
+from src.task4_dynamic.dynamic_kdtree import DynamicDrones3D
+
+# The real-time loop DynamicDrones3D is for: every frame moves a fraction of the
+# fleet, either as one batch_random_walk or one update_drone_point per drone, and
+# queries arrive at a fixed rate in between. Every call is timed on its own, and
+# rebuild_index is wrapped so the rebuilds that land inside an update or a query
+# are timed as pauses. Background rebuilds run off the caller's thread and only
+# show up in the latencies, and with --stats in the snapshot build counter.
+
+def _timed_rebuilds(drones, pauses):
+    rebuild = drones.rebuild_index
+
+    def timed():
+        t0 = time.perf_counter()
+        rebuild()
+        pauses.append(time.perf_counter() - t0)
+    drones.rebuild_index = timed
+
+def _drive(drones, points, fraction, step, query_rate, frames, k, update_mode, query, seed):
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    moved_per_frame = min(len(points), max(1, int(len(points) * fraction)))
+    update_times, query_times = [], []
+    updates = 0
+    owed_queries = 0.0
+    for frame in range(frames):
+        if update_mode == "batch":
+            t0 = time.perf_counter()
+            drones.batch_random_walk(fraction=fraction, step=step, seed=seed * 1_000_003 + frame)
+            update_times.append(time.perf_counter() - t0)
+        else:
+            for slot in rng.choice(len(points), size=moved_per_frame, replace=False).tolist():
+                # drones.points keeps the slots of the list it was built from
+                current = drones.points[slot]
+                coords = [c + delta for c, delta in zip(current[1:], rng.uniform(-step, step, 3).tolist())]
+                t0 = time.perf_counter()
+                drones.update_drone_point(current[0], coords)
+                update_times.append(time.perf_counter() - t0)
+        updates += moved_per_frame
+
+        owed_queries += query_rate
+        while owed_queries >= 1:
+            owed_queries -= 1
+            t0 = time.perf_counter()
+            drones.current_topk(k) if query == "topk" else drones.current_closest()
+            query_times.append(time.perf_counter() - t0)
+    drones.wait_for_rebuild()
+    return update_times, query_times, updates
+
+def simulate(points, index, rebuild_threshold, fraction, step, query_rate, frames, k=10, update_mode="batch",
+             query="topk", seed=42, stats=False):
+    drones = DynamicDrones3D(points, rebuild_threshold=rebuild_threshold, index=index)
+    drones.current_topk(k)  # the first query builds the caches; not part of the steady state
+    pauses = []
+    _timed_rebuilds(drones, pauses)
+
+    t_start = time.perf_counter()
+    with collect_stats() if stats else nullcontext() as counters:
+        update_times, query_times, updates = _drive(
+            drones, points, fraction, step, query_rate, frames, k, update_mode, query, seed
+        )
+    wall = time.perf_counter() - t_start
+
+    update_total = sum(update_times)
+    return {
+        "updates_per_second": updates / update_total if update_total else float("inf"),
+        "update_p50": percentile(update_times, 0.50),
+        "update_p99": percentile(update_times, 0.99),
+        "update_max": max(update_times),
+        "query_p50": percentile(query_times, 0.50) if query_times else "",
+        "query_p99": percentile(query_times, 0.99) if query_times else "",
+        "query_p999": percentile(query_times, 0.999) if query_times else "",
+        "query_max": max(query_times) if query_times else "",
+        "rebuilds": len(pauses),
+        "rebuilds_per_1k_updates": 1000 * len(pauses) / updates,
+        "pause_mean": sum(pauses) / len(pauses) if pauses else 0.0,
+        "pause_max": max(pauses) if pauses else 0.0,
+        "pause_total": sum(pauses),
+        "wall_seconds": wall,
+        **({f"stat:{name}": value for name, value in counters.counters.items()} if stats else {}),
+    }
+
+def _floats(text):
+    return [float(item) for item in text.split(",") if item]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Update throughput, query latency and rebuild pauses of DynamicDrones3D")
+    parser.add_argument("--n", type=int, default=10_000)
+    parser.add_argument("--frames", type=int, default=100)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--workload", choices=list(WORKLOAD_PRESETS), default="uniform")
+    parser.add_argument("--index", default="rebuild,logarithmic,background", help="comma-separated index modes")
+    parser.add_argument("--rebuild-threshold", type=_floats, default=[25, 100, 400, 1600, 6400])
+    parser.add_argument("--fraction", type=_floats, default=[0.001, 0.01], help="share of drones moved per frame")
+    parser.add_argument("--step", type=_floats, default=[1.0], help="largest move per axis and frame")
+    parser.add_argument("--query-rate", type=_floats, default=[1.0], help="queries per frame, may be fractional")
+    parser.add_argument("--update-mode", choices=("batch", "single"), default="batch")
+    parser.add_argument("--query", choices=("topk", "closest"), default="topk")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--stats", action="store_true", help="add the search counters of every run to the CSV")
+    args = parser.parse_args(argv)
+
+    os.makedirs(os.path.join(ROOT, "results"), exist_ok=True)
+    os.makedirs(os.path.join(ROOT, "plots"), exist_ok=True)
+
+    dronz = generate_workload(args.workload, args.n, dims=3, seed=args.seed).to_points()
+    rows = []
+    for index in args.index.split(","):
+        # logarithmic mode never rebuilds on a threshold, so one run covers it
+        thresholds = [None] if index == "logarithmic" else [int(t) for t in args.rebuild_threshold]
+        for threshold in thresholds:
+            for fraction in args.fraction:
+                for step in args.step:
+                    for rate in args.query_rate:
+                        stats = simulate(
+                            dronz, index, threshold or 50, fraction, step, rate, args.frames, k=args.k,
+                            update_mode=args.update_mode, query=args.query, seed=args.seed, stats=args.stats,
+                        )
+                        rows.append({"index": index, "rebuild_threshold": threshold if threshold else "",
+                                     "fraction": fraction, "step": step, "query_rate": rate, **stats})
+                        print(
+                            f"{index:>11} threshold={threshold if threshold else '—':>5} fraction={fraction:<6} "
+                            f"step={step:<4} rate={rate:<4} updates/s={stats['updates_per_second']:>10.0f} "
+                            f"query p50/p99/p99.9={_ms(stats['query_p50'])}/{_ms(stats['query_p99'])}/"
+                            f"{_ms(stats['query_p999'])}ms rebuilds={stats['rebuilds']} "
+                            f"pause max={stats['pause_max'] * 1000:.1f}ms"
+                        )
+
+    out_csv = os.path.join(ROOT, "results", "dynamic_times.csv")
+    with open(out_csv, "w", newline="") as f:
+        # counter columns differ between index modes
+        fieldnames = list(dict.fromkeys(name for row in rows for name in row))
+        w = csv.DictWriter(f, fieldnames=fieldnames, restval=0)
+        w.writeheader()
+        w.writerows(rows)
+
+    import matplotlib.pyplot as plt
+    fig, (ax_rate, ax_latency) = plt.subplots(1, 2, figsize=(12, 4.5))
+    for index in args.index.split(","):
+        for fraction in args.fraction:
+            series = [r for r in rows if r["index"] == index and r["fraction"] == fraction
+                      and r["step"] == args.step[0] and r["query_rate"] == args.query_rate[0]]
+            label = f"{index}, fraction={fraction}"
+            if index == "logarithmic":
+                # no threshold to sweep: drawn as a flat reference line
+                ax_rate.axhline(series[0]["updates_per_second"], linestyle="--", label=label)
+                if series[0]["query_p99"] != "":
+                    ax_latency.axhline(series[0]["query_p99"] * 1000, linestyle="--", label=label)
+                continue
+            xs = [r["rebuild_threshold"] for r in series]
+            ax_rate.plot(xs, [r["updates_per_second"] for r in series], marker="o", label=label)
+            if series and series[0]["query_p99"] != "":
+                ax_latency.plot(xs, [r["query_p99"] * 1000 for r in series], marker="o", label=label)
+    for ax, ylabel in ((ax_rate, "Sustained updates per second"), (ax_latency, "p99 query latency (ms)")):
+        ax.set_xscale("log")
+        ax.set_xlabel("rebuild_threshold")
+        ax.set_ylabel(ylabel)
+        ax.grid(True)
+    ax_rate.set_yscale("log")
+    ax_latency.legend(fontsize="small")
+    fig.suptitle(f"Task 4: DynamicDrones3D, n={args.n}, {args.query} queries, {args.update_mode} updates")
+
+    out_png = os.path.join(ROOT, "plots", "dynamic_times.png")
+    fig.savefig(out_png, dpi=200, bbox_inches="tight")
+    plt.close(fig)
+
+    print(f"\nSaved: {out_csv}")
+    print(f"Saved: {out_png}")
+
+def _ms(seconds):
+    return "—" if seconds == "" else f"{seconds * 1000:.2f}"
+
+if __name__ == "__main__":
+    main()
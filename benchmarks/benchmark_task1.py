@@ -1,11 +1,11 @@
-import os, sys, csv, time, math
-from statistics import mean
+import os, sys, csv, math
 
 ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.insert(0, ROOT)
 
-from utils.data_generator import generate_dronz_2d
-from src.task1_2d.closest_pair_dc import closest_pair_2d
+from benchmarks.harness import time_avg
+from utils.data_generator import generate_drone_points_2d as generate_dronz_2d
+from src.task1_2d.closest_pair_dc import find_closest_pair_2d as closest_pair_2d
 
 def baseline_bruteforce_2d(dronz):
     best = None
@@ -22,15 +22,6 @@ def baseline_bruteforce_2d(dronz):
                 best_d = d
     return best, best_d
 
-def time_avg(fn, dronz, repeats=3):
-    times = []
-    for _ in range(repeats):
-        t0 = time.perf_counter()
-        fn(dronz)
-        t1 = time.perf_counter()
-        times.append(t1 - t0)
-    return mean(times)
-
 def main():
     os.makedirs(os.path.join(ROOT, "results"), exist_ok=True)
     os.makedirs(os.path.join(ROOT, "plots"), exist_ok=True)
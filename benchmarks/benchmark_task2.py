@@ -1,11 +1,15 @@
-import os, sys, csv, time, math
-from statistics import mean
+import os, sys, csv, math
 
 ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.insert(0, ROOT)
 
-from utils.data_generator import generate_dronz_3d
-from src.task2_3d.kdtree_3d import closest_pair_3d
+from benchmarks.harness import time_avg
+from utils.data_generator import generate_drone_store
+from src.task2_3d.kdtree_3d import find_closest_pair_3d
+
+def closest_pair_3d(dronz):
+    # a PointStore is read in place, so 10M drones never become tuples
+    return find_closest_pair_3d(dronz, method="flat_kdtree")
 
 def baseline_bruteforce_3d(dronz):
     best = None
@@ -23,15 +27,6 @@ def baseline_bruteforce_3d(dronz):
                 best_d2 = d2
     return best, math.sqrt(best_d2)
 
-def time_avg(fn, dronz, repeats=3):
-    times = []
-    for _ in range(repeats):
-        t0 = time.perf_counter()
-        fn(dronz)
-        t1 = time.perf_counter()
-        times.append(t1 - t0)
-    return mean(times)
-
 def main():
     os.makedirs(os.path.join(ROOT, "results"), exist_ok=True)
     os.makedirs(os.path.join(ROOT, "plots"), exist_ok=True)
@@ -44,12 +39,12 @@ def main():
 
     rows = []
     for n in N_OPT:
-        dronz = generate_dronz_3d(n, bound=1000, seed=SEED)
+        dronz = generate_drone_store(n, dims=3, bound=1000, seed=SEED)
 
         opt_t = time_avg(closest_pair_3d, dronz, repeats=REPEATS)
         base_t = ""
         if n in N_BASE:
-            base_t = time_avg(baseline_bruteforce_3d, dronz, repeats=REPEATS)
+            base_t = time_avg(baseline_bruteforce_3d, dronz.to_points(), repeats=REPEATS)
 
         rows.append((n, base_t, opt_t))
         print(f"n={n:>8}  baseline={base_t if base_t!='' else '—':>10}  optimized={opt_t:.6f}s")
@@ -65,7 +60,7 @@ def main():
     opt = [r[2] for r in rows]
 
     plt.figure()
-    plt.plot(ns, opt, marker="o", label="Optimized (KD-tree)")
+    plt.plot(ns, opt, marker="o", label="Optimized (flat KD-tree)")
 
     ns_b = [r[0] for r in rows if r[1] != ""]
     b = [r[1] for r in rows if r[1] != ""]
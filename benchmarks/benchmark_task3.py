@@ -1,11 +1,11 @@
-import os, sys, csv, time, math, heapq
-from statistics import mean
+import os, sys, csv, math, heapq
 
 ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.insert(0, ROOT)
 
-from utils.data_generator import generate_dronz_3d
-from src.task3_topk.topk_kdtree import top_k_pairs
+from benchmarks.harness import time_avg
+from utils.data_generator import generate_drone_points_3d as generate_dronz_3d
+from src.task3_topk.topk_kdtree import find_top_k_pairs as top_k_pairs
 
 def baseline_topk_allpairs(dronz, k):
     pairs = []
@@ -19,15 +19,6 @@ def baseline_topk_allpairs(dronz, k):
             pairs.append((d, (dronz[i], dronz[j])))
     return heapq.nsmallest(k, pairs, key=lambda x: (x[0], x[1][0][0], x[1][1][0]))
 
-def time_avg(fn, *args, repeats=3, **kwargs):
-    times = []
-    for _ in range(repeats):
-        t0 = time.perf_counter()
-        fn(*args, **kwargs)
-        t1 = time.perf_counter()
-        times.append(t1 - t0)
-    return mean(times)
-
 def main():
     os.makedirs(os.path.join(ROOT, "results"), exist_ok=True)
     os.makedirs(os.path.join(ROOT, "plots"), exist_ok=True)
@@ -0,0 +1,42 @@
+import os, sys, csv
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.harness import time_avg
+from utils.workloads import WORKLOAD_PRESETS, generate_workload
+from src.task2_3d.kdtree_3d import find_closest_pair_3d
+from src.task3_topk.topk_kdtree import find_top_k_pairs
+
+# Task 2 and task 3 engines on every workload preset, to show which distributions hurt them
+TASKS = [
+    ("task2_closest_pair", lambda dronz: find_closest_pair_3d(dronz)),
+    ("task3_topk_optimized", lambda dronz: find_top_k_pairs(dronz, 10, method="optimized")),
+    ("task3_topk_dualtree", lambda dronz: find_top_k_pairs(dronz, 10, method="dualtree")),
+]
+
+def main():
+    os.makedirs(os.path.join(ROOT, "results"), exist_ok=True)
+
+    N = [10_000, 100_000]
+    SEED = 42
+    REPEATS = 3
+
+    rows = []
+    for workload in WORKLOAD_PRESETS:
+        for n in N:
+            dronz = generate_workload(workload, n, dims=3, bound=1000, seed=SEED)
+            times = [time_avg(fn, dronz, repeats=REPEATS) for _, fn in TASKS]
+            rows.append((workload, n, *times))
+            print(f"{workload:>18}  n={n:>7}  " + "  ".join(f"{name}={t:.4f}s" for (name, _), t in zip(TASKS, times)))
+
+    out_csv = os.path.join(ROOT, "results", "workload_times.csv")
+    with open(out_csv, "w", newline="") as f:
+        w = csv.writer(f)
+        w.writerow(["workload", "n"] + [f"{name}_seconds" for name, _ in TASKS])
+        w.writerows(rows)
+
+    print(f"\nSaved: {out_csv}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+# Timing, memory and environment helpers shared by the benchmark scripts
+
+import gc, math, os, platform, subprocess, sys, time, tracemalloc
+from datetime import datetime, timezone
+from statistics import mean, median
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def time_avg(fn, *args, repeats=3, **kwargs):
+    # mean wall time of fn(*args, **kwargs) over repeats calls
+    times = []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        fn(*args, **kwargs)
+        t1 = time.perf_counter()
+        times.append(t1 - t0)
+    return mean(times)
+
+def percentile(values, fraction):
+    # nearest-rank percentile, so p95 of few runs is an observed run, not an interpolation
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+def measure(setup, repeats=5, warmup=1):
+    # setup() returns a fresh zero-argument callable for every run, so work
+    # that mutates its state (a dynamic index, an in-place sort) starts clean;
+    # only the call is timed
+    for _ in range(warmup):
+        setup()()
+    times = []
+    for _ in range(repeats):
+        run = setup()
+        gc.collect()
+        t0 = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - t0)
+    return {
+        "min": min(times),
+        "median": median(times),
+        "p95": percentile(times, 0.95),
+        "mean": mean(times),
+        "runs": times,
+    }
+
+def peak_rss_bytes():
+    # process-lifetime peak resident set size, or None where resource is missing
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+def peak_traced_bytes(setup):
+    # peak Python and NumPy heap allocated during one untimed run, tracemalloc
+    # slows the run down too much to time it at the same time
+    run = setup()
+    gc.collect()
+    tracemalloc.start()
+    try:
+        run()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def environment():
+    env = {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+    }
+    try:
+        import numpy as np
+        env["numpy"] = np.__version__
+    except ImportError:
+        env["numpy"] = None
+    try:
+        env["git_commit"] = subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        env["git_commit"] = None
+    return env
@@ -0,0 +1,205 @@
+"""One benchmark runner for every task engine, with JSON output and a regression gate.
+
+Sweeps engines x workloads x n (x k for the top-k engines), recording
+min / median / p95 wall time over repeated runs plus peak memory, and
+writes the results with environment metadata as JSON. Given a
+``--baseline`` JSON from an earlier run, every case that got slower (or
+hungrier) by more than ``--threshold`` is reported and the exit status is 1.
+
+    python benchmarks/run_benchmarks.py --engines task2.kdtree,task3.optimized \\
+        --n 10000,100000 --k 10 --workloads uniform,duplicates \\
+        --output results/benchmark.json --baseline results/baseline.json
+"""
+
+import argparse, json, os, sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.harness import environment, measure, peak_rss_bytes, peak_traced_bytes
+from src.common.instrumentation import collect_stats
+from utils.workloads import WORKLOAD_PRESETS, generate_workload
+
+DYNAMIC_FRAMES = 10  # random-walk frames per timed dynamic run, each followed by a top-k query
+
+
+def _task1(method):
+    def setup(points, k):
+        from src.task1_2d.closest_pair_dc import find_closest_pair_2d
+        return lambda: find_closest_pair_2d(points, method)
+    return setup
+
+def _task1_bruteforce(points, k):
+    from src.task1_2d.closest_pair_dc import closest_pair_bruteforce_2d
+    points = list(points)
+    return lambda: closest_pair_bruteforce_2d(points)
+
+def _task2(method):
+    def setup(points, k):
+        from src.task2_3d.kdtree_3d import find_closest_pair_3d
+        # KDTree3D sorts a tuple list in place, so every run gets its own copy
+        points = points if not isinstance(points, list) else list(points)
+        return lambda: find_closest_pair_3d(points, method)
+    return setup
+
+def _task3(method):
+    def setup(points, k):
+        from src.task3_topk.topk_kdtree import find_top_k_pairs
+        points = points if not isinstance(points, list) else list(points)
+        return lambda: find_top_k_pairs(points, k, method=method)
+    return setup
+
+def _task4(index):
+    def setup(points, k):
+        from src.task4_dynamic.dynamic_kdtree import DynamicDrones3D
+        drones = DynamicDrones3D(points, index=index)
+
+        def run():
+            for frame in range(DYNAMIC_FRAMES):
+                drones.batch_random_walk(fraction=0.01, seed=frame)
+                drones.current_topk(k)
+            drones.wait_for_rebuild()
+        return run
+    return setup
+
+
+# name -> (dims, uses k, largest n worth running or None, setup(points, k) -> callable)
+ENGINES = {
+    "task1.bruteforce": (2, False, 3_000, _task1_bruteforce),
+    "task1.dc": (2, False, None, _task1("dc")),
+    "task1.grid": (2, False, None, _task1("grid")),
+    "task1.numpy": (2, False, None, _task1("numpy")),
+    "task2.kdtree": (3, False, None, _task2("kdtree")),
+    "task2.flat_kdtree": (3, False, None, _task2("flat_kdtree")),
+    "task2.grid": (3, False, None, _task2("grid")),
+    "task3.exact": (3, True, 3_000, _task3("exact")),
+    "task3.optimized": (3, True, None, _task3("optimized")),
+    "task3.dualtree": (3, True, None, _task3("dualtree")),
+    "task4.rebuild": (3, True, None, _task4("rebuild")),
+    "task4.logarithmic": (3, True, None, _task4("logarithmic")),
+    "task4.background": (3, True, None, _task4("background")),
+}
+DEFAULT_ENGINES = "task1.dc,task1.numpy,task2.kdtree,task3.optimized,task3.dualtree,task4.rebuild"
+
+
+def _case_key(case):
+    return (case["engine"], case["workload"], case["n"], case["k"], case["input"])
+
+def run_suite(engines, workloads, ns, ks, repeats=5, warmup=1, seed=42, point_input="tuples", memory=True, stats=False,
+              log=print):
+    results, skipped = [], []
+    inputs = {}
+    for engine in engines:
+        dims, uses_k, max_n, setup = ENGINES[engine]
+        for workload in workloads:
+            for n in ns:
+                for k in (ks if uses_k else [None]):
+                    case = {"engine": engine, "workload": workload, "n": n, "k": k, "input": point_input}
+                    if max_n is not None and n > max_n:
+                        skipped.append({**case, "reason": f"n above {max_n}"})
+                        continue
+                    key = (workload, n, dims)
+                    if key not in inputs:
+                        store = generate_workload(workload, n, dims=dims, seed=seed)
+                        inputs[key] = store if point_input == "store" else store.to_points()
+                    points = inputs[key]
+                    case.update(measure(lambda: setup(points, k), repeats=repeats, warmup=warmup))
+                    if memory:
+                        case["peak_traced_bytes"] = peak_traced_bytes(lambda: setup(points, k))
+                    case["peak_rss_bytes"] = peak_rss_bytes()
+                    if stats:
+                        # one more untimed run, counting nodes visited, prunes and the like
+                        run = setup(points, k)
+                        with collect_stats() as collected:
+                            run()
+                        case["stats"] = collected.as_dict()
+                    results.append(case)
+                    log(
+                        f"{engine:>18} {workload:>16} n={n:>8} k={k if k is not None else '-':>4}  "
+                        f"min={case['min']:.6f}s  median={case['median']:.6f}s  p95={case['p95']:.6f}s"
+                        + (f"  peak={case['peak_traced_bytes'] / 2**20:.1f}MiB" if memory else "")
+                    )
+    return results, skipped
+
+def compare(results, baseline_results, threshold, metric="median", min_delta=0.001):
+    # a case regresses when it is more than threshold slower than its baseline
+    # (and by at least min_delta seconds, below which timings are noise), or
+    # traces more than threshold more peak memory
+    baseline = {_case_key(case): case for case in baseline_results}
+    regressions = []
+    for case in results:
+        old = baseline.get(_case_key(case))
+        if old is None:
+            continue
+        if case[metric] > old[metric] * (1 + threshold) and case[metric] - old[metric] >= min_delta:
+            regressions.append({**_identity(case), "measure": metric, "baseline": old[metric], "current": case[metric]})
+        old_peak, new_peak = old.get("peak_traced_bytes"), case.get("peak_traced_bytes")
+        if old_peak and new_peak and new_peak > old_peak * (1 + threshold):
+            regressions.append({**_identity(case), "measure": "peak_traced_bytes", "baseline": old_peak, "current": new_peak})
+    return regressions
+
+def _identity(case):
+    return {key: case[key] for key in ("engine", "workload", "n", "k", "input")}
+
+def _list(parse):
+    return lambda text: [parse(item) for item in text.split(",") if item]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--engines", type=_list(str), default=_list(str)(DEFAULT_ENGINES),
+                        help="comma-separated engine names, or 'all' (default: %(default)s)")
+    parser.add_argument("--workloads", type=_list(str), default=["uniform"], help="comma-separated workload presets")
+    parser.add_argument("--n", type=_list(int), default=[1_000, 10_000], help="comma-separated point counts")
+    parser.add_argument("--k", type=_list(int), default=[10], help="comma-separated k for top-k engines")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--input", choices=("tuples", "store"), default="tuples",
+                        help="hand engines tuple lists or a PointStore")
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc run per case")
+    parser.add_argument("--stats", action="store_true", help="record search counters from one extra run per case")
+    parser.add_argument("--output", default=os.path.join(ROOT, "results", "benchmark.json"))
+    parser.add_argument("--baseline", help="JSON from an earlier run to gate against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="allowed slowdown as a fraction (default: 0.10)")
+    parser.add_argument("--metric", choices=("min", "median", "p95"), default="median")
+    args = parser.parse_args(argv)
+
+    if args.engines == ["all"]:
+        args.engines = list(ENGINES)
+    for name, known in (("engine", ENGINES), ("workload", WORKLOAD_PRESETS)):
+        unknown = [item for item in getattr(args, name + "s") if item not in known]
+        if unknown:
+            parser.error(f"unknown {name}: {', '.join(unknown)}; choose from: {', '.join(known)}")
+
+    results, skipped = run_suite(
+        args.engines, args.workloads, args.n, args.k, repeats=args.repeats, warmup=args.warmup,
+        seed=args.seed, point_input=args.input, memory=not args.no_memory, stats=args.stats,
+    )
+    report = {
+        "environment": environment(),
+        "settings": {key: value for key, value in vars(args).items() if key not in ("output", "baseline")},
+        "results": results,
+        "skipped": skipped,
+    }
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline["results"], args.threshold, metric=args.metric)
+        report["baseline"] = {"path": args.baseline, "environment": baseline.get("environment")}
+        report["regressions"] = regressions
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nSaved: {args.output}")
+
+    for regression in regressions:
+        print(
+            f"REGRESSION {regression['engine']} {regression['workload']} n={regression['n']} k={regression['k']}: "
+            f"{regression['measure']} {regression['baseline']:.6g} -> {regression['current']:.6g}"
+        )
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,95 @@
+"""Opt-in counters for the search engines' hot paths.
+
+Instrumented code asks ``active_stats()`` once per call and, when it gets
+``None`` (the default), does nothing else but bump a few local integers,
+so the cost when nobody is collecting stays near zero. Inside a
+``collect_stats()`` block it flushes those integers into the block's
+``SearchStats``::
+
+    with collect_stats() as stats:
+        find_top_k_pairs(points, 10, method="optimized")
+    print(stats["kdtree.nodes_visited"], stats.as_dict())
+
+Collection is process-wide, not per thread, and the counters are not
+locked, so engines running on other threads or in worker processes are
+not reliably counted.
+"""
+
+from collections import Counter
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+_active: Optional["SearchStats"] = None
+
+
+class SearchStats:
+    """Counters, running maxima and per-level summaries filled while collecting.
+
+    ``counters`` are totals such as nodes visited. ``maxima`` keep the
+    largest value seen, such as the neighbour count a certification walk
+    reached. ``levels`` summarise a value per level of a recursion, such
+    as strip sizes per divide-and-conquer depth, as count, total and max.
+    Indexing looks a name up in counters, then maxima, and gives 0 if it
+    was never recorded.
+    """
+
+    def __init__(self):
+        self.counters: Counter = Counter()
+        self.maxima: Dict[str, float] = {}
+        self.levels: Dict[str, Dict[int, List[float]]] = {}
+
+    def add(self, name: str, amount: int = 1):
+        self.counters[name] += amount
+
+    def record_max(self, name: str, value: float):
+        if value > self.maxima.get(name, float("-inf")):
+            self.maxima[name] = value
+
+    def observe(self, name: str, level: int, value: float):
+        summary = self.levels.setdefault(name, {}).setdefault(level, [0, 0, value])
+        summary[0] += 1
+        summary[1] += value
+        if value > summary[2]:
+            summary[2] = value
+
+    def __getitem__(self, name: str):
+        if name in self.counters:
+            return self.counters[name]
+        return self.maxima.get(name, 0)
+
+    def as_dict(self) -> Dict[str, object]:
+        """Plain, JSON-ready copy of everything recorded."""
+        return {
+            "counters": dict(sorted(self.counters.items())),
+            "maxima": dict(sorted(self.maxima.items())),
+            "levels": {
+                name: {
+                    level: {"count": count, "total": total, "mean": total / count, "max": largest}
+                    for level, (count, total, largest) in sorted(per_level.items())
+                }
+                for name, per_level in sorted(self.levels.items())
+            },
+        }
+
+    def __repr__(self) -> str:
+        return f"SearchStats({self.as_dict()!r})"
+
+
+def active_stats() -> Optional[SearchStats]:
+    """The ``SearchStats`` being filled, or ``None`` when nothing is collecting."""
+    return _active
+
+
+@contextmanager
+def collect_stats(stats: Optional[SearchStats] = None) -> Iterator[SearchStats]:
+    """Collect into ``stats`` (a fresh one by default) for the duration of the block.
+
+    Blocks nest; the inner one collects alone until it exits.
+    """
+    global _active
+    previous = _active
+    _active = stats if stats is not None else SearchStats()
+    try:
+        yield _active
+    finally:
+        _active = previous
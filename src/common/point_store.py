@@ -0,0 +1,95 @@
+"""Drone points kept as contiguous id and coordinate arrays instead of a list of tuples."""
+
+from itertools import chain
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+
+class PointStore:
+    """``n`` drone points as an ``ids`` int64 array and an (n, dims) float64 ``coordinates`` array (needs NumPy).
+
+    Every task entry point accepts a store wherever it takes a list of
+    ``(id, x, y[, z])`` tuples. Engines that work on arrays read the two
+    arrays in place; the others get tuples built once at the call. Results
+    for a store name points by row instead of by tuple, so a pair is
+    ``(row_a, row_b)`` and ``store[row]`` gives the point back.
+
+    Slicing returns a store over views of the same arrays, indexing one row
+    returns its tuple, and iterating yields tuples, so a store also drops
+    into code written for the tuple lists.
+    """
+
+    def __init__(self, ids, coordinates):
+        import numpy as np
+
+        ids = np.asarray(ids, dtype=np.int64).reshape(-1)
+        coordinates = np.asarray(coordinates, dtype=np.float64)
+        if coordinates.ndim != 2 or coordinates.shape[0] != ids.size:
+            raise ValueError("coordinates must be an (n, dims) array with one row per id")
+        self.ids = ids
+        self.coordinates = coordinates
+        self._by_id = None
+
+    @classmethod
+    def from_points(cls, points: Sequence[Tuple], dims: Optional[int] = None) -> "PointStore":
+        """A store holding copies of ``(id, x, y[, z])`` tuples; ``dims`` defaults to the first tuple's."""
+        if dims is None:
+            dims = len(points[0]) - 1 if len(points) else 3
+        return cls(*point_arrays(points, dims))
+
+    @property
+    def dims(self) -> int:
+        return self.coordinates.shape[1]
+
+    def __len__(self) -> int:
+        return self.ids.size
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return PointStore(self.ids[index], self.coordinates[index])
+        return (int(self.ids[index]), *self.coordinates[index].tolist())
+
+    def __iter__(self) -> Iterator[Tuple]:
+        return zip(self.ids.tolist(), *self.coordinates.T.tolist())
+
+    def to_points(self) -> List[Tuple]:
+        """The points as the list of ``(id, x, y[, z])`` tuples the tuple engines take."""
+        return list(self)
+
+    def take(self, rows) -> "PointStore":
+        """A new store with the given rows, in that order."""
+        return PointStore(self.ids.take(rows), self.coordinates.take(rows, axis=0))
+
+    def rows(self, ids):
+        """Row of each id in ``ids`` as an int64 array; raises ``KeyError`` for an unknown id."""
+        import numpy as np
+
+        if self._by_id is None:
+            self._by_id = np.argsort(self.ids, kind="stable")
+        ids = np.asarray(ids, dtype=np.int64)
+        found = np.searchsorted(self.ids, ids, sorter=self._by_id).clip(0, max(self.ids.size - 1, 0))
+        rows = self._by_id[found] if self.ids.size else found
+        if ids.size and (self.ids.size == 0 or np.any(self.ids[rows] != ids)):
+            raise KeyError("unknown drone id")
+        return rows
+
+    def pair_rows(self, pair) -> Tuple[int, int]:
+        """``(row_a, row_b)`` for a pair of point tuples, the form results take for a store."""
+        row_a, row_b = self.rows([pair[0][0], pair[1][0]]).tolist()
+        return row_a, row_b
+
+
+def point_arrays(points, dims: int):
+    """``(ids, coordinates)`` arrays for a ``PointStore`` (its own arrays) or a list of tuples."""
+    import numpy as np
+
+    if isinstance(points, PointStore):
+        if points.dims != dims:
+            raise ValueError(f"expected {dims}D points, got {points.dims}D")
+        return points.ids, points.coordinates
+    table = np.fromiter(chain.from_iterable(points), dtype=np.float64, count=(dims + 1) * len(points))
+    table = table.reshape(-1, dims + 1)
+    if table.size == 0 or np.abs(table[:, 0]).max() < 2.0 ** 53:
+        ids = table[:, 0].astype(np.int64)
+    else:
+        ids = np.array([point[0] for point in points], dtype=np.int64)
+    return ids, table[:, 1:]
@@ -0,0 +1,105 @@
+"""Process pools whose workers read their inputs from NumPy arrays in shared memory."""
+
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Any, Callable, Dict, List, Sequence, Tuple
+
+_ALIGN = 64
+
+# Set in each worker by ``_attach``: views into the shared block, and a dict
+# where task functions keep per-worker state (a built index, say) between tasks.
+_worker_memory = None
+_worker_arrays: Dict[str, Any] = {}
+_worker_cache: Dict[str, Any] = {}
+
+
+def _open(name: str):
+    try:
+        # Python 3.13+: the creating process alone owns and unlinks the block.
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        return shared_memory.SharedMemory(name=name)
+
+
+def _views(buffer, layout):
+    import numpy as np
+
+    return {
+        key: np.ndarray(shape, dtype=np.dtype(dtype), buffer=buffer, offset=offset)
+        for key, dtype, shape, offset in layout
+    }
+
+
+def _attach(name: str, layout):
+    global _worker_memory, _worker_arrays
+    _worker_memory = _open(name)
+    _worker_arrays = _views(_worker_memory.buf, layout)
+    _worker_cache.clear()
+
+
+def _run(function: Callable, task: Tuple):
+    return function(_worker_arrays, _worker_cache, *task)
+
+
+class SharedArrayPool:
+    """A process pool over a fixed set of arrays copied once into shared memory.
+
+    ``map(function, tasks)`` runs ``function(arrays, cache, *task)`` in the
+    workers, where ``arrays`` are views of the shared copies under the same
+    keys (a write is seen by every worker, not by the caller's originals)
+    and ``cache`` is a per-worker dict that lives as long as the pool. Only
+    the task tuples and the results are pickled, so tasks should name slabs
+    of the arrays rather than carry data. ``function`` must be importable at
+    module level. Use as a context manager; the shared block is unlinked on
+    exit.
+    """
+
+    def __init__(self, arrays: Dict[str, Any], workers: int):
+        import numpy as np
+
+        if workers < 1:
+            raise ValueError("workers must be positive")
+        layout = []
+        offset = 0
+        for key, array in arrays.items():
+            array = np.ascontiguousarray(array)
+            layout.append((key, array.dtype.str, array.shape, offset))
+            offset += -(-array.nbytes // _ALIGN) * _ALIGN
+        self._memory = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+        try:
+            views = _views(self._memory.buf, layout)
+            for key, array in arrays.items():
+                views[key][...] = array
+            del views
+            self._pool = ProcessPoolExecutor(
+                max_workers=workers, initializer=_attach, initargs=(self._memory.name, layout)
+            )
+        except BaseException:
+            self._release()
+            raise
+
+    def map(self, function: Callable, tasks: Sequence[Tuple]) -> List:
+        """Results of ``function`` for every task, in task order."""
+        return list(self._pool.map(_run, [function] * len(tasks), tasks))
+
+    def _release(self):
+        self._memory.close()
+        self._memory.unlink()
+
+    def close(self):
+        try:
+            self._pool.shutdown()
+        finally:
+            self._release()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def slab_bounds(count: int, slabs: int) -> List[Tuple[int, int]]:
+    """Split ``range(count)`` into at most ``slabs`` contiguous, near-equal ``(start, stop)`` pieces."""
+    slabs = max(1, min(slabs, count))
+    return [(count * index // slabs, count * (index + 1) // slabs) for index in range(slabs)]
@@ -3,6 +3,8 @@
 import math
 from typing import List, Tuple
 
+from src.common.instrumentation import active_stats
+
 Point2D = Tuple[int, float, float]
 
 def compute_distance_2d(point_a: Point2D, point_b: Point2D) -> float:
@@ -32,6 +34,7 @@ def closest_pair_in_strip_2d(strip_points: List[Point2D], current_best_distance:
     best_pair = (None, None)
     best_distance = current_best_distance
     strip_count = len(strip_points)
+    compared = 0
     for first_index in range(strip_count):
         second_index = first_index + 1
 
@@ -54,15 +57,36 @@ def closest_pair_in_strip_2d(strip_points: List[Point2D], current_best_distance:
                 best_pair = (strip_points[first_index], strip_points[second_index])
                 best_distance = candidate_distance
             second_index += 1
+        compared += second_index - first_index - 1
+    stats = active_stats()
+    if stats is not None:
+        stats.add("closest_pair_2d.strip_comparisons", compared)
     return best_pair, best_distance
 
-def closest_pair_recursive_2d(points_by_x: List[Point2D], points_by_y: List[Point2D]):
-    point_count = len(points_by_x)
-    if point_count <= 3:
-        return closest_pair_bruteforce_2d(points_by_x)
-    mid_index = point_count // 2
-    left_sorted_x = points_by_x[:mid_index]
-    right_sorted_x = points_by_x[mid_index:]
+def pair_is_closer_2d(candidate, incumbent) -> bool:
+    # (pair, distance) results: strictly closer, or tied within 1e-12 with the smaller id pair
+    (candidate_a, candidate_b), candidate_distance = candidate
+    (incumbent_a, incumbent_b), incumbent_distance = incumbent
+    return candidate_distance < incumbent_distance - 1e-12 or (
+        abs(candidate_distance - incumbent_distance) <= 1e-12
+        and tuple(sorted((candidate_a[0], candidate_b[0]))) < tuple(sorted((incumbent_a[0], incumbent_b[0])))
+    )
+
+def merge_strip_2d(best, strip_points: List[Point2D], depth: int = 0):
+    # The combine step after the closer half is known: strip_points are the
+    # points within its distance of the split x, in y order.
+    stats = active_stats()
+    if stats is not None:
+        stats.observe("closest_pair_2d.strip_size", depth, len(strip_points))
+    strip = closest_pair_in_strip_2d(strip_points, best[1])
+    if strip[0][0] is not None and pair_is_closer_2d(strip, best):
+        return strip
+    return best
+
+def split_halves_2d(points_by_x: List[Point2D], points_by_y: List[Point2D]):
+    # Halves by position in x order; a y-order point goes left when its x is
+    # at most the split x, so points tied on it all go left.
+    mid_index = len(points_by_x) // 2
     split_x = points_by_x[mid_index][1]
     left_sorted_y = []
     right_sorted_y = []
@@ -71,31 +95,47 @@ def closest_pair_recursive_2d(points_by_x: List[Point2D], points_by_y: List[Poin
             left_sorted_y.append(point)
         else:
             right_sorted_y.append(point)
-    (left_a, left_b), left_distance = closest_pair_recursive_2d(left_sorted_x, left_sorted_y)
-    (right_a, right_b), right_distance = closest_pair_recursive_2d(right_sorted_x, right_sorted_y)
-    if left_distance < right_distance - 1e-12 or (
-        abs(left_distance - right_distance) <= 1e-12
-        and tuple(sorted((left_a[0], left_b[0]))) < tuple(sorted((right_a[0], right_b[0])))
-    ):
-        best_pair, best_distance = (left_a, left_b), left_distance
-    else:
-        best_pair, best_distance = (right_a, right_b), right_distance
-    strip_points = [point for point in points_by_y if abs(point[1] - split_x) < best_distance]
-    strip_pair, strip_distance = closest_pair_in_strip_2d(strip_points, best_distance)
-    if strip_pair[0] is not None and (
-        strip_distance < best_distance - 1e-12
-        or (
-            abs(strip_distance - best_distance) <= 1e-12
-            and tuple(sorted((strip_pair[0][0], strip_pair[1][0])))
-            < tuple(sorted((best_pair[0][0], best_pair[1][0])))
-        )
-    ):
-        return strip_pair, strip_distance
-    return best_pair, best_distance
+    return (points_by_x[:mid_index], left_sorted_y), (points_by_x[mid_index:], right_sorted_y), split_x
 
-def find_closest_pair_2d(drone_points: List[Point2D]):
+def closest_pair_recursive_2d(points_by_x: List[Point2D], points_by_y: List[Point2D], depth: int = 0):
+    point_count = len(points_by_x)
+    if point_count <= 3:
+        return closest_pair_bruteforce_2d(points_by_x)
+    (left_sorted_x, left_sorted_y), (right_sorted_x, right_sorted_y), split_x = split_halves_2d(points_by_x, points_by_y)
+    left = closest_pair_recursive_2d(left_sorted_x, left_sorted_y, depth + 1)
+    right = closest_pair_recursive_2d(right_sorted_x, right_sorted_y, depth + 1)
+    best = left if pair_is_closer_2d(left, right) else right
+    strip_points = [point for point in points_by_y if abs(point[1] - split_x) < best[1]]
+    return merge_strip_2d(best, strip_points, depth)
+
+def find_closest_pair_2d(drone_points: List[Point2D], method: str = "dc", workers: int = 1):
+    # workers > 1 fans the top of the recursion out to that many processes;
+    # see closest_pair_parallel_2d. A PointStore is read in place by the
+    # numpy method and turned into tuples for the others; either way its
+    # pair comes back as (row_a, row_b).
+    if method not in {"dc", "grid", "numpy"}:
+        raise ValueError("method must be one of: dc, grid, numpy")
+    if workers > 1 and method != "dc":
+        raise ValueError("workers > 1 needs method: dc")
     if len(drone_points) < 2:
         return None, float("inf")
+    if method == "numpy":
+        from src.task1_2d.closest_pair_numpy_2d import find_closest_pair_numpy_2d
+
+        return find_closest_pair_numpy_2d(drone_points)
+    from src.common.point_store import PointStore
+
+    if isinstance(drone_points, PointStore):
+        best_pair, best_distance = find_closest_pair_2d(drone_points.to_points(), method, workers)
+        return drone_points.pair_rows(best_pair), best_distance
+    if method == "grid":
+        from src.task1_2d.closest_pair_grid_2d import find_closest_pair_grid_2d
+
+        return find_closest_pair_grid_2d(drone_points)
+    if workers > 1:
+        from src.task1_2d.closest_pair_parallel_2d import find_closest_pair_parallel_2d
+
+        return find_closest_pair_parallel_2d(drone_points, workers)
     points_by_x = sorted(drone_points, key=lambda point: (point[1], point[2], point[0]))
     points_by_y = sorted(drone_points, key=lambda point: (point[2], point[1], point[0]))
     best_pair, best_distance = closest_pair_recursive_2d(points_by_x, points_by_y)
@@ -105,7 +145,6 @@ def find_closest_pair_2d(drone_points: List[Point2D]):
     else:
         return (best_pair[1], best_pair[0]), best_distance
 
-
 if __name__ == "__main__":
     sample_points = [(0, 0.0, 0.0), (1, 1.0, 1.0), (2, 2.0, 2.0), (3, 0.1, 0.1)]
     print(find_closest_pair_2d(sample_points))
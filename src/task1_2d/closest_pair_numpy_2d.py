@@ -0,0 +1,298 @@
+"""Closest pair of 2D drone points, divide and conquer over NumPy coordinate arrays."""
+
+import math
+from typing import List, Tuple
+
+from src.common.point_store import PointStore, point_arrays
+from src.task1_2d.closest_pair_dc import compute_distance_2d
+
+Point2D = Tuple[int, float, float]
+
+_TIE = 1e-12
+# Candidates are gathered this far past the current best: a run of tolerance
+# ties can lift the serial engine's running best a little above where it began.
+_SLACK = 1e-9
+_LEAF = 3  # the serial engine's brute-force size; a wider leaf can change which tie wins
+_LEAF_PAIRS = ((0, 1), (0, 2), (1, 2))  # the serial brute force's order
+# Levels whose nodes average more rows than this find their strips from x
+# rank windows; below it every row is near some split line, so the levels
+# keep all their rows grouped by node in y order instead.
+_DENSE_NODE_ROWS = 64
+
+
+def _better(candidate, best):
+    # The serial engine's rule, elementwise over (distance, id_lo, id_hi, ...) columns.
+    import numpy as np
+
+    distance, id_lo, id_hi = candidate[:3]
+    best_distance, best_lo, best_hi = best[:3]
+    return (distance < best_distance - _TIE) | (
+        (np.abs(distance - best_distance) <= _TIE)
+        & ((id_lo < best_lo) | ((id_lo == best_lo) & (id_hi < best_hi)))
+    )
+
+
+def _where(mask, first, second):
+    import numpy as np
+
+    return tuple(np.where(mask, a, b) for a, b in zip(first, second))
+
+
+def _take(columns, index):
+    return tuple(column.take(index) for column in columns)
+
+
+def _empty_best(distances):
+    # (distance, id_lo, id_hi, row_a, row_b) with no pair yet; the ids sort last.
+    import numpy as np
+
+    unset = np.full(distances.size, np.iinfo(np.int64).max)
+    return distances, unset, unset.copy(), np.full(distances.size, -1), np.full(distances.size, -1)
+
+
+def _ranges(starts, stops):
+    # The concatenated aranges [start, stop) and, for each entry, its range.
+    import numpy as np
+
+    lengths = np.maximum(stops - starts, 0)
+    owner = np.repeat(np.arange(lengths.size), lengths)
+    offsets = np.cumsum(lengths) - lengths
+    return np.arange(owner.size) - offsets.take(owner) + starts.take(owner), owner
+
+
+class _Levels:
+    """The serial recursion tree a level at a time, with where each internal node's points are.
+
+    The serial engine hands a child the parent's points with x <= the split
+    value (left) or above it (right), so a point on the split line from the
+    right half goes left. Either way a node's points are a range of x ranks,
+    ``group_start``..``group_stop``; the levels with small nodes also keep
+    those rows grouped by node, each group in (y, x, id) order.
+    """
+
+    def __init__(self, xs, by_y, y_rank):
+        import numpy as np
+
+        self.bounds = []  # (lo, hi, internal) over the level's nodes, left to right
+        self.group_ranges = []  # (group_start, group_stop) of each internal node
+        self.groups = {}  # depth -> (rows, node) for the levels with small nodes
+        lo, hi = np.array([0]), np.array([xs.size])
+        group_start, group_stop = lo, hi
+        rows = node = None
+        while True:
+            internal = hi - lo > _LEAF
+            self.bounds.append((lo, hi, internal))
+            if not internal.any():
+                break
+            lo, hi = lo[internal], hi[internal]
+            group_start, group_stop = group_start[internal], group_stop[internal]
+            self.group_ranges.append((group_start, group_stop))
+            if rows is None and np.mean(hi - lo) <= _DENSE_NODE_ROWS:
+                rows, node = self._group(by_y, y_rank, group_start, group_stop)
+            if rows is not None:
+                self.groups[len(self.bounds) - 1] = (rows, node)
+            mid = (lo + hi) // 2
+            past_split = np.searchsorted(xs, xs.take(mid), side="right")
+            cut = np.clip(past_split, group_start, group_stop)
+            lo, hi = np.stack((lo, mid), axis=1).ravel(), np.stack((mid, hi), axis=1).ravel()
+            group_start = np.stack((group_start, cut), axis=1).ravel()
+            group_stop = np.stack((cut, group_stop), axis=1).ravel()
+            if rows is not None:
+                rows, node = self._split(rows, node, past_split, hi - lo > _LEAF)
+
+    @staticmethod
+    def _group(by_y, y_rank, group_start, group_stop):
+        # Rows in x rank order are already grouped by node; sorting on
+        # (node, y rank) puts each group in y order.
+        import numpy as np
+
+        rows, node = _ranges(group_start, group_stop)
+        keys = np.sort(node * by_y.size + y_rank.take(rows))
+        return by_y.take(keys % by_y.size).astype(np.int32), (keys // by_y.size).astype(np.int32)
+
+    @staticmethod
+    def _split(rows, node, past_split, child_internal):
+        # A stable partition of every group at once, children in left to right
+        # order; rows headed for a leaf are dropped. A left row moves back by
+        # the right rows before it in its group, a right row forward by the
+        # left rows after it.
+        import numpy as np
+
+        right = rows >= past_split.take(node)
+        counts = np.bincount(node, minlength=past_split.size)
+        group_stops = np.cumsum(counts)
+        rights_through = np.r_[0, np.cumsum(right)]
+        rights_before_group = rights_through.take(group_stops - counts)
+        group_rights = rights_through.take(group_stops) - rights_before_group
+        rights_before = rights_through[:-1]
+        index = np.arange(rows.size)
+        left_position = index - rights_before + rights_before_group.take(node)
+        right_position = (group_stops - group_rights - rights_before_group).take(node) + rights_before
+        ordered = np.empty_like(rows)
+        ordered[np.where(right, right_position, left_position)] = rows
+        child_counts = np.stack((counts - group_rights, group_rights), axis=1).ravel()
+        kept = np.flatnonzero(np.repeat(child_internal, child_counts))
+        kept_counts = child_counts[child_internal]
+        return ordered.take(kept), np.repeat(np.arange(kept_counts.size, dtype=np.int32), kept_counts)
+
+
+class _Engine:
+    def __init__(self, xs, ys, ids, by_y, y_rank):
+        self.xs, self.ys, self.ids, self.by_y, self.y_rank = xs, ys, ids, by_y, y_rank
+
+    def _pair(self, rows_a, rows_b):
+        import numpy as np
+
+        ids_a, ids_b = self.ids.take(rows_a), self.ids.take(rows_b)
+        distances = np.hypot(self.xs.take(rows_a) - self.xs.take(rows_b), self.ys.take(rows_a) - self.ys.take(rows_b))
+        return distances, np.minimum(ids_a, ids_b), np.maximum(ids_a, ids_b), rows_a, rows_b
+
+    def leaves(self, lo, hi):
+        # Brute force over 2 or 3 points, pairs in the serial loop order.
+        import numpy as np
+
+        best = self._pair(lo, lo + 1)
+        triples = np.flatnonzero(hi - lo == 3)
+        held = _take(best, triples)
+        for first, second in _LEAF_PAIRS[1:]:
+            candidate = self._pair(lo.take(triples) + first, lo.take(triples) + second)
+            held = _where(_better(candidate, held), candidate, held)
+        for column, value in zip(best, held):
+            column[triples] = value
+        return best
+
+    def windows(self, group_start, group_stop, split_x, best):
+        # Rows are x ranks, so a node's strip lies in a rank window around its
+        # split; this one is a little wider, and ``strips`` trims it exactly.
+        import numpy as np
+
+        reach = best[0] + 4 * np.finfo(np.float64).eps * (np.abs(split_x) + best[0])
+        start = np.maximum(group_start, np.searchsorted(self.xs, split_x - reach))
+        stop = np.minimum(group_stop, np.searchsorted(self.xs, split_x + reach, side="right"))
+        rows, node = _ranges(start, stop)
+        keys = np.sort(node * self.xs.size + self.y_rank.take(rows))
+        return self.by_y.take(keys % self.xs.size), keys // self.xs.size
+
+    def strips(self, rows, node, split_x, best):
+        # Every node's strip at once, from its rows grouped in y order. Pairs
+        # ``shift`` apart in a strip are compared together; those close enough
+        # to matter are then replayed in the serial loop order, a round per
+        # candidate rank within a node.
+        import numpy as np
+
+        in_strip = np.flatnonzero(np.abs(self.xs.take(rows) - split_x.take(node)) < best[0].take(node))
+        rows, node = rows.take(in_strip), node.take(in_strip)
+        strip_xs, strip_ys = self.xs.take(rows), self.ys.take(rows)
+        limit = best[0].take(node) + _SLACK
+        firsts, seconds = [], []
+        # Whole-array slices while most rows still have a partner ``shift``
+        # ahead, then only the rows that did at the previous shift.
+        active = None
+        for shift in range(1, rows.size):
+            if active is None:
+                rise = strip_ys[shift:] - strip_ys[:-shift]
+                first = np.flatnonzero((node[shift:] == node[:-shift]) & (rise < limit[:-shift]))
+                rise = rise.take(first)
+                if 4 * first.size < rows.size:
+                    active = first
+            else:
+                active = active[: np.searchsorted(active, rows.size - shift)]
+                rise = strip_ys.take(active + shift) - strip_ys.take(active)
+                kept = np.flatnonzero((node.take(active + shift) == node.take(active)) & (rise < limit.take(active)))
+                first = active = active.take(kept)
+                rise = rise.take(kept)
+            if not first.size:
+                break
+            distances = np.hypot(strip_xs.take(first + shift) - strip_xs.take(first), rise)
+            close = np.flatnonzero(distances <= limit.take(first))
+            firsts.append(first.take(close))
+            seconds.append(first.take(close) + shift)
+        if not firsts:
+            return best
+        first, second = np.concatenate(firsts), np.concatenate(seconds)
+        if not first.size:
+            return best
+        order = np.lexsort((second, first))
+        first, second = first.take(order), second.take(order)
+        candidates = self._pair(rows.take(first), rows.take(second))
+        rises = strip_ys.take(second) - strip_ys.take(first)
+        owner = node.take(first)
+        run_starts = np.flatnonzero(np.r_[True, owner[1:] != owner[:-1]])
+        run_stops = np.r_[run_starts[1:], owner.size]
+
+        strip_best = _empty_best(best[0].copy())
+        for round_index in range(int((run_stops - run_starts).max())):
+            more = np.flatnonzero(run_stops - run_starts > round_index)
+            run_starts, run_stops = run_starts.take(more), run_stops.take(more)
+            picked = run_starts + round_index
+            nodes = owner.take(picked)
+            held = _take(strip_best, nodes)
+            candidate = _take(candidates, picked)
+            accepted = np.flatnonzero((rises.take(picked) < held[0]) & _better(candidate, held))
+            for column, value in zip(strip_best, candidate):
+                column[nodes.take(accepted)] = value.take(accepted)
+        found = strip_best[3] >= 0
+        return _where(found & _better(strip_best, best), strip_best, best)
+
+    def solve(self, levels: _Levels):
+        import numpy as np
+
+        below = None
+        for depth in range(len(levels.bounds) - 1, -1, -1):
+            lo, hi, internal = levels.bounds[depth]
+            result = [np.empty(lo.size), *(np.empty(lo.size, dtype=np.int64) for _ in range(4))]
+            leaf = ~internal
+            for column, value in zip(result, self.leaves(lo[leaf], hi[leaf])):
+                column[leaf] = value
+            if internal.any():
+                left = _take(below, np.arange(0, below[0].size, 2))
+                right = _take(below, np.arange(1, below[0].size, 2))
+                best = _where(_better(left, right), left, right)
+                split_x = self.xs.take((lo[internal] + hi[internal]) // 2)
+                if depth in levels.groups:
+                    rows, node = levels.groups[depth]
+                else:
+                    rows, node = self.windows(*levels.group_ranges[depth], split_x, best)
+                for column, value in zip(result, self.strips(rows, node, split_x, best)):
+                    column[internal] = value
+            below = result
+        return below
+
+
+def find_closest_pair_numpy_2d(drone_points: List[Point2D]):
+    """Same result as ``find_closest_pair_2d(method="dc")``, ties included, on NumPy arrays.
+
+    The points are sorted into (x, y, id) order once, and their (y, x, id)
+    order taken over that. The serial recursion tree is then walked a level
+    at a time: going down, the small nodes' y-ordered rows are split
+    between children with mask arithmetic; coming back up, every node's
+    leaf brute force, merge and strip check of a level run as one
+    vectorized pass, the strips with shifted-window comparisons.
+    ``drone_points`` may be a ``PointStore``, read in place; the pair is
+    then given as rows.
+    """
+    if len(drone_points) < 2:
+        return None, float("inf")
+    import numpy as np
+
+    ids, coordinates = point_arrays(drone_points, 2)
+    xs, ys = coordinates[:, 0], coordinates[:, 1]
+    # Unstable sorts unless a coordinate repeats, then the tie keys count.
+    order = np.argsort(xs)
+    if np.any(np.diff(xs.take(order)) == 0):
+        order = np.lexsort((ids, ys, xs))
+    xs, ys = xs.take(order), ys.take(order)
+    by_y = np.argsort(ys)
+    if np.any(np.diff(ys.take(by_y)) == 0):
+        by_y = np.argsort(ys, kind="stable")
+    y_rank = np.empty(len(drone_points), dtype=np.int64)
+    y_rank[by_y] = np.arange(len(drone_points))
+    best = _Engine(xs, ys, ids.take(order), by_y, y_rank).solve(_Levels(xs, by_y, y_rank))
+
+    row_a, row_b = int(order[best[3][0]]), int(order[best[4][0]])
+    if ids[row_a] > ids[row_b]:
+        row_a, row_b = row_b, row_a
+    if isinstance(drone_points, PointStore):
+        return (row_a, row_b), math.hypot(*(coordinates[row_a] - coordinates[row_b]).tolist())
+    first, second = drone_points[row_a], drone_points[row_b]
+    return (first, second), compute_distance_2d(first, second)
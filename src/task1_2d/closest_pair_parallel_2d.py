@@ -0,0 +1,92 @@
+"""Closest pair of 2D drone points, divide and conquer with the top split fanned out to processes."""
+
+from typing import List, Tuple
+
+from src.common.shared_pool import SharedArrayPool
+from src.task1_2d.closest_pair_dc import closest_pair_recursive_2d, merge_strip_2d, pair_is_closer_2d
+
+Point2D = Tuple[int, float, float]
+
+
+def _subtree_closest(arrays, cache, start: int, stop: int, y_start: int, y_stop: int, depth: int):
+    # One subtree of the serial recursion: its slab of the x order and its
+    # y-order list, both given as positions in the shared x-sorted arrays.
+    def points(positions):
+        return list(
+            zip(
+                arrays["ids"][positions].tolist(),
+                arrays["coordinates"][positions, 0].tolist(),
+                arrays["coordinates"][positions, 1].tolist(),
+            )
+        )
+
+    (point_a, point_b), distance = closest_pair_recursive_2d(
+        points(slice(start, stop)), points(arrays["y_order"][y_start:y_stop]), depth
+    )
+    return (point_a[0], point_b[0]), distance
+
+
+def find_closest_pair_parallel_2d(drone_points: List[Point2D], workers: int):
+    """Same result as ``find_closest_pair_2d(method="dc")`` using ``workers`` processes, ties included.
+
+    The top levels of the serial recursion are split here exactly as
+    ``closest_pair_recursive_2d`` splits them, until there is a subtree per
+    worker; the workers run the serial recursion on those subtrees from
+    shared memory, and their results are merged back up with the serial
+    half comparison and strip scan, so every tie resolves as it would
+    serially.
+    """
+    if len(drone_points) < 2:
+        return None, float("inf")
+    import numpy as np
+
+    coordinates = np.array([point[1:3] for point in drone_points], dtype=np.float64).reshape(-1, 2)
+    ids = np.array([point[0] for point in drone_points], dtype=np.int64)
+    # the serial sort orders: x order by (x, y, id), y order by (y, x, id)
+    order = np.lexsort((ids, coordinates[:, 1], coordinates[:, 0]))
+    points_by_x = [drone_points[row] for row in order.tolist()]
+    xs = coordinates[order, 0]
+    sorted_ids, sorted_coordinates = ids[order], coordinates[order]
+    y_root = np.lexsort((sorted_ids, sorted_coordinates[:, 0], sorted_coordinates[:, 1]))
+
+    # Split as split_halves_2d does: halves by x position, a y-order point
+    # goes left when its x is at most the split x.
+    levels = max(1, (workers - 1).bit_length())
+    tasks, y_pieces = [], []
+    y_count = 0
+
+    def plan(start, stop, y_positions, depth):
+        if depth == levels or stop - start <= 3:
+            nonlocal y_count
+            tasks.append((start, stop, y_count, y_count + y_positions.size, depth))
+            y_pieces.append(y_positions)
+            y_count += y_positions.size
+            return len(tasks) - 1
+        mid = start + (stop - start) // 2
+        split_x = xs[mid]
+        goes_left = xs[y_positions] <= split_x
+        left = plan(start, mid, y_positions[goes_left], depth + 1)
+        right = plan(mid, stop, y_positions[~goes_left], depth + 1)
+        return (left, right, split_x, y_positions, depth)
+
+    root = plan(0, len(drone_points), y_root, 0)
+    y_order = np.concatenate(y_pieces)
+    with SharedArrayPool({"ids": sorted_ids, "coordinates": sorted_coordinates, "y_order": y_order}, workers) as pool:
+        results = pool.map(_subtree_closest, tasks)
+
+    id_to_point = {point[0]: point for point in points_by_x}
+
+    def merge(node):
+        if isinstance(node, int):
+            (id_a, id_b), distance = results[node]
+            return (id_to_point[id_a], id_to_point[id_b]), distance
+        left, right, split_x, y_positions, depth = node
+        left, right = merge(left), merge(right)
+        best = left if pair_is_closer_2d(left, right) else right
+        near = y_positions[np.abs(xs[y_positions] - split_x) < best[1]]
+        return merge_strip_2d(best, [points_by_x[position] for position in near.tolist()], depth)
+
+    (point_a, point_b), best_distance = merge(root)
+    if point_a[0] <= point_b[0]:
+        return (point_a, point_b), best_distance
+    return (point_b, point_a), best_distance
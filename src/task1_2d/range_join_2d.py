@@ -0,0 +1,94 @@
+"""Fixed-radius self-join in 2D: every drone pair at most a separation threshold apart."""
+
+from typing import Iterator, List, Tuple
+
+Point2D = Tuple[int, float, float]
+PairOut = Tuple[float, Tuple[Point2D, Point2D]]
+
+_CELLS_PER_AXIS_LIMIT = 1 << 30  # keeps the packed cell keys inside int64
+
+
+def find_pairs_within_chunks_2d(drone_points: List[Point2D], radius: float, chunk_size: int = 1 << 16):
+    """Cell-grid self-join yielding ``(index_a, index_b, distances)`` NumPy chunks (needs NumPy).
+
+    Indices point into ``drone_points``; every pair with distance at most
+    ``radius`` is reported once, chunk by chunk, with at most ``chunk_size``
+    candidate pairs examined per chunk. Points are bucketed into square cells
+    at least ``radius`` wide, so only a cell and its 4 forward neighbours need
+    comparing.
+    """
+    if radius < 0:
+        raise ValueError("radius must be non-negative")
+    return _grid_pair_chunks(drone_points, radius, chunk_size)
+
+
+def _grid_pair_chunks(drone_points: List[Point2D], radius: float, chunk_size: int):
+    if len(drone_points) < 2:
+        return
+    import numpy as np
+
+    coordinates = np.array([point[1:3] for point in drone_points], dtype=np.float64)
+    low = coordinates.min(axis=0)
+    extent = coordinates.max(axis=0) - low
+    cell_size = max(radius, float(extent.max()) / _CELLS_PER_AXIS_LIMIT, 1e-300)
+    cells = ((coordinates - low) // cell_size).astype(np.int64)
+    stride = int(cells[:, 1].max()) + 3
+    keys = cells[:, 0] * stride + cells[:, 1]
+
+    order = np.argsort(keys, kind="stable")
+    cell_keys, cell_start, cell_count = np.unique(keys[order], return_index=True, return_counts=True)
+    sorted_coordinates = coordinates[order]
+
+    step = max(1, chunk_size)
+    for offset in (0, 1, stride - 1, stride, stride + 1):
+        # Cell pairs (source, target) for this offset, then every point pair
+        # across them, numbered in cell-pair order and expanded chunk_size
+        # numbers at a time, so a crowded cell pair is split over chunks too.
+        target = np.searchsorted(cell_keys, cell_keys + offset)
+        target_clipped = np.minimum(target, cell_keys.size - 1)
+        present = cell_keys[target_clipped] == cell_keys + offset
+        source = np.nonzero(present)[0]
+        target = target_clipped[present]
+        pair_counts = cell_count[source] * cell_count[target]
+        ends = np.cumsum(pair_counts)
+        total = int(ends[-1]) if ends.size else 0
+        for first in range(0, total, step):
+            candidate = np.arange(first, min(total, first + step))
+            owner = np.searchsorted(ends, candidate, "right")
+            local = candidate - (ends[owner] - pair_counts[owner])
+            target_count = cell_count[target[owner]]
+            slot_a = cell_start[source[owner]] + local // target_count
+            slot_b = cell_start[target[owner]] + local % target_count
+            if offset == 0:
+                keep = slot_a < slot_b
+                slot_a, slot_b = slot_a[keep], slot_b[keep]
+            delta = sorted_coordinates[slot_a] - sorted_coordinates[slot_b]
+            distances = np.hypot(delta[:, 0], delta[:, 1])
+            within = distances <= radius
+            if within.any():
+                yield order[slot_a[within]], order[slot_b[within]], distances[within]
+
+
+def find_pairs_within_2d(drone_points: List[Point2D], radius: float) -> Iterator[PairOut]:
+    """Lazily yield ``(distance, (a, b))`` for every pair at most ``radius`` apart, ``a[0] < b[0]``.
+
+    Streams ``find_pairs_within_chunks_2d``; the cost follows the number of
+    pairs reported and the order of the pairs is unspecified.
+    """
+    if radius < 0:
+        raise ValueError("radius must be non-negative")
+    return _grid_pairs(drone_points, radius)
+
+
+def _grid_pairs(drone_points: List[Point2D], radius: float) -> Iterator[PairOut]:
+    for index_a, index_b, distances in find_pairs_within_chunks_2d(drone_points, radius):
+        for a, b, distance in zip(index_a.tolist(), index_b.tolist(), distances.tolist()):
+            point_a, point_b = drone_points[a], drone_points[b]
+            if point_a[0] > point_b[0]:
+                point_a, point_b = point_b, point_a
+            yield distance, (point_a, point_b)
+
+
+if __name__ == "__main__":
+    sample_points = [(0, 0.0, 0.0), (1, 1.0, 1.0), (2, 2.0, 2.0), (3, 0.1, 0.1)]
+    print(sorted(find_pairs_within_2d(sample_points, 1.5)))
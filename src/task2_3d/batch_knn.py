@@ -0,0 +1,240 @@
+"""Batched exact k-nearest-neighbour queries over a KD layout, in NumPy."""
+
+import numpy as np
+
+from src.common.instrumentation import active_stats
+
+
+class BatchKNN3D:
+    """Answers many kNN queries at once over points stored in KD order.
+
+    ``coordinates`` (n, 3), ``ids`` (n,) and ``axes`` (n,) must list the tree
+    points in the implicit KD layout used by ``FlatKDTree3D`` (an in-order walk
+    of a ``KDTree3D`` gives the same layout): the range ``[lo, hi)`` splits at
+    ``mid = (lo + hi) // 2`` into ``[lo, mid)`` and ``[mid + 1, hi)``. Ranges of
+    at most ``bucket_size`` points are buckets; every range gets a bounding
+    box. Queries are sorted into spatially coherent blocks; each block collects
+    the buckets and split points it needs from the boxes and does its distance
+    and selection work as whole-array operations.
+    """
+
+    def __init__(self, coordinates, ids, axes, bucket_size: int = 32):
+        self.coordinates = np.ascontiguousarray(coordinates, dtype=np.float64).reshape(-1, 3)
+        self.ids = np.ascontiguousarray(ids, dtype=np.int64)
+        self.axes = np.asarray(axes, dtype=np.intp)
+        self.size = self.coordinates.shape[0]
+        # Ranges of three or more points split into two non-empty halves.
+        self.bucket_size = max(2, bucket_size)
+        self._build_box_tree()
+
+    def _build_box_tree(self):
+        node_lo, node_hi, node_left, node_right = [], [], [], []
+        pending = [(0, self.size, -1, False)] if self.size else []
+        while pending:
+            lo, hi, parent, is_right = pending.pop()
+            node = len(node_lo)
+            node_lo.append(lo)
+            node_hi.append(hi)
+            node_left.append(-1)
+            node_right.append(-1)
+            if parent >= 0:
+                if is_right:
+                    node_right[parent] = node
+                else:
+                    node_left[parent] = node
+            if hi - lo > self.bucket_size:
+                mid = (lo + hi) // 2
+                pending.append((mid + 1, hi, node, True))
+                pending.append((lo, mid, node, False))
+        self.node_left = node_left
+        self.node_right = node_right
+        self.node_mid = [(lo + hi) // 2 for lo, hi in zip(node_lo, node_hi)]
+
+        # Bucket boxes straight from the points, inner boxes from the children
+        # and the split point. Nodes are numbered in preorder, so walking
+        # backwards meets children before their parent.
+        buckets = [node for node in range(len(node_lo)) if node_left[node] < 0]
+        self.bucket_lo = np.array([node_lo[node] for node in buckets], dtype=np.int64)
+        self.bucket_hi = np.array([node_hi[node] for node in buckets], dtype=np.int64)
+        self.bucket_of_node = {node: bucket for bucket, node in enumerate(buckets)}
+        # reduceat over interleaved (lo, hi) bounds reduces each bucket in one
+        # call; the padding row keeps a final ``hi == n`` a valid index.
+        bounds = np.stack([self.bucket_lo, self.bucket_hi], axis=1).ravel()
+        padded = np.vstack([self.coordinates, np.zeros((1, 3))])
+        if buckets:
+            self.bucket_min = np.minimum.reduceat(padded, bounds, axis=0)[::2]
+            self.bucket_max = np.maximum.reduceat(padded, bounds, axis=0)[::2]
+        else:
+            self.bucket_min = self.bucket_max = np.empty((0, 3))
+        box_min = [None] * len(node_lo)
+        box_max = [None] * len(node_lo)
+        for bucket, node in enumerate(buckets):
+            box_min[node] = self.bucket_min[bucket].tolist()
+            box_max[node] = self.bucket_max[bucket].tolist()
+        for node in range(len(node_lo) - 1, -1, -1):
+            left, right = node_left[node], node_right[node]
+            if left >= 0:
+                split_point = self.coordinates[self.node_mid[node]].tolist()
+                box_min[node] = [min(a, b, c) for a, b, c in zip(box_min[left], box_min[right], split_point)]
+                box_max[node] = [max(a, b, c) for a, b, c in zip(box_max[left], box_max[right], split_point)]
+        self.box_min = box_min
+        self.box_max = box_max
+
+    def _locate(self, query_coordinates, anchor_size: int):
+        # Walk every query down the splits at once. The bucket it lands in
+        # orders the queries spatially; the deepest range on the way that still
+        # holds ``anchor_size`` points gives a cheap first bound on its k-th
+        # neighbour distance.
+        query_count = query_coordinates.shape[0]
+        lo = np.zeros(query_count, dtype=np.int64)
+        hi = np.full(query_count, self.size, dtype=np.int64)
+        anchor_lo, anchor_hi = lo.copy(), hi.copy()
+        rows = np.arange(query_count)
+        while True:
+            sizes = hi - lo
+            deep_enough = sizes >= anchor_size
+            anchor_lo = np.where(deep_enough, lo, anchor_lo)
+            anchor_hi = np.where(deep_enough, hi, anchor_hi)
+            active = sizes > self.bucket_size
+            if not active.any():
+                break
+            mid = (lo + hi) // 2
+            axis = self.axes[mid]
+            go_left = query_coordinates[rows, axis] <= self.coordinates[mid, axis]
+            lo = np.where(active & ~go_left, mid + 1, lo)
+            hi = np.where(active & go_left, mid, hi)
+        return lo, anchor_lo, anchor_hi
+
+    def query(self, query_points, k: int, query_ids=None, block_size: int = 32, max_radius=None):
+        """Return (m, k) distances and neighbour ids, ordered by (distance, id).
+
+        ``query_points`` is an (m, 3) array of coordinates or a list of
+        ``Point3D`` tuples. A query never reports a tree point whose id equals
+        its own: the tuple id, or its entry in ``query_ids`` for arrays.
+        With ``max_radius`` only neighbours within that distance are reported.
+        Missing neighbours are padded with ``inf`` and ``-1``.
+        """
+        if isinstance(query_points, np.ndarray):
+            query_coordinates = np.ascontiguousarray(query_points, dtype=np.float64).reshape(-1, 3)
+        else:
+            query_coordinates = np.array([point[1:4] for point in query_points], dtype=np.float64).reshape(-1, 3)
+            query_ids = [point[0] for point in query_points]
+        query_count = query_coordinates.shape[0]
+        distances = np.full((query_count, max(k, 0)), np.inf)
+        neighbor_ids = np.full((query_count, max(k, 0)), -1, dtype=np.int64)
+        if query_count == 0 or k <= 0 or self.size == 0:
+            return distances, neighbor_ids
+        if query_ids is not None:
+            query_ids = np.asarray(query_ids, dtype=np.int64)
+
+        radius_sq = np.inf if max_radius is None else float(max_radius) ** 2
+        landing, anchor_lo, anchor_hi = self._locate(query_coordinates, k + 1)
+        order = np.argsort(landing, kind="stable")
+        for start in range(0, query_count, block_size):
+            rows = order[start : start + block_size]
+            block_distance_sq, block_ids = self._query_block(
+                query_coordinates[rows],
+                None if query_ids is None else query_ids[rows],
+                anchor_lo[rows],
+                anchor_hi[rows],
+                k,
+                radius_sq,
+            )
+            distances[rows] = np.sqrt(block_distance_sq)
+            neighbor_ids[rows] = block_ids
+        return distances, neighbor_ids
+
+    def _query_block(self, block, block_ids, anchor_lo, anchor_hi, k: int, radius_sq: float):
+        # Distances to the rows' anchor ranges bound each row's k-th neighbour
+        # distance; only buckets within that bound of some row are scanned.
+        anchors = sorted(set(zip(anchor_lo.tolist(), anchor_hi.tolist())))
+        anchor_slots = np.concatenate([np.arange(lo, hi) for lo, hi in anchors])
+        anchor_distance_sq = self._distance_matrix(block, block_ids, anchor_slots)
+        if anchor_slots.size > k:
+            row_bound_sq = np.partition(anchor_distance_sq, k - 1, axis=1)[:, k - 1]
+        else:
+            row_bound_sq = np.full(block.shape[0], np.inf)
+        row_bound_sq = np.minimum(row_bound_sq, radius_sq)
+
+        buckets, split_slots = self._buckets_near(
+            block.min(axis=0).tolist(), block.max(axis=0).tolist(), float(row_bound_sq.max())
+        )
+        below = np.maximum(self.bucket_min[buckets][None, :, :] - block[:, None, :], 0.0)
+        above = np.maximum(block[:, None, :] - self.bucket_max[buckets][None, :, :], 0.0)
+        gap = below + above
+        gap_sq = (gap * gap).sum(axis=2)
+        buckets = buckets[(gap_sq <= row_bound_sq[:, None]).any(axis=0)]
+
+        lo, hi = self.bucket_lo[buckets], self.bucket_hi[buckets]
+        sizes = hi - lo
+        candidate_slots = np.concatenate(
+            [np.repeat(lo - np.cumsum(sizes) + sizes, sizes) + np.arange(sizes.sum()), split_slots]
+        )
+        distance_sq = self._distance_matrix(block, block_ids, candidate_slots)
+        stats = active_stats()
+        if stats is not None:
+            stats.add("batch_knn.blocks")
+            stats.add("batch_knn.buckets_scanned", buckets.size)
+            stats.add("batch_knn.distance_evaluations", block.shape[0] * (anchor_slots.size + candidate_slots.size))
+        if radius_sq < np.inf:
+            distance_sq[distance_sq > radius_sq] = np.inf
+        return self._select_nearest(distance_sq, self.ids[candidate_slots], k)
+
+    def _buckets_near(self, block_lo, block_hi, bound_sq: float):
+        node_left, node_right, node_mid = self.node_left, self.node_right, self.node_mid
+        box_min, box_max = self.box_min, self.box_max
+        found = []
+        split_slots = []
+        pending = [0]
+        while pending:
+            node = pending.pop()
+            node_min, node_max = box_min[node], box_max[node]
+            gap_sq = 0.0
+            for axis in range(3):
+                if node_min[axis] > block_hi[axis]:
+                    gap = node_min[axis] - block_hi[axis]
+                    gap_sq += gap * gap
+                elif block_lo[axis] > node_max[axis]:
+                    gap = block_lo[axis] - node_max[axis]
+                    gap_sq += gap * gap
+            if gap_sq > bound_sq:
+                continue
+            left = node_left[node]
+            if left < 0:
+                found.append(self.bucket_of_node[node])
+            else:
+                split_slots.append(node_mid[node])
+                pending.append(node_right[node])
+                pending.append(left)
+        return np.array(found, dtype=np.int64), np.array(split_slots, dtype=np.int64)
+
+    def _distance_matrix(self, block, block_ids, slots):
+        points = self.coordinates[slots]
+        dx = block[:, 0:1] - points[:, 0]
+        dy = block[:, 1:2] - points[:, 1]
+        dz = block[:, 2:3] - points[:, 2]
+        distance_sq = dx * dx + dy * dy + dz * dz
+        if block_ids is not None:
+            distance_sq[block_ids[:, None] == self.ids[slots][None, :]] = np.inf
+        return distance_sq
+
+    def _select_nearest(self, distance_sq, point_ids, k: int):
+        row_count, column_count = distance_sq.shape
+        best_distance_sq = np.full((row_count, k), np.inf)
+        best_ids = np.full((row_count, k), -1, dtype=np.int64)
+        # Keep everything up to each row's k-th distance (ties included), then
+        # order the survivors by (row, distance, id) and take k per row.
+        if column_count > k:
+            kth = np.partition(distance_sq, k - 1, axis=1)[:, k - 1 : k]
+            rows, columns = np.nonzero((distance_sq <= kth) & (distance_sq < np.inf))
+        else:
+            rows, columns = np.nonzero(distance_sq < np.inf)
+        survivor_distance_sq = distance_sq[rows, columns]
+        survivor_ids = point_ids[columns]
+        order = np.lexsort((survivor_ids, survivor_distance_sq, rows))
+        rows = rows[order]
+        rank = np.arange(rows.size) - np.searchsorted(rows, rows)
+        keep = rank < k
+        best_distance_sq[rows[keep], rank[keep]] = survivor_distance_sq[order][keep]
+        best_ids[rows[keep], rank[keep]] = survivor_ids[order][keep]
+        return best_distance_sq, best_ids
@@ -0,0 +1,126 @@
+"""Closest pair of 3D drone points with a randomized uniform grid, expected O(n)."""
+
+import math
+import random
+from typing import Dict, List, Tuple
+
+Point3D = Tuple[int, float, float, float]
+
+
+def _sample_closest_distance_sq(points: List[Point3D], rng: random.Random) -> float:
+    # Incremental grid: insert the points in random order into a grid whose
+    # cells are as wide as the closest distance so far. A point only needs the
+    # 3x3x3 cells around it, and the grid is rebuilt when it finds a closer
+    # pair, which happens with probability at most 2 / i at step i.
+    order = list(points)
+    rng.shuffle(order)
+    first, second = order[0], order[1]
+    best_sq = (first[1] - second[1]) ** 2 + (first[2] - second[2]) ** 2 + (first[3] - second[3]) ** 2
+    index = 2
+    while best_sq > 0 and index < len(order):
+        cell_size = math.sqrt(best_sq)
+        grid: Dict[Tuple[int, int, int], List[Point3D]] = {}
+        for point in order[:index]:
+            key = (int(point[1] // cell_size), int(point[2] // cell_size), int(point[3] // cell_size))
+            grid.setdefault(key, []).append(point)
+        improved = False
+        while index < len(order) and not improved:
+            point = order[index]
+            px, py, pz = point[1], point[2], point[3]
+            cx, cy, cz = int(px // cell_size), int(py // cell_size), int(pz // cell_size)
+            for gx in (cx - 1, cx, cx + 1):
+                for gy in (cy - 1, cy, cy + 1):
+                    for gz in (cz - 1, cz, cz + 1):
+                        for other in grid.get((gx, gy, gz), ()):
+                            distance_sq = (px - other[1]) ** 2 + (py - other[2]) ** 2 + (pz - other[3]) ** 2
+                            if distance_sq < best_sq:
+                                best_sq = distance_sq
+                                improved = True
+            grid.setdefault((cx, cy, cz), []).append(point)
+            index += 1
+    return best_sq
+
+
+def find_closest_pair_grid_3d(drone_points: List[Point3D], seed=None):
+    """Exact closest pair, ties broken by the smaller sorted id pair.
+
+    Rabin's scheme: the closest distance of a random sample of n^(2/3) points
+    bounds the true one from above, so one pass over a grid with cells that
+    wide sees every candidate pair, and only O(n) of them in expectation.
+    ``seed`` fixes the sampling. Works best on spread-out fleets; many
+    coincident points fall into one cell and degrade towards quadratic.
+    """
+    point_count = len(drone_points)
+    if point_count < 2:
+        return None, float("inf")
+    rng = random.Random(seed)
+    sample_size = max(2, int(point_count ** (2 / 3)))
+    sample = drone_points if sample_size >= point_count else rng.sample(drone_points, sample_size)
+    # Slightly wider than the bound so pairs within the 1e-12 tie tolerance of
+    # the minimum are all seen.
+    radius = math.sqrt(_sample_closest_distance_sq(sample, rng)) + 1e-12
+    cell_size = radius * (1 + 1e-9)
+    radius_sq = cell_size * cell_size
+
+    # Cells keyed by one int, (cx * stride_y + cy) * stride_z + cz, which
+    # hashes faster than a tuple.
+    min_y = min(point[2] for point in drone_points)
+    min_z = min(point[3] for point in drone_points)
+    stride_y = int((max(point[2] for point in drone_points) - min_y) // cell_size) + 3
+    stride_z = int((max(point[3] for point in drone_points) - min_z) // cell_size) + 3
+    grid: Dict[int, List[Point3D]] = {}
+    for point in drone_points:
+        key = (
+            int(point[1] // cell_size) * stride_y + int((point[2] - min_y) // cell_size)
+        ) * stride_z + int((point[3] - min_z) // cell_size)
+        if key in grid:
+            grid[key].append(point)
+        else:
+            grid[key] = [point]
+    # Neighbour cells that follow a cell in key order, so each cell pair is visited once.
+    forward_offsets = [
+        (dx * stride_y + dy) * stride_z + dz
+        for dx in (-1, 0, 1)
+        for dy in (-1, 0, 1)
+        for dz in (-1, 0, 1)
+        if (dx, dy, dz) > (0, 0, 0)
+    ]
+
+    best_pair = None
+    best_ids = (float("inf"), float("inf"))
+    best_distance = float("inf")
+    for key, members in grid.items():
+        candidate_pairs = [
+            (members[first_index], members[second_index])
+            for first_index in range(len(members))
+            for second_index in range(first_index + 1, len(members))
+        ]
+        for offset in forward_offsets:
+            neighbors = grid.get(key + offset)
+            if neighbors:
+                candidate_pairs.extend((point_a, point_b) for point_a in members for point_b in neighbors)
+        for point_a, point_b in candidate_pairs:
+            dx = point_a[1] - point_b[1]
+            dy = point_a[2] - point_b[2]
+            dz = point_a[3] - point_b[3]
+            distance_sq = dx * dx + dy * dy + dz * dz
+            if distance_sq > radius_sq:
+                continue
+            distance = math.sqrt(distance_sq)
+            candidate_ids = (point_a[0], point_b[0]) if point_a[0] <= point_b[0] else (point_b[0], point_a[0])
+            if distance < best_distance - 1e-12 or (
+                abs(distance - best_distance) <= 1e-12 and candidate_ids < best_ids
+            ):
+                best_pair = (point_a, point_b)
+                best_ids = candidate_ids
+                best_distance = distance
+
+    if best_pair[0][0] <= best_pair[1][0]:
+        return best_pair, best_distance
+    else:
+        return (best_pair[1], best_pair[0]), best_distance
+
+
+if __name__ == "__main__":
+    sample_points = [(0, 0, 0, 0), (1, 1, 1, 1), (2, 0.1, 0.1, 0.1)]
+    print(find_closest_pair_grid_3d(sample_points))
@@ -0,0 +1,159 @@
+"""Array-backed KD-tree for exact nearest-neighbor search in 3D."""
+
+import math
+from array import array
+from heapq import heappush, heapreplace
+from typing import List, Optional, Tuple
+
+from src.task2_3d.kdtree_3d import presorted_kd_layout
+
+Point3D = Tuple[int, float, float, float]
+
+
+class FlatKDTree3D:
+    """KD-tree kept in contiguous arrays instead of one object per node.
+
+    The node of a slot range ``[lo, hi)`` sits at ``mid = (lo + hi) // 2`` with
+    its subtrees in ``[lo, mid)`` and ``[mid + 1, hi)``, so children are implied
+    by the range. Slot ``i`` holds its coordinates at ``coords[3 * i : 3 * i + 3]``,
+    its id in ``ids[i]``, its input position in ``perm[i]`` and its split axis in
+    ``axes[i]``. With the default ``build="sort"`` the build and search mirror
+    ``KDTree3D``, so results are identical. ``build="presort"`` uses the
+    O(n log n) ``presorted_kd_layout`` instead, and ranges of at most
+    ``leaf_size`` slots become leaf buckets that are scanned linearly.
+    """
+
+    def __init__(self, drone_points: List[Point3D], build: str = "sort", leaf_size: int = 1):
+        if build not in {"sort", "presort"}:
+            raise ValueError("build must be one of: sort, presort")
+        if leaf_size < 1:
+            raise ValueError("leaf_size must be at least 1")
+        self.size = len(drone_points)
+        self.leaf_size = leaf_size
+        self._source = drone_points
+        self._batch_index = None
+        if build == "presort" and self.size:
+            self._build_presorted(drone_points)
+        else:
+            self._build_sorted(drone_points)
+
+    def _build_presorted(self, drone_points: List[Point3D]):
+        import numpy as np
+
+        coordinates = np.array([point[1:4] for point in drone_points], dtype=np.float64)
+        perm, axes = presorted_kd_layout(coordinates, self.leaf_size)
+        perm = perm.astype(np.int64)
+        self.perm = array("q", perm.tobytes())
+        self.axes = bytearray(axes.tobytes())
+        self.ids = array("q", np.array([point[0] for point in drone_points], dtype=np.int64)[perm].tobytes())
+        self.coords = array("d", coordinates[perm].tobytes())
+
+    def _build_sorted(self, drone_points: List[Point3D]):
+        # Same median rule as KDTree3D.build_tree: stable sort of the range on
+        # the depth axis, median at len // 2, no slicing of the point tuples.
+        perm = list(range(self.size))
+        axes = bytearray(self.size)
+        axis_values = [[point[axis + 1] for point in drone_points] for axis in range(3)]
+        pending = [(0, self.size, 0)]
+        while pending:
+            lo, hi, depth = pending.pop()
+            if hi - lo <= self.leaf_size:
+                if hi - lo == 1:
+                    axes[lo] = depth % 3
+                continue
+            axis = depth % 3
+            perm[lo:hi] = sorted(perm[lo:hi], key=axis_values[axis].__getitem__)
+            mid = (lo + hi) // 2
+            axes[mid] = axis
+            pending.append((lo, mid, depth + 1))
+            pending.append((mid + 1, hi, depth + 1))
+        self.perm = array("q", perm)
+        self.axes = axes
+        self.ids = array("q", (drone_points[i][0] for i in perm))
+        self.coords = array("d", (value for i in perm for value in drone_points[i][1:4]))
+
+    def point_at(self, slot: int) -> Point3D:
+        return self._source[self.perm[slot]]
+
+    def find_nearest_neighbors(
+        self, query_point: Point3D, k: int = 1, max_radius: Optional[float] = None
+    ) -> List[Tuple[float, Point3D]]:
+        if k <= 0:
+            return []
+        coords = self.coords
+        ids = self.ids
+        axes = self.axes
+        leaf_size = self.leaf_size
+        query_id = query_point[0]
+        query_coords = (query_point[1], query_point[2], query_point[3])
+        qx, qy, qz = query_coords
+        radius_sq = math.inf if max_radius is None else max_radius * max_radius
+        best_neighbors = []
+        # Each entry is a subtree range still to visit plus the squared distance
+        # from the query to the splitting plane that separated it.
+        pending = [(0, self.size, 0.0)]
+        while pending:
+            lo, hi, plane_distance_sq = pending.pop()
+            if plane_distance_sq > (-best_neighbors[0][0] if len(best_neighbors) >= k else radius_sq):
+                continue
+            while lo < hi:
+                is_leaf = hi - lo <= leaf_size
+                mid = (lo + hi) // 2
+                for slot in range(lo, hi) if is_leaf else (mid,):
+                    node_id = ids[slot]
+                    if node_id == query_id:
+                        continue
+                    base = 3 * slot
+                    distance_sq = (
+                        (qx - coords[base]) ** 2
+                        + (qy - coords[base + 1]) ** 2
+                        + (qz - coords[base + 2]) ** 2
+                    )
+                    if len(best_neighbors) < k:
+                        if distance_sq <= radius_sq:
+                            heappush(best_neighbors, (-distance_sq, node_id, slot))
+                    else:
+                        current_worst = -best_neighbors[0][0]
+                        if distance_sq < current_worst or (
+                            distance_sq == current_worst and node_id < best_neighbors[0][1]
+                        ):
+                            heapreplace(best_neighbors, (-distance_sq, node_id, slot))
+                if is_leaf:
+                    break
+                base = 3 * mid
+                axis = axes[mid]
+                axis_gap = query_coords[axis] - coords[base + axis]
+                if axis_gap <= 0:
+                    if mid + 1 < hi:
+                        pending.append((mid + 1, hi, axis_gap ** 2))
+                    hi = mid
+                else:
+                    if lo < mid:
+                        pending.append((lo, mid, axis_gap ** 2))
+                    lo = mid + 1
+        return [
+            (math.sqrt(-neg_distance), self.point_at(slot))
+            for (neg_distance, _, slot) in sorted(best_neighbors, reverse=True)
+        ]
+
+    def query_many(self, query_points, k: int = 1, query_ids=None, max_radius: Optional[float] = None):
+        """k nearest neighbors of a whole batch of query points (needs NumPy).
+
+        Same contract as ``KDTree3D.query_many``; the batch engine reads the
+        tree arrays in place.
+        """
+        if self._batch_index is None:
+            import numpy as np
+            from src.task2_3d.batch_knn import BatchKNN3D
+
+            self._batch_index = BatchKNN3D(
+                np.frombuffer(self.coords, dtype=np.float64).reshape(-1, 3),
+                np.frombuffer(self.ids, dtype=np.int64),
+                np.frombuffer(self.axes, dtype=np.uint8),
+            )
+        return self._batch_index.query(query_points, k, query_ids, max_radius=max_radius)
+
+
+if __name__ == "__main__":
+    sample_points = [(0, 0, 0, 0), (1, 1, 1, 1), (2, 0.1, 0.1, 0.1)]
+    print(FlatKDTree3D(sample_points).find_nearest_neighbors((3, 0.2, 0.2, 0.2), k=2))
@@ -1,7 +1,11 @@
 """KD-tree for exact nearest-neighbor search in 3D."""
 
 import math
-from typing import List, Tuple, Optional
+from heapq import heappop, heappush, heapreplace
+from itertools import count
+from typing import Iterator, List, Tuple, Optional
+
+from src.common.instrumentation import active_stats
 
 Point3D = Tuple[int, float, float, float]
 
@@ -14,9 +18,145 @@ class KDTreeNode3D:
         self.right = None
         self.axis = axis
 
+def presorted_kd_layout(coordinates, leaf_size: int = 1):
+    """Median-split KD layout built from a single presort per axis.
+
+    ``coordinates`` is an (n, 3) NumPy array. Returns ``perm``, the row
+    indices in implicit tree order (the node of slot range ``[lo, hi)`` sits
+    at ``(lo + hi) // 2``), and ``axes``, the split axis of every node slot.
+    Ranges of at most ``leaf_size`` slots are left as leaves. All ranges of
+    one depth are split together: the per-axis orders are stably partitioned
+    around each range's median rank with index arithmetic, so the build is
+    O(n log n) with no per-level sorting and no copies of the point tuples.
+    With distinct coordinates per axis the layout matches ``build_tree``.
+    """
+    import numpy as np
+
+    point_count = coordinates.shape[0]
+    index_type = np.int32 if point_count < 2**31 - 1 else np.int64
+    axes = np.zeros(point_count, dtype=np.uint8)
+    axis_orders = [
+        np.argsort(coordinates[:, axis], kind="stable").astype(index_type) for axis in range(3)
+    ]
+    axis_ranks = []
+    for order in axis_orders:
+        rank = np.empty(point_count, dtype=index_type)
+        rank[order] = np.arange(point_count, dtype=index_type)
+        axis_ranks.append(rank)
+
+    range_lo = np.array([0], dtype=index_type)
+    range_hi = np.array([point_count], dtype=index_type)
+    depth = 0
+    while range_lo.size:
+        sizes = range_hi - range_lo
+        if leaf_size == 1:
+            axes[range_lo[sizes == 1]] = depth % 3
+        split = sizes > leaf_size
+        range_lo, range_hi, sizes = range_lo[split], range_hi[split], sizes[split]
+        if not range_lo.size:
+            break
+        axis = depth % 3
+        mids = (range_lo + range_hi) // 2
+        axes[mids] = axis
+
+        # Slots of every range being split, laid out range after range.
+        starts = np.cumsum(sizes, dtype=np.int64) - sizes
+        slots = np.arange(starts[-1] + sizes[-1], dtype=index_type)
+        slots += np.repeat((range_lo - starts).astype(index_type), sizes)
+        lo_of_slot = np.repeat(range_lo, sizes)
+        mid_of_slot = np.repeat(mids, sizes)
+
+        split_rank = axis_ranks[axis]
+        thresholds = np.repeat(split_rank[axis_orders[axis][mids]], sizes)
+        for other_axis in ((axis + 1) % 3, (axis + 2) % 3):
+            order = axis_orders[other_axis]
+            members = order[slots]
+            member_ranks = split_rank[members]
+            goes_left = member_ranks < thresholds
+            goes_right = member_ranks > thresholds
+            left_before = np.cumsum(goes_left, dtype=index_type)
+            left_before -= goes_left
+            left_before -= np.repeat(left_before[starts], sizes)
+            right_before = np.cumsum(goes_right, dtype=index_type)
+            right_before -= goes_right
+            right_before -= np.repeat(right_before[starts], sizes)
+            target = np.where(
+                goes_left,
+                lo_of_slot + left_before,
+                np.where(goes_right, mid_of_slot + 1 + right_before, mid_of_slot),
+            )
+            order[target] = members
+
+        range_lo, range_hi = (
+            np.concatenate((range_lo, mids + 1)),
+            np.concatenate((mids, range_hi)),
+        )
+        depth += 1
+    return axis_orders[0], axes
+
+
 class KDTree3D:
-    def __init__(self, drone_points: List[Point3D]):
-        self.root = self.build_tree(drone_points, depth=0)
+    def __init__(self, drone_points: List[Point3D], build: str = "sort"):
+        if build not in {"sort", "presort"}:
+            raise ValueError("build must be one of: sort, presort")
+        self._layout = None
+        self.size = len(drone_points)
+        if build == "presort":
+            self.root = self.build_tree_presorted(drone_points)
+        else:
+            self.root = self.build_tree(drone_points, depth=0)
+        self._batch_index = None
+        self._fingerprint = None
+
+    @classmethod
+    def from_layout(cls, coordinates, ids, axes, fingerprint: Optional[bytes] = None) -> "KDTree3D":
+        """A tree over arrays already in the implicit KD layout, as ``layout()`` returns them.
+
+        Nothing is copied: batch queries run on the arrays as they are (a
+        memory map stays one), and the node objects the per-point searches
+        walk are only built the first time one of them needs ``root``.
+        ``fingerprint``, when known (a saved tree stores it), spares
+        ``fingerprint()`` hashing the arrays.
+        """
+        tree = cls.__new__(cls)
+        tree._layout = (coordinates, ids, axes)
+        tree.size = len(ids)
+        tree._root = None
+        tree._batch_index = None
+        tree._fingerprint = fingerprint
+        return tree
+
+    @property
+    def root(self) -> Optional[KDTreeNode3D]:
+        if self._root is None and self._layout is not None and self.size:
+            coordinates, ids, axes = self._layout
+            self._root = self._link_layout(
+                [(point_id, *xyz) for point_id, xyz in zip(ids.tolist(), coordinates.tolist())], axes.tolist()
+            )
+        return self._root
+
+    @root.setter
+    def root(self, node: Optional[KDTreeNode3D]):
+        self._root = node
+
+    def __len__(self) -> int:
+        return self.size
+
+    def fingerprint(self) -> bytes:
+        """``kdtree_file.points_fingerprint`` of the indexed points, hashed once per tree."""
+        if self._fingerprint is None:
+            from src.task2_3d.kdtree_file import _fingerprint
+
+            coordinates, ids, _ = self.layout()
+            self._fingerprint = _fingerprint(ids, coordinates)
+        return self._fingerprint
+
+    def check_indexes(self, drone_points):
+        """Raise ``ValueError`` unless this tree indexes exactly ``drone_points`` (any order)."""
+        from src.task2_3d.kdtree_file import points_fingerprint
+
+        if len(self) != len(drone_points) or points_fingerprint(drone_points) != self.fingerprint():
+            raise ValueError("tree must index the same points")
 
     def build_tree(self, point_list: List[Point3D], depth: int) -> Optional[KDTreeNode3D]:
         if not point_list:
@@ -29,6 +169,26 @@ class KDTree3D:
         node.right = self.build_tree(point_list[median_index + 1 :], depth + 1)
         return node
 
+    def build_tree_presorted(self, point_list: List[Point3D]) -> Optional[KDTreeNode3D]:
+        if not point_list:
+            return None
+        import numpy as np
+
+        perm, axes = presorted_kd_layout(np.array([point[1:4] for point in point_list], dtype=np.float64))
+        return self._link_layout([point_list[row] for row in perm.tolist()], axes.tolist())
+
+    def _link_layout(self, ordered_points: List[Point3D], axes: List[int]) -> Optional[KDTreeNode3D]:
+        def link(lo: int, hi: int) -> Optional[KDTreeNode3D]:
+            if lo >= hi:
+                return None
+            mid = (lo + hi) // 2
+            node = KDTreeNode3D(ordered_points[mid], axes[mid])
+            node.left = link(lo, mid)
+            node.right = link(mid + 1, hi)
+            return node
+
+        return link(0, len(ordered_points))
+
     def compute_squared_distance(self, point_a: Point3D, point_b: Point3D) -> float:
         return (
             (point_a[1] - point_b[1]) ** 2
@@ -36,69 +196,279 @@ class KDTree3D:
             + (point_a[3] - point_b[3]) ** 2
         )
 
-    def find_nearest_neighbors(self, query_point: Point3D, k: int = 1) -> List[Tuple[float, Point3D]]:
-        best_neighbors = []
-        import heapq
+    def find_nearest_neighbors(
+        self, query_point: Point3D, k: int = 1, max_radius: Optional[float] = None
+    ) -> List[Tuple[float, Point3D]]:
+        """k nearest neighbors of ``query_point``, nearest first, skipping its own id.
 
-        def search(node: KDTreeNode3D):
-            if node is None:
-                return
-            split_point = node.point
-            if split_point[0] != query_point[0]:
-                distance_sq = self.compute_squared_distance(query_point, split_point)
-                if len(best_neighbors) < k:
-                    heapq.heappush(best_neighbors, (-distance_sq, split_point))
+        With ``max_radius`` only points within that distance are reported, and
+        subtrees beyond it are pruned from the first node on.
+        """
+        if k <= 0:
+            return []
+        query_id = query_point[0]
+        qx, qy, qz = query_point[1], query_point[2], query_point[3]
+        radius_sq = math.inf if max_radius is None else max_radius * max_radius
+        best_neighbors = []
+        # Plain local counts; they only reach active_stats() when collecting.
+        visited = pruned = replaced = own = 0
+        # Each entry is a far subtree still to visit plus the squared distance
+        # from the query to the splitting plane that separated it.
+        pending = [(self.root, 0.0)] if self.root is not None else []
+        while pending:
+            node, plane_distance_sq = pending.pop()
+            if plane_distance_sq > (-best_neighbors[0][0] if len(best_neighbors) >= k else radius_sq):
+                pruned += 1
+                continue
+            while node is not None:
+                visited += 1
+                split_point = node.point
+                if split_point[0] == query_id:
+                    own = 1
                 else:
-                    current_worst = -best_neighbors[0][0]
-                    current_pair_ids = tuple(sorted((best_neighbors[0][1][0], query_point[0])))
-                    candidate_pair_ids = tuple(sorted((split_point[0], query_point[0])))
-                    if distance_sq < current_worst or (
-                        distance_sq == current_worst and candidate_pair_ids < current_pair_ids
-                    ):
-                        heapq.heapreplace(best_neighbors, (-distance_sq, split_point))
-            axis = node.axis
-            query_axis_value = query_point[axis + 1]
-            node_axis_value = split_point[axis + 1]
-            visit_left_first = query_axis_value <= node_axis_value
-            near_branch = node.left if visit_left_first else node.right
-            far_branch = node.right if visit_left_first else node.left
-            search(near_branch)
-
-            if len(best_neighbors) < k or (query_axis_value - node_axis_value) ** 2 <= -best_neighbors[0][0]:
-                search(far_branch)
-
-        search(self.root)
+                    distance_sq = (qx - split_point[1]) ** 2 + (qy - split_point[2]) ** 2 + (qz - split_point[3]) ** 2
+                    if len(best_neighbors) < k:
+                        if distance_sq <= radius_sq:
+                            heappush(best_neighbors, (-distance_sq, split_point))
+                    else:
+                        current_worst = -best_neighbors[0][0]
+                        if distance_sq < current_worst or (
+                            distance_sq == current_worst and split_point[0] < best_neighbors[0][1][0]
+                        ):
+                            heapreplace(best_neighbors, (-distance_sq, split_point))
+                            replaced += 1
+                axis = node.axis + 1
+                axis_gap = query_point[axis] - split_point[axis]
+                if axis_gap <= 0:
+                    if node.right is not None:
+                        pending.append((node.right, axis_gap ** 2))
+                    node = node.left
+                else:
+                    if node.left is not None:
+                        pending.append((node.left, axis_gap ** 2))
+                    node = node.right
+        stats = active_stats()
+        if stats is not None:
+            stats.add("kdtree.queries")
+            stats.add("kdtree.nodes_visited", visited)
+            stats.add("kdtree.subtrees_pruned", pruned)
+            stats.add("kdtree.distance_evaluations", visited - own)
+            stats.add("kdtree.heap_replacements", replaced)
         return [
             (math.sqrt(-neg_distance), neighbor_point)
             for (neg_distance, neighbor_point) in sorted(best_neighbors, reverse=True)
         ]
 
+    def iter_nearest_neighbors(self, query_point: Point3D) -> Iterator[Tuple[float, Point3D]]:
+        """Lazily yield ``(distance, point)`` for every other point, nearest first.
+
+        Ties come out by id. Each step only expands the tree as far as needed,
+        so a caller can stop, keep the generator, and resume it later.
+        """
+        query_id = query_point[0]
+        query_coords = (query_point[1], query_point[2], query_point[3])
+        qx, qy, qz = query_coords
+        tiebreak = count()
+        stats = active_stats()
+        # Subtrees are keyed by a lower bound on their squared distance, built
+        # from per-axis offsets to the cell; at equal keys they are expanded
+        # before points (0 < 1), so a point is only yielded once nothing left
+        # can be closer or tie with a smaller id.
+        pending = [(0.0, 0, next(tiebreak), self.root, (0.0, 0.0, 0.0))] if self.root is not None else []
+        while pending:
+            entry = heappop(pending)
+            if entry[1] == 1:
+                yield math.sqrt(entry[0]), entry[3]
+                continue
+            bound_sq, _, _, node, offsets = entry
+            if stats is not None:
+                # counted as they happen: a caller may drop the walk at any point
+                stats.add("kdtree.lazy_nodes_expanded")
+            split_point = node.point
+            if split_point[0] != query_id:
+                dx = qx - split_point[1]
+                dy = qy - split_point[2]
+                dz = qz - split_point[3]
+                heappush(pending, (dx * dx + dy * dy + dz * dz, 1, split_point[0], split_point))
+            axis = node.axis
+            axis_gap = query_coords[axis] - split_point[axis + 1]
+            near_branch, far_branch = (node.left, node.right) if axis_gap <= 0 else (node.right, node.left)
+            if near_branch is not None:
+                heappush(pending, (bound_sq, 0, next(tiebreak), near_branch, offsets))
+            if far_branch is not None:
+                far_offsets = list(offsets)
+                far_offsets[axis] = axis_gap * axis_gap
+                # Summed in the same order as the point distances, so rounding
+                # never lifts the bound above a point inside the cell.
+                far_bound_sq = far_offsets[0] + far_offsets[1] + far_offsets[2]
+                heappush(pending, (far_bound_sq, 0, next(tiebreak), far_branch, tuple(far_offsets)))
+
+    def iter_within(self, query_point: Point3D, radius: float) -> Iterator[Tuple[float, Point3D]]:
+        """Yield ``(distance, point)`` for every other point within ``radius``, in tree order."""
+        query_id = query_point[0]
+        qx, qy, qz = query_point[1], query_point[2], query_point[3]
+        # Loose squared prefilter; the reported distance decides, so rounding
+        # of radius * radius cannot drop a pair sitting exactly on the radius.
+        radius_sq = radius * radius * (1 + 1e-9)
+        pending = [self.root] if self.root is not None else []
+        while pending:
+            node = pending.pop()
+            split_point = node.point
+            dx = qx - split_point[1]
+            dy = qy - split_point[2]
+            dz = qz - split_point[3]
+            distance_sq = dx * dx + dy * dy + dz * dz
+            if distance_sq <= radius_sq and split_point[0] != query_id:
+                distance = math.sqrt(distance_sq)
+                if distance <= radius:
+                    yield distance, split_point
+            axis_gap = query_point[node.axis + 1] - split_point[node.axis + 1]
+            if node.left is not None and axis_gap <= radius:
+                pending.append(node.left)
+            if node.right is not None and -axis_gap <= radius:
+                pending.append(node.right)
+
+    def pairs_within(self, radius: float) -> Iterator[Tuple[float, Tuple[Point3D, Point3D]]]:
+        """Lazily yield every pair of points at most ``radius`` apart.
+
+        Pairs come as ``(distance, (a, b))`` with ``a[0] < b[0]``, each once,
+        in no particular order; the cost grows with the number of pairs found,
+        not with any k.
+        """
+        pending = [self.root] if self.root is not None else []
+        while pending:
+            node = pending.pop()
+            point = node.point
+            for distance, neighbor in self.iter_within(point, radius):
+                if point[0] < neighbor[0]:
+                    yield distance, (point, neighbor)
+            if node.left is not None:
+                pending.append(node.left)
+            if node.right is not None:
+                pending.append(node.right)
+
+    def query_many(self, query_points, k: int = 1, query_ids=None, max_radius: Optional[float] = None):
+        """k nearest neighbors of a whole batch of query points (needs NumPy).
+
+        ``query_points`` is an (m, 3) array or a list of ``Point3D`` tuples.
+        Returns ``(distances, neighbor_ids)``, two (m, k) arrays ordered by
+        (distance, id) and padded with ``inf`` / ``-1``; see ``BatchKNN3D``.
+        ``max_radius`` drops neighbors farther than that, as in
+        ``find_nearest_neighbors``.
+        """
+        if self._batch_index is None:
+            self._batch_index = self._build_batch_index()
+        return self._batch_index.query(query_points, k, query_ids, max_radius=max_radius)
+
+    def _build_batch_index(self):
+        from src.task2_3d.batch_knn import BatchKNN3D
 
-def find_closest_pair_3d(drone_points: List[Point3D]):
+        return BatchKNN3D(*self.layout())
+
+    def layout(self):
+        """``(coordinates, ids, axes)`` arrays of the tree points in the implicit KD layout.
+
+        Row ``(lo + hi) // 2`` of a range ``[lo, hi)`` is its node, as in
+        ``presorted_kd_layout``; ``BatchKNN3D`` and ``from_layout`` take them.
+        """
+        if self._layout is not None:
+            return self._layout
+        import numpy as np
+
+        # An in-order walk lists the nodes in the implicit median layout.
+        ordered_points = []
+        axes = []
+        pending = []
+        node = self.root
+        while pending or node is not None:
+            while node is not None:
+                pending.append(node)
+                node = node.left
+            node = pending.pop()
+            ordered_points.append(node.point)
+            axes.append(node.axis)
+            node = node.right
+        coordinates = np.array([point[1:4] for point in ordered_points], dtype=np.float64).reshape(-1, 3)
+        ids = np.array([point[0] for point in ordered_points], dtype=np.int64)
+        return coordinates, ids, np.array(axes, dtype=np.uint8)
+
+
+def find_closest_pair_3d(
+    drone_points: List[Point3D], method: str = "kdtree", workers: int = 1, tree: Optional[KDTree3D] = None
+):
+    # workers > 1 runs the nearest-neighbour pass of the tree methods in that
+    # many processes over shared memory; see parallel_knn_3d. The tree methods
+    # read a PointStore's arrays in place and report its pair as (row_a, row_b).
+    # tree is a prebuilt KDTree3D of these points, e.g. from kdtree_file.load_kdtree,
+    # queried instead of building one.
+    if method not in {"kdtree", "flat_kdtree", "grid"}:
+        raise ValueError("method must be one of: kdtree, flat_kdtree, grid")
+    if workers > 1 and method == "grid":
+        raise ValueError("workers > 1 needs method: kdtree, flat_kdtree")
+    if tree is not None:
+        if method != "kdtree" or workers > 1:
+            raise ValueError("a prebuilt tree needs method: kdtree and workers=1")
+        tree.check_indexes(drone_points)
     if len(drone_points) < 2:
         return None, float("inf")
-    kd_tree = KDTree3D(drone_points)
-    best_pair = None
-    best_distance = float("inf")
-    for point in drone_points:
-        nearest_neighbors = kd_tree.nearest(point, k=2)
-        for distance, neighbor in nearest_neighbors:
-            if neighbor[0] == point[0]:
-                continue
-            if distance < best_distance - 1e-12 or (
-                abs(distance - best_distance) <= 1e-12
-                and tuple(sorted((point[0], neighbor[0])))
-                < tuple(sorted((best_pair[0][0], best_pair[1][0])))
-                if best_pair
-                else True
-            ):
-                best_pair = (point, neighbor)
-                best_distance = distance
-    if best_pair[0][0] <= best_pair[1][0]:
-        return best_pair, best_distance
+    from src.common.point_store import PointStore
+
+    store = drone_points if isinstance(drone_points, PointStore) else None
+    if method == "grid":
+        from src.task2_3d.closest_pair_grid_3d import find_closest_pair_grid_3d
+
+        if store is None:
+            return find_closest_pair_grid_3d(drone_points)
+        best_pair, best_distance = find_closest_pair_grid_3d(store.to_points())
+        return (store.pair_rows(best_pair) if best_pair is not None else None), best_distance
+    if workers > 1:
+        from src.task2_3d.parallel_knn_3d import query_all_parallel
+
+        distances, neighbor_ids = query_all_parallel(drone_points, 1, workers)
+    elif tree is not None:
+        if store is not None:
+            distances, neighbor_ids = tree.query_many(store.coordinates, 1, store.ids)
+        else:
+            distances, neighbor_ids = tree.query_many(drone_points, k=1)
+    elif store is not None:
+        # Neighbours come back in (distance, id) order whatever the tree,
+        # so the array engine under query_many finds the same pairs.
+        from src.task2_3d.batch_knn import BatchKNN3D
+
+        perm, axes = presorted_kd_layout(store.coordinates)
+        distances, neighbor_ids = BatchKNN3D(store.coordinates[perm], store.ids[perm], axes).query(
+            store.coordinates, 1, store.ids
+        )
     else:
-        return (best_pair[1], best_pair[0]), best_distance
+        if method == "flat_kdtree":
+            from src.task2_3d.flat_kdtree_3d import FlatKDTree3D
+
+            kd_tree = FlatKDTree3D(drone_points)
+        else:
+            kd_tree = KDTree3D(drone_points)
+        distances, neighbor_ids = kd_tree.query_many(drone_points, k=1)
+    distances = distances[:, 0]
+    neighbor_ids = neighbor_ids[:, 0]
+    best_distance = float(distances.min())
+    if best_distance == float("inf"):
+        return None, best_distance
+    if store is not None:
+        import numpy as np
 
+        rows = (distances <= best_distance + 1e-12).nonzero()[0]
+        pair_ids = np.sort(np.stack((store.ids[rows], neighbor_ids[rows]), axis=1), axis=1)
+        best = np.lexsort((pair_ids[:, 1], pair_ids[:, 0]))[0]
+        return tuple(store.rows(pair_ids[best]).tolist()), float(distances[rows[best]])
+    id_to_point = {point[0]: point for point in drone_points}
+    best_pair = None
+    for row in (distances <= best_distance + 1e-12).nonzero()[0].tolist():
+        point = drone_points[row]
+        neighbor = id_to_point[int(neighbor_ids[row])]
+        pair = (point, neighbor) if point[0] <= neighbor[0] else (neighbor, point)
+        if best_pair is None or (pair[0][0], pair[1][0]) < (best_pair[0][0], best_pair[1][0]):
+            best_pair = pair
+            best_distance = float(distances[row])
+    return best_pair, best_distance
 
 if __name__ == "__main__":
     sample_points = [(0, 0, 0, 0), (1, 1, 1, 1), (2, 0.1, 0.1, 0.1)]
@@ -0,0 +1,94 @@
+# Built KDTree3D indexes on disk: a fixed header, then the tree's layout arrays,
+# memory-mapped on load so a warm start reads nothing up front and processes
+# opening the same file share its pages
+
+import hashlib
+import os
+import struct
+
+from src.common.point_store import point_arrays
+from src.task2_3d.kdtree_3d import KDTree3D
+
+# magic, format version, point count, fingerprint of the indexed points;
+# padded so the arrays start aligned
+_HEADER = struct.Struct("<8sIxxxxQ32s")
+_HEADER_SIZE = 64
+_MAGIC = b"KDTREE3D"
+_VERSION = 1
+
+
+def points_fingerprint(points) -> bytes:
+    """32-byte BLAKE2b digest of a point set, whatever order its points are in.
+
+    Takes a list of ``(id, x, y, z)`` tuples or a ``PointStore``. Points are
+    hashed sorted by id, then coordinates, so a tree built from a list (which
+    ``KDTree3D`` sorts in place) still matches the list afterwards.
+    """
+    ids, coordinates = point_arrays(points, 3)
+    return _fingerprint(ids, coordinates)
+
+
+def _fingerprint(ids, coordinates) -> bytes:
+    import numpy as np
+
+    ids = np.asarray(ids, dtype="<i8")
+    coordinates = np.asarray(coordinates, dtype="<f8").reshape(-1, 3)
+    order = np.lexsort((coordinates[:, 2], coordinates[:, 1], coordinates[:, 0], ids))
+    digest = hashlib.blake2b(digest_size=32)
+    digest.update(len(ids).to_bytes(8, "little"))
+    digest.update(np.ascontiguousarray(ids[order]).tobytes())
+    digest.update(np.ascontiguousarray(coordinates[order]).tobytes())
+    return digest.digest()
+
+
+def read_kdtree_header(path):
+    """``(point_count, fingerprint)`` of a tree file; raises ``ValueError`` if it is not one."""
+    with open(path, "rb") as handle:
+        header = handle.read(_HEADER_SIZE)
+    if len(header) < _HEADER_SIZE:
+        raise ValueError(f"{path}: not a KD-tree file")
+    magic, version, point_count, fingerprint = _HEADER.unpack_from(header)
+    if magic != _MAGIC:
+        raise ValueError(f"{path}: not a KD-tree file")
+    if version != _VERSION:
+        raise ValueError(f"{path}: unsupported KD-tree file version {version}")
+    # coordinates (3 x float64), ids (int64) and split axes (uint8) per point
+    expected = _HEADER_SIZE + point_count * 33
+    if os.path.getsize(path) < expected:
+        raise ValueError(f"{path}: truncated KD-tree file, expected {expected} bytes")
+    return point_count, fingerprint
+
+
+def save_kdtree(tree: KDTree3D, path):
+    """Write ``tree`` with the fingerprint of its points; ``load_kdtree`` maps it back."""
+    import numpy as np
+
+    coordinates, ids, axes = tree.layout()
+    coordinates = np.ascontiguousarray(coordinates, dtype="<f8")
+    ids = np.ascontiguousarray(ids, dtype="<i8")
+    with open(path, "wb") as handle:
+        handle.write(_HEADER.pack(_MAGIC, _VERSION, len(ids), _fingerprint(ids, coordinates)).ljust(_HEADER_SIZE, b"\0"))
+        coordinates.tofile(handle)
+        ids.tofile(handle)
+        np.ascontiguousarray(axes, dtype=np.uint8).tofile(handle)
+
+
+def load_kdtree(path, points=None) -> KDTree3D:
+    """The tree saved at ``path``, over read-only memory maps of the file.
+
+    With ``points`` the file's fingerprint is checked against theirs first
+    and a ``ValueError`` says the index is stale if they differ. Loading
+    itself only reads the header; the file must outlive the tree.
+    """
+    import numpy as np
+
+    point_count, fingerprint = read_kdtree_header(path)
+    if points is not None and points_fingerprint(points) != fingerprint:
+        raise ValueError(f"{path}: stale KD-tree, built from different points")
+    if point_count == 0:
+        return KDTree3D.from_layout(np.empty((0, 3)), np.empty(0, dtype=np.int64), np.empty(0, dtype=np.uint8))
+    ids_offset = _HEADER_SIZE + point_count * 24
+    coordinates = np.memmap(path, dtype="<f8", mode="r", offset=_HEADER_SIZE, shape=(point_count, 3))
+    ids = np.memmap(path, dtype="<i8", mode="r", offset=ids_offset, shape=(point_count,))
+    axes = np.memmap(path, dtype=np.uint8, mode="r", offset=ids_offset + point_count * 8, shape=(point_count,))
+    return KDTree3D.from_layout(coordinates, ids, axes, fingerprint=fingerprint)
@@ -0,0 +1,64 @@
+"""Batched kNN over every drone, with the queries split into slabs across processes."""
+
+from typing import Dict, List, Optional, Tuple
+
+from src.common.point_store import point_arrays
+from src.common.shared_pool import SharedArrayPool, slab_bounds
+from src.task2_3d.batch_knn import BatchKNN3D
+from src.task2_3d.kdtree_3d import presorted_kd_layout
+
+Point3D = Tuple[int, float, float, float]
+
+_SLABS_PER_WORKER = 4  # more slabs than workers evens out dense and sparse regions
+
+
+def shared_knn_arrays(drone_points: List[Point3D]) -> Dict[str, object]:
+    """The arrays a ``SharedArrayPool`` needs for ``worker_knn_index``.
+
+    ``coordinates``, ``ids`` and ``axes`` list the points in the implicit KD
+    layout, built once here with ``presorted_kd_layout``; row ``i`` is
+    ``drone_points[perm[i]]``. The same rows serve as queries, so a slab of
+    rows is a compact region of space and its kth distances shrink fast.
+    ``drone_points`` may be a ``PointStore``.
+    """
+    ids, coordinates = point_arrays(drone_points, 3)
+    perm, axes = presorted_kd_layout(coordinates)
+    return {"coordinates": coordinates[perm], "ids": ids[perm], "axes": axes, "perm": perm}
+
+
+def worker_knn_index(arrays, cache) -> BatchKNN3D:
+    """The worker's ``BatchKNN3D`` over the shared layout, built on first use."""
+    index = cache.get("knn")
+    if index is None:
+        index = cache["knn"] = BatchKNN3D(arrays["coordinates"], arrays["ids"], arrays["axes"])
+    return index
+
+
+def _knn_slab(arrays, cache, start: int, stop: int, k: int, max_radius: Optional[float]):
+    return worker_knn_index(arrays, cache).query(
+        arrays["coordinates"][start:stop], k, arrays["ids"][start:stop], max_radius=max_radius
+    )
+
+
+def query_all_parallel(drone_points: List[Point3D], k: int, workers: int, max_radius: Optional[float] = None):
+    """``KDTree3D(drone_points).query_many(drone_points, k)`` computed by ``workers`` processes.
+
+    Returns the same ``(distances, neighbor_ids)`` (n, k) arrays, row ``i``
+    for ``drone_points[i]``. Each worker rebuilds only the NumPy box tree
+    over the shared KD layout, never the point tuples.
+    """
+    import numpy as np
+
+    arrays = shared_knn_arrays(drone_points)
+    tasks = [
+        (start, stop, k, max_radius)
+        for start, stop in slab_bounds(len(drone_points), workers * _SLABS_PER_WORKER)
+    ]
+    with SharedArrayPool(arrays, workers) as pool:
+        results = pool.map(_knn_slab, tasks)
+    distances = np.full((len(drone_points), k), np.inf)
+    neighbor_ids = np.full((len(drone_points), k), -1, dtype=np.int64)
+    if results:
+        distances[arrays["perm"]] = np.concatenate([result[0] for result in results])
+        neighbor_ids[arrays["perm"]] = np.concatenate([result[1] for result in results])
+    return distances, neighbor_ids
@@ -0,0 +1,110 @@
+"""Fixed-radius self-join in 3D: every drone pair at most a separation threshold apart."""
+
+from typing import Iterator, List, Tuple
+
+from src.task2_3d.kdtree_3d import KDTree3D
+
+Point3D = Tuple[int, float, float, float]
+PairOut = Tuple[float, Tuple[Point3D, Point3D]]
+
+_CELLS_PER_AXIS_LIMIT = 1 << 20  # keeps the packed cell keys inside int64
+
+
+def find_pairs_within_chunks_3d(drone_points: List[Point3D], radius: float, chunk_size: int = 1 << 16):
+    """Cell-grid self-join yielding ``(index_a, index_b, distances)`` NumPy chunks (needs NumPy).
+
+    Indices point into ``drone_points``; every pair with distance at most
+    ``radius`` is reported once, chunk by chunk, with at most ``chunk_size``
+    candidate pairs examined per chunk. Points are bucketed into cubic cells
+    at least ``radius`` wide, so only a cell and its 13 forward neighbours
+    need comparing.
+    """
+    if radius < 0:
+        raise ValueError("radius must be non-negative")
+    return _grid_pair_chunks(drone_points, radius, chunk_size)
+
+
+def _grid_pair_chunks(drone_points: List[Point3D], radius: float, chunk_size: int):
+    if len(drone_points) < 2:
+        return
+    import numpy as np
+
+    coordinates = np.array([point[1:4] for point in drone_points], dtype=np.float64)
+    low = coordinates.min(axis=0)
+    extent = coordinates.max(axis=0) - low
+    cell_size = max(radius, float(extent.max()) / _CELLS_PER_AXIS_LIMIT, 1e-300)
+    cells = ((coordinates - low) // cell_size).astype(np.int64)
+    strides = cells.max(axis=0) + 3
+    keys = (cells[:, 0] * strides[1] + cells[:, 1]) * strides[2] + cells[:, 2]
+
+    order = np.argsort(keys, kind="stable")
+    cell_keys, cell_start, cell_count = np.unique(keys[order], return_index=True, return_counts=True)
+    sorted_coordinates = coordinates[order]
+
+    offsets = [
+        (dx * int(strides[1]) + dy) * int(strides[2]) + dz
+        for dx in (-1, 0, 1)
+        for dy in (-1, 0, 1)
+        for dz in (-1, 0, 1)
+        if (dx, dy, dz) >= (0, 0, 0)
+    ]
+    step = max(1, chunk_size)
+    for offset in offsets:
+        # Cell pairs (source, target) for this offset, then every point pair
+        # across them, numbered in cell-pair order and expanded chunk_size
+        # numbers at a time, so a crowded cell pair is split over chunks too.
+        target = np.searchsorted(cell_keys, cell_keys + offset)
+        target_clipped = np.minimum(target, cell_keys.size - 1)
+        present = cell_keys[target_clipped] == cell_keys + offset
+        source = np.nonzero(present)[0]
+        target = target_clipped[present]
+        pair_counts = cell_count[source] * cell_count[target]
+        ends = np.cumsum(pair_counts)
+        total = int(ends[-1]) if ends.size else 0
+        for first in range(0, total, step):
+            candidate = np.arange(first, min(total, first + step))
+            owner = np.searchsorted(ends, candidate, "right")
+            local = candidate - (ends[owner] - pair_counts[owner])
+            target_count = cell_count[target[owner]]
+            slot_a = cell_start[source[owner]] + local // target_count
+            slot_b = cell_start[target[owner]] + local % target_count
+            if offset == 0:
+                keep = slot_a < slot_b
+                slot_a, slot_b = slot_a[keep], slot_b[keep]
+            delta = sorted_coordinates[slot_a] - sorted_coordinates[slot_b]
+            dx, dy, dz = delta[:, 0], delta[:, 1], delta[:, 2]
+            distances = np.sqrt(dx * dx + dy * dy + dz * dz)
+            within = distances <= radius
+            if within.any():
+                yield order[slot_a[within]], order[slot_b[within]], distances[within]
+
+
+def find_pairs_within_3d(drone_points: List[Point3D], radius: float, method: str = "kdtree") -> Iterator[PairOut]:
+    """Lazily yield ``(distance, (a, b))`` for every pair at most ``radius`` apart, ``a[0] < b[0]``.
+
+    ``method="kdtree"`` walks ``KDTree3D.pairs_within``; ``method="grid"``
+    streams ``find_pairs_within_chunks_3d``. Either way the cost follows the
+    number of pairs reported; the order of the pairs is unspecified.
+    """
+    if method not in {"kdtree", "grid"}:
+        raise ValueError("method must be one of: kdtree, grid")
+    if radius < 0:
+        raise ValueError("radius must be non-negative")
+    if method == "kdtree":
+        return KDTree3D(list(drone_points)).pairs_within(radius)
+    return _grid_pairs(drone_points, radius)
+
+
+def _grid_pairs(drone_points: List[Point3D], radius: float) -> Iterator[PairOut]:
+    for index_a, index_b, distances in find_pairs_within_chunks_3d(drone_points, radius):
+        for a, b, distance in zip(index_a.tolist(), index_b.tolist(), distances.tolist()):
+            point_a, point_b = drone_points[a], drone_points[b]
+            if point_a[0] > point_b[0]:
+                point_a, point_b = point_b, point_a
+            yield distance, (point_a, point_b)
+
+
+if __name__ == "__main__":
+    sample_points = [(0, 0, 0, 0), (1, 1, 1, 1), (2, 0.1, 0.1, 0.1), (3, 0.5, 0.5, 0.5)]
+    print(sorted(find_pairs_within_3d(sample_points, 0.8)))
+    print(sorted(find_pairs_within_3d(sample_points, 0.8, method="grid")))
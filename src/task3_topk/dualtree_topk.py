@@ -0,0 +1,177 @@
+"""Top-k closest pairs with a single dual-tree traversal of a KD-tree against itself."""
+
+import heapq
+import math
+from typing import List, Tuple
+
+from src.common.point_store import PointStore, point_arrays
+
+Point3D = Tuple[int, float, float, float]
+PairOut = Tuple[float, Tuple[Point3D, Point3D]]
+
+
+class _BoxTree:
+    """Bucketed KD-tree over point indices, with a bounding box per node.
+
+    Node ``i`` owns ``perm[node_lo[i]:node_hi[i]]``; inner nodes split their
+    widest box axis at the median, and ranges of at most ``leaf_size`` points
+    are leaves.
+    """
+
+    def __init__(self, coordinates, leaf_size: int):
+        import numpy as np
+
+        self.perm = np.arange(coordinates.shape[0])
+        self.node_lo, self.node_hi = [], []
+        self.node_left, self.node_right = [], []
+        self.box_min, self.box_max = [], []
+        pending = [(0, coordinates.shape[0], -1, False)]
+        while pending:
+            lo, hi, parent, is_right = pending.pop()
+            node = len(self.node_lo)
+            segment = self.perm[lo:hi]
+            points = coordinates[segment]
+            low, high = points.min(axis=0), points.max(axis=0)
+            self.node_lo.append(lo)
+            self.node_hi.append(hi)
+            self.node_left.append(-1)
+            self.node_right.append(-1)
+            self.box_min.append(low.tolist())
+            self.box_max.append(high.tolist())
+            if parent >= 0:
+                if is_right:
+                    self.node_right[parent] = node
+                else:
+                    self.node_left[parent] = node
+            if hi - lo > leaf_size:
+                axis = int(np.argmax(high - low))
+                mid = (lo + hi) // 2
+                self.perm[lo:hi] = segment[np.argpartition(points[:, axis], mid - lo)]
+                pending.append((mid, hi, node, True))
+                pending.append((lo, mid, node, False))
+
+    def box_distance_sq(self, node_a: int, node_b: int) -> float:
+        min_a, max_a = self.box_min[node_a], self.box_max[node_a]
+        min_b, max_b = self.box_min[node_b], self.box_max[node_b]
+        distance_sq = 0.0
+        for axis in range(3):
+            if min_b[axis] > max_a[axis]:
+                gap = min_b[axis] - max_a[axis]
+                distance_sq += gap * gap
+            elif min_a[axis] > max_b[axis]:
+                gap = min_a[axis] - max_b[axis]
+                distance_sq += gap * gap
+        return distance_sq
+
+
+def find_topk_pairs_dualtree(points: List[Point3D], k: int, leaf_size: int = 32, epsilon: float = 0.0) -> List[PairOut]:
+    """Exact top-k closest pairs in one best-first pass over node pairs (needs NumPy).
+
+    Node pairs come off a queue in order of box distance. Leaf pairs are
+    compared as whole distance blocks, and the walk stops as soon as the
+    nearest remaining box pair is farther than the current k-th pair, so
+    there is no restart loop. Output order and ties match
+    ``find_topk_pairs_baseline``. A ``PointStore`` is read in place and its
+    pairs are given as rows. With ``epsilon`` > 0 a box pair is pruned once
+    it is farther than the k-th distance over 1 + epsilon, which makes the
+    answer (1 + epsilon)-approximate; see ``find_topk_pairs_approx``.
+    """
+    if epsilon < 0:
+        raise ValueError("epsilon must be non-negative")
+    if k <= 0 or len(points) < 2:
+        return []
+    import numpy as np
+
+    ids, coordinates = point_arrays(points, 3)
+    tree = _BoxTree(np.ascontiguousarray(coordinates), max(1, leaf_size))
+    perm = tree.perm
+    ordered = coordinates[perm]
+    ordered_ids = ids[perm]
+    node_lo, node_hi = tree.node_lo, tree.node_hi
+    node_left, node_right = tree.node_left, tree.node_right
+    shrink = 1.0 + epsilon
+
+    # Max-heap of the best k pairs on (distance, smaller id, larger id), kept
+    # negated; entries carry the two slots in tree order.
+    best: List[Tuple[float, int, int, int, int]] = []
+
+    def kth_distance() -> float:
+        return -best[0][0] if len(best) >= k else math.inf
+
+    def add_block(slots_a, slots_b, distances):
+        bound = kth_distance()
+        keep = distances <= bound
+        if not keep.any():
+            return
+        slots_a, slots_b, distances = slots_a[keep], slots_b[keep], distances[keep]
+        if distances.size > k:
+            keep = distances <= np.partition(distances, k - 1)[k - 1]
+            slots_a, slots_b, distances = slots_a[keep], slots_b[keep], distances[keep]
+        ids_a, ids_b = ordered_ids[slots_a], ordered_ids[slots_b]
+        for distance, slot_a, slot_b, id_a, id_b in zip(
+            distances.tolist(), slots_a.tolist(), slots_b.tolist(), ids_a.tolist(), ids_b.tolist()
+        ):
+            if id_a > id_b:
+                id_a, id_b = id_b, id_a
+                slot_a, slot_b = slot_b, slot_a
+            entry = (-distance, -id_a, -id_b, slot_a, slot_b)
+            if len(best) < k:
+                heapq.heappush(best, entry)
+            elif entry > best[0]:
+                heapq.heapreplace(best, entry)
+
+    def leaf_pair(node_a: int, node_b: int):
+        slots_a = np.arange(node_lo[node_a], node_hi[node_a])
+        slots_b = np.arange(node_lo[node_b], node_hi[node_b])
+        if node_a == node_b:
+            first, second = np.triu_indices(slots_a.size, 1)
+            slots_a, slots_b = slots_a[first], slots_a[second]
+            delta = ordered[slots_a] - ordered[slots_b]
+        else:
+            delta = ordered[slots_a][:, None, :] - ordered[slots_b][None, :, :]
+            slots_a, slots_b = np.broadcast_arrays(slots_a[:, None], slots_b[None, :])
+            slots_a, slots_b, delta = slots_a.ravel(), slots_b.ravel(), delta.reshape(-1, 3)
+        dx, dy, dz = delta[:, 0], delta[:, 1], delta[:, 2]
+        add_block(slots_a, slots_b, np.sqrt(dx * dx + dy * dy + dz * dz))
+
+    # A node paired with itself covers the pairs inside it, a pair of distinct
+    # nodes the pairs across them, so every point pair is reached exactly once.
+    pending = [(0.0, 0, 0)]
+    while pending:
+        distance_sq, node_a, node_b = heapq.heappop(pending)
+        if math.sqrt(distance_sq) * shrink > kth_distance():
+            break
+        a_is_leaf = node_left[node_a] < 0
+        b_is_leaf = node_left[node_b] < 0
+        if node_a == node_b:
+            if a_is_leaf:
+                leaf_pair(node_a, node_a)
+                continue
+            left, right = node_left[node_a], node_right[node_a]
+            heapq.heappush(pending, (0.0, left, left))
+            heapq.heappush(pending, (0.0, right, right))
+            heapq.heappush(pending, (tree.box_distance_sq(left, right), left, right))
+        elif a_is_leaf and b_is_leaf:
+            leaf_pair(node_a, node_b)
+        else:
+            # Split the larger node; the other one is kept whole.
+            if b_is_leaf or (
+                not a_is_leaf and node_hi[node_a] - node_lo[node_a] >= node_hi[node_b] - node_lo[node_b]
+            ):
+                node_a, node_b = node_b, node_a
+            for child in (node_left[node_b], node_right[node_b]):
+                child_distance_sq = tree.box_distance_sq(node_a, child)
+                if math.sqrt(child_distance_sq) * shrink <= kth_distance():
+                    heapq.heappush(pending, (child_distance_sq, node_a, child))
+
+    as_rows = isinstance(points, PointStore)
+    result = []
+    for neg_distance, _, _, slot_a, slot_b in sorted(best, reverse=True):
+        row_a, row_b = int(perm[slot_a]), int(perm[slot_b])
+        result.append((-neg_distance, (row_a, row_b) if as_rows else (points[row_a], points[row_b])))
+    return result
+
+
+if __name__ == "__main__":
+    pts = [(0, 0, 0, 0), (1, 1, 1, 1), (2, 0.1, 0.1, 0.1), (3, 10, 10, 10)]
+    print(find_topk_pairs_dualtree(pts, 3))
@@ -0,0 +1,23 @@
+"""(1 + epsilon)-approximate top-k closest pairs from a dual-tree walk with relaxed pruning."""
+
+from typing import List, Tuple
+
+from src.task3_topk.dualtree_topk import find_topk_pairs_dualtree
+
+Point3D = Tuple[int, float, float, float]
+PairOut = Tuple[float, Tuple[Point3D, Point3D]]
+
+
+def find_topk_pairs_approx(points: List[Point3D], k: int, epsilon: float = 0.1, leaf_size: int = 32) -> List[PairOut]:
+    """k pairs whose i-th distance is at most (1 + epsilon) times the true i-th smallest one.
+
+    ``find_topk_pairs_dualtree`` with every box pair pruned once its box
+    distance exceeds D / (1 + epsilon), D the current k-th distance. D only
+    shrinks, so every pair never looked at is farther than D / (1 + epsilon)
+    for the final D. If one of the true i nearest pairs was missed, the true
+    i-th distance is above D / (1 + epsilon), and the i-th answer, at most
+    D, is within the factor; otherwise the i-th answer is exact. Output is
+    ordered by distance; with ``epsilon=0`` it is the exact answer, ties
+    included.
+    """
+    return find_topk_pairs_dualtree(points, k, leaf_size=leaf_size, epsilon=epsilon)
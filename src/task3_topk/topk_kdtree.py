@@ -4,17 +4,16 @@ import math
 import heapq
 from typing import List, Tuple, Set, Optional, Dict
 
+from src.common.instrumentation import active_stats
+from src.common.point_store import PointStore
 from src.task2_3d.kdtree_3d import KDTree3D
+from src.task3_topk.dualtree_topk import find_topk_pairs_dualtree
 
 Point3D = Tuple[int, float, float, float]
 PairOut = Tuple[float, Tuple[Point3D, Point3D]]
 
 _EPS = 1e-12
-
-
-def _pair_key(a: Point3D, b: Point3D) -> Tuple[int, int]:
-    ia, ib = a[0], b[0]
-    return (ia, ib) if ia <= ib else (ib, ia)
+_QUERY_CHUNK = 4096  # query points per query_many call, bounds the (m, k) result arrays
 
 
 def find_topk_pairs_baseline(points: List[Point3D], k: int) -> List[PairOut]: # this is a baseline function to find the top k closest pairs of points
@@ -40,68 +39,116 @@ def find_topk_pairs_baseline(points: List[Point3D], k: int) -> List[PairOut]: #
     return heapq.nsmallest(k, candidates, key=lambda x: (x[0], x[1][0][0], x[1][1][0]))
 
 
-def find_topk_pairs_optimized(points: List[Point3D], k: int, neighbor_k: Optional[int] = None) -> List[PairOut]: # this is an optimized function to find the top k closest pairs of points using a KD-Tree
+class BoundedPairHeap:
+    """The k best pairs seen so far, ordered like ``find_topk_pairs_baseline``.
+
+    Keeps at most k entries plus their id pairs, so feeding it every kNN
+    candidate costs O(k) memory. A pair offered twice is kept once; one that
+    was evicted can never come back, since the k-th key only decreases.
+    """
+
+    def __init__(self, k: int):
+        self.k = k
+        self._heap: List[Tuple[float, int, int, Tuple[Point3D, Point3D]]] = []
+        self._keys: Set[Tuple[int, int]] = set()
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def push(self, dist: float, a: Point3D, b: Point3D):
+        if a[0] > b[0]:
+            a, b = b, a
+        key = (a[0], b[0])
+        if key in self._keys:
+            return
+        # Max-heap on (dist, smaller id, larger id) through negation.
+        entry = (-dist, -a[0], -b[0], (a, b))
+        if len(self._heap) < self.k:
+            heapq.heappush(self._heap, entry)
+        elif entry[:3] > self._heap[0][:3]:
+            evicted = heapq.heapreplace(self._heap, entry)
+            self._keys.discard((-evicted[1], -evicted[2]))
+            stats = active_stats()
+            if stats is not None:
+                stats.add("topk.heap_replacements")
+        else:
+            return
+        self._keys.add(key)
+
+    def kth_distance(self) -> float:
+        return -self._heap[0][0] if len(self._heap) >= self.k else float("inf")
+
+    def pairs(self) -> List[PairOut]:
+        return [(-entry[0], entry[3]) for entry in sorted(self._heap, key=lambda entry: entry[:3], reverse=True)]
+
+
+def find_topk_pairs_optimized(points: List[Point3D], k: int, neighbor_k: Optional[int] = None, workers: int = 1, tree: Optional[KDTree3D] = None) -> List[PairOut]: # this is an optimized function to find the top k closest pairs of points using a KD-Tree
+    # tree is a prebuilt KDTree3D of these points (see kdtree_file.load_kdtree); without one it is built here
     if k <= 0 or len(points) < 2:
         return []
+    if tree is not None:
+        if workers > 1:
+            raise ValueError("a prebuilt tree needs workers=1")
+        tree.check_indexes(points)
+    if workers > 1:
+        from src.task3_topk.topk_parallel import find_topk_pairs_parallel
+
+        return find_topk_pairs_parallel(points, k, neighbor_k=neighbor_k, workers=workers)
 
     if neighbor_k is None:
         neighbor_k = max(k + 1, 32)
 
-    tree = KDTree3D(points)
+    if tree is None:
+        tree = KDTree3D(points)
     id_to_point: Dict[int, Point3D] = {p[0]: p for p in points}
 
-    nk = max(1, neighbor_k)
-    while True:
-        candidates: List[PairOut] = []
-        seen: Set[Tuple[int, int]] = set()
-        radii: Dict[int, float] = {}
-
-        for p in points:
-            neighs = tree.find_nearest_neighbors(p, k=nk + 1)
+    nk = min(max(1, neighbor_k), len(points) - 1)
+    best = BoundedPairHeap(k)
+    radii: List[float] = []
+
+    # Candidates stream straight into the k-heap, and its k-th distance caps
+    # the search radius of the next chunk. A row cut short by that radius has
+    # every unseen neighbour beyond the final dk, so it counts as certified.
+    for start in range(0, len(points), _QUERY_CHUNK):
+        chunk = points[start : start + _QUERY_CHUNK]
+        dists, neigh_ids = tree.query_many(chunk, k=nk + 1, max_radius=best.kth_distance() + _EPS)
+        for p, row_dists, row_ids in zip(chunk, dists.tolist(), neigh_ids.tolist()):
             far = 0.0
             cnt = 0
-            for dist, q in neighs:
-                if q[0] == p[0]:
-                    continue
-                q_now = id_to_point.get(q[0], q)
+            for dist, qid in zip(row_dists, row_ids):
+                if qid < 0:
+                    break
                 cnt += 1
                 if dist > far:
                     far = dist
-                key = _pair_key(p, q_now)
-                if key in seen:
-                    continue
-                seen.add(key)
-                if p[0] <= q_now[0]:
-                    candidates.append((dist, (p, q_now)))
-                else:
-                    candidates.append((dist, (q_now, p)))
-            radii[p[0]] = far if cnt > 0 else float("inf")
-
-        if not candidates:
-            if nk >= len(points) - 1:
-                return []
-            nk = min(len(points) - 1, max(nk + 1, nk * 2))
-            continue
-
-        best = heapq.nsmallest(k, candidates, key=lambda x: (x[0], x[1][0][0], x[1][1][0]))
-        dk = best[-1][0] if len(best) >= k else float("inf")
-
-        if len(best) < k:
-            if nk >= len(points) - 1:
-                return best
-            nk = min(len(points) - 1, max(nk + 1, nk * 2))
+                best.push(dist, p, id_to_point[qid])
+            radii.append(far if cnt == nk + 1 else float("inf"))
+
+    # A point whose farthest known neighbour is still within dk may hide a
+    # closer pair. Only those points walk on, lazily, until their next
+    # neighbour is past dk; new pairs can only lower dk, so one pass certifies.
+    stats = active_stats()
+    certified_rows = walked = reached = 0
+    for p, radius in zip(points, radii):
+        if radius > best.kth_distance() + _EPS:
             continue
-
-        certified = True
-        for rid in radii.values():
-            if rid <= dk + _EPS:
-                certified = False
+        certified_rows += 1
+        steps = 0
+        for dist, q in tree.iter_nearest_neighbors(p):
+            steps += 1
+            best.push(dist, p, id_to_point[q[0]])
+            if dist > best.kth_distance() + _EPS:
                 break
+        walked += steps
+        reached = max(reached, steps)
+    if stats is not None:
+        stats.add("topk.first_round_rows", len(points))
+        stats.record_max("topk.nk", nk)
+        stats.add("topk.certification_rows", certified_rows)
+        stats.add("topk.certification_steps", walked)
+        stats.record_max("topk.nk_reached", max(nk, reached))
 
-        if certified or nk >= len(points) - 1:
-            return best
-
-        nk = min(len(points) - 1, max(nk + 1, nk * 2))
+    return best.pairs()
 
 
 def find_top_k_pairs( # finding the top k closest pairs
@@ -112,30 +159,64 @@ def find_top_k_pairs( # finding the top k closest pairs
     exact_threshold: int = 2000,
     neighbor_k: Optional[int] = None,
     validate_on_small: bool = False,
+    workers: int = 1,
+    epsilon: float = 0.1,
+    tree: Optional[KDTree3D] = None,
 ) -> List[PairOut]:
+    # workers > 1 runs the optimized engine's kNN passes in that many processes.
+    # tree, a prebuilt KDTree3D of these points, spares the serial optimized
+    # engine its build (and is what validate_on_small checks against); the
+    # other engines cannot use one, so it is an error with them.
+    # method="approx" trades exactness for speed: each returned distance is
+    # within 1 + epsilon of the true one of the same rank; see topk_approx.
+    # A PointStore is read in place by dualtree and the parallel engine and
+    # turned into tuples for the rest; its pairs come back as (row_a, row_b).
 
     n = len(points)
 
-    if method not in {"auto", "exact", "optimized"}:
-        raise ValueError("method must be one of: auto, exact, optimized")
+    if method not in {"auto", "exact", "optimized", "dualtree", "approx"}:
+        raise ValueError("method must be one of: auto, exact, optimized, dualtree, approx")
+    if tree is not None and (method not in {"auto", "exact", "optimized"} or workers > 1):
+        raise ValueError("a prebuilt tree needs method: auto, exact, optimized and workers=1")
+
+    if method == "dualtree":
+        return find_topk_pairs_dualtree(points, k)
+
+    if method == "approx":
+        from src.task3_topk.topk_approx import find_topk_pairs_approx
+
+        return find_topk_pairs_approx(points, k, epsilon)
 
     if method == "auto":
         use_exact = n <= exact_threshold
     else:
         use_exact = (method == "exact")
 
+    if isinstance(points, PointStore) and (use_exact or workers <= 1):
+        pairs = find_top_k_pairs(
+            points.to_points(),
+            k,
+            method="exact" if use_exact else "optimized",
+            neighbor_k=neighbor_k,
+            validate_on_small=validate_on_small,
+            tree=tree,
+        )
+        rows = points.rows([point[0] for _, pair in pairs for point in pair]).tolist()
+        return [(distance, (rows[2 * i], rows[2 * i + 1])) for i, (distance, _) in enumerate(pairs)]
+
     if use_exact:
         exact = find_topk_pairs_baseline(points, k)
         if validate_on_small:
-            approx = find_topk_pairs_optimized(points, k, neighbor_k=neighbor_k)
+            approx = find_topk_pairs_optimized(points, k, neighbor_k=neighbor_k, tree=tree)
             if exact != approx:
                 raise AssertionError("Validation failed: optimized output != baseline output for this dataset.")
         return exact
 
-    return find_topk_pairs_optimized(points, k, neighbor_k=neighbor_k)
+    return find_topk_pairs_optimized(points, k, neighbor_k=neighbor_k, workers=workers, tree=tree)
 
 
 if __name__ == "__main__":
     pts = [(0, 0, 0, 0), (1, 1, 1, 1), (2, 0.1, 0.1, 0.1), (3, 10, 10, 10)]
     print("Exact:", find_top_k_pairs(pts, 3, method="exact"))
     print("Opt  :", find_top_k_pairs(pts, 3, method="optimized"))
+    print("Dual :", find_top_k_pairs(pts, 3, method="dualtree"))
@@ -0,0 +1,142 @@
+"""Top-k closest pairs with the kNN passes of the optimized engine split across processes."""
+
+from typing import List, Optional, Tuple
+
+from src.common.instrumentation import active_stats
+from src.common.point_store import PointStore
+from src.common.shared_pool import SharedArrayPool, slab_bounds
+from src.task2_3d.parallel_knn_3d import shared_knn_arrays, worker_knn_index
+
+Point3D = Tuple[int, float, float, float]
+PairOut = Tuple[float, Tuple[Point3D, Point3D]]
+
+_EPS = 1e-12
+_QUERY_CHUNK = 4096
+_SLABS_PER_WORKER = 4
+
+
+def _smallest_pairs(distances, ids_lo, ids_hi, k: int):
+    # The k best distinct pairs on (distance, smaller id, larger id), the
+    # order BoundedPairHeap keeps. A pair seen from both ends has the same
+    # distance both times, so duplicates sort next to each other.
+    import numpy as np
+
+    order = np.lexsort((ids_hi, ids_lo, distances))
+    distances, ids_lo, ids_hi = distances[order], ids_lo[order], ids_hi[order]
+    first = np.ones(distances.size, dtype=bool)
+    first[1:] = (ids_lo[1:] != ids_lo[:-1]) | (ids_hi[1:] != ids_hi[:-1])
+    return distances[first][:k], ids_lo[first][:k], ids_hi[first][:k]
+
+
+def _row_pairs(query_ids, distances, neighbor_ids):
+    import numpy as np
+
+    found = neighbor_ids >= 0
+    own = np.broadcast_to(query_ids[:, None], neighbor_ids.shape)[found]
+    other = neighbor_ids[found]
+    return distances[found], np.minimum(own, other), np.maximum(own, other)
+
+
+def _first_round_slab(arrays, cache, start: int, stop: int, nk: int, k: int):
+    # The serial first round on one slab. Each worker keeps one top-k across
+    # all its slabs and returns it with every slab, so the union of the
+    # returned sets holds the global top-k. Its k-th distance is a valid
+    # bound for everyone and goes to the shared ``bound`` cell; a racing
+    # write can only leave a looser bound there, never a wrong one. Also
+    # returns, per row, the farthest neighbour found, or inf when the row was
+    # cut short by the bound and so is certified already.
+    import numpy as np
+
+    index = worker_knn_index(arrays, cache)
+    shared_bound = arrays["bound"]
+    best = cache.get("best", (np.empty(0), np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)))
+    farthest = []
+    for chunk_start in range(start, stop, _QUERY_CHUNK):
+        chunk_stop = min(stop, chunk_start + _QUERY_CHUNK)
+        query_ids = arrays["ids"][chunk_start:chunk_stop]
+        distances, neighbor_ids = index.query(
+            arrays["coordinates"][chunk_start:chunk_stop], nk + 1, query_ids, max_radius=float(shared_bound[0])
+        )
+        full = neighbor_ids[:, nk] >= 0
+        farthest.append(np.where(full, distances[:, nk], np.inf))
+        pairs = _row_pairs(query_ids, distances, neighbor_ids)
+        best = _smallest_pairs(*(np.concatenate((held, new)) for held, new in zip(best, pairs)), k)
+        if best[0].size >= k and best[0][k - 1] + _EPS < shared_bound[0]:
+            shared_bound[0] = best[0][k - 1] + _EPS
+    cache["best"] = best
+    return best, np.concatenate(farthest) if farthest else np.empty(0)
+
+
+def _expand_rows(arrays, cache, rows, nk: int, bound: float):
+    # Uncertified rows ask for twice as many neighbours within ``bound``
+    # until each one's farthest result is past it or the row runs out.
+    import numpy as np
+
+    index = worker_knn_index(arrays, cache)
+    point_count = arrays["ids"].size
+    collected = []
+    count = nk + 1
+    while rows.size:
+        count = min(2 * count, point_count - 1)
+        query_ids = arrays["ids"][rows]
+        distances, neighbor_ids = index.query(arrays["coordinates"][rows], count, query_ids, max_radius=bound)
+        collected.append(_row_pairs(query_ids, distances, neighbor_ids))
+        open_rows = (neighbor_ids[:, count - 1] >= 0) & (count < point_count - 1)
+        rows = rows[open_rows]
+    if not collected:
+        return np.empty(0), np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    return tuple(np.concatenate(parts) for parts in zip(*collected))
+
+
+def find_topk_pairs_parallel(
+    points: List[Point3D], k: int, neighbor_k: Optional[int] = None, workers: int = 2
+) -> List[PairOut]:
+    """``find_topk_pairs_optimized`` with its kNN passes run by ``workers`` processes.
+
+    The points go to shared memory once, with a KD layout built in this
+    process. Workers run the streaming first round on slabs of query rows,
+    sharing the tightest k-th distance any of them has found, and send back
+    their top-k plus per-row certification radii; the
+    merged k-th distance then decides which rows need the second,
+    expanding round, again spread over the pool. Output and ties match the
+    serial engine; a ``PointStore`` gets its pairs back as rows.
+    """
+    if k <= 0 or len(points) < 2:
+        return []
+    import numpy as np
+
+    if neighbor_k is None:
+        neighbor_k = max(k + 1, 32)
+    nk = min(max(1, neighbor_k), len(points) - 1)
+    arrays = shared_knn_arrays(points)
+    arrays["bound"] = np.array([np.inf])
+    slabs = slab_bounds(len(points), workers * _SLABS_PER_WORKER)
+    with SharedArrayPool(arrays, workers) as pool:
+        results = pool.map(_first_round_slab, [(start, stop, nk, k) for start, stop in slabs])
+        best = _smallest_pairs(*(np.concatenate(parts) for parts in zip(*(result[0] for result in results))), k)
+        farthest = np.concatenate([result[1] for result in results])
+        bound = (best[0][k - 1] if best[0].size >= k else np.inf) + _EPS
+        uncertified = np.nonzero(farthest <= bound)[0]
+        stats = active_stats()
+        if stats is not None:
+            # the expansion rounds themselves run, and would count, in the workers
+            stats.add("topk.first_round_rows", len(points))
+            stats.record_max("topk.nk", nk)
+            stats.add("topk.certification_rows", uncertified.size)
+        if uncertified.size:
+            pieces = [uncertified[start:stop] for start, stop in slab_bounds(uncertified.size, workers)]
+            expanded = pool.map(_expand_rows, [(rows, nk, bound) for rows in pieces])
+            best = _smallest_pairs(
+                *(np.concatenate(parts) for parts in zip(best, *expanded)), k
+            )
+
+    ids = arrays["ids"]
+    by_id = np.argsort(ids, kind="stable")
+    rows_lo = arrays["perm"][by_id[np.searchsorted(ids, best[1], sorter=by_id)]]
+    rows_hi = arrays["perm"][by_id[np.searchsorted(ids, best[2], sorter=by_id)]]
+    if isinstance(points, PointStore):
+        return list(zip(best[0].tolist(), zip(rows_lo.tolist(), rows_hi.tolist())))
+    return [
+        (distance, (points[row_lo], points[row_hi]))
+        for distance, row_lo, row_hi in zip(best[0].tolist(), rows_lo.tolist(), rows_hi.tolist())
+    ]
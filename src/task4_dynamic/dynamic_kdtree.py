@@ -4,23 +4,52 @@ from typing import List, Tuple, Dict, Optional, Set
 import random
 import heapq
 import math
+from collections import deque
+from itertools import chain
+from operator import itemgetter
 
+from src.common.instrumentation import active_stats
 from src.task2_3d.kdtree_3d import KDTree3D
-from src.task3_topk.topk_kdtree import find_top_k_pairs
+from src.task3_topk.topk_kdtree import BoundedPairHeap, find_top_k_pairs
+from src.task4_dynamic.incremental_topk import IncrementalTopK
+from src.task4_dynamic.logarithmic_index import LogarithmicIndex3D
+from src.task4_dynamic.snapshot_index import SnapshotIndex3D
 
 Point3D = Tuple[int, float, float, float]
 
+_QUERY_CHUNK = 4096  # query points per query_many call, bounds the (m, k) result arrays
+
 
 class DynamicDrones3D: 
-    def __init__(self, points: List[Point3D], rebuild_threshold: int = 50):
+    def __init__(self, points: List[Point3D], rebuild_threshold: int = 50, index: str = "rebuild"):
+        # index="rebuild" rebuilds one KD-tree every rebuild_threshold updates;
+        # index="logarithmic" keeps a LogarithmicIndex3D current on every update
+        # and answers top-k from an IncrementalTopK, so rebuild_threshold is unused;
+        # index="background" queries a published snapshot while the next one is
+        # built on another thread, and is safe to update and query from many threads.
+        # points may be a PointStore; updates replace whole tuples, so it is
+        # unpacked into them here and results keep naming points by tuple.
+        if index not in {"rebuild", "logarithmic", "background"}:
+            raise ValueError("index must be one of: rebuild, logarithmic, background")
         self.points: List[Point3D] = list(points)
         self.rebuild_threshold = rebuild_threshold
+        self.index = index
 
         self._index: Dict[int, int] = {p[0]: i for i, p in enumerate(self.points)}
 
         self._dirty = 0
         self._dirty_ids: Set[int] = set()
-        self._tree: Optional[KDTree3D] = KDTree3D(self.points)
+        self._tree: Optional[KDTree3D] = None
+        self._log_index: Optional[LogarithmicIndex3D] = None
+        self._incremental: Optional[IncrementalTopK] = None
+        self._background: Optional[SnapshotIndex3D] = None
+        if index == "logarithmic":
+            self._log_index = LogarithmicIndex3D(self.points)
+            self._incremental = IncrementalTopK(self._log_index)
+        elif index == "background":
+            self._background = SnapshotIndex3D(self.points, self._index, rebuild_threshold)
+        else:
+            self._tree = KDTree3D(list(self.points))
         self._cache_k: int = 0
         self._cached_topk = []
 
@@ -28,7 +57,17 @@ class DynamicDrones3D:
         if drone_id not in self._index:
             return
         idx = self._index[drone_id]
-        self.points[idx] = (drone_id, float(new_coords[0]), float(new_coords[1]), float(new_coords[2]))
+        point = (drone_id, float(new_coords[0]), float(new_coords[1]), float(new_coords[2]))
+        if self._background is not None:
+            with self._background.lock:
+                self.points[idx] = point
+                self._background.record([point])
+            return
+        self.points[idx] = point
+        if self._log_index is not None:
+            self._log_index.insert(self.points[idx])
+            self._incremental.update(self.points[idx])
+            return
         self._dirty += 1
         self._dirty_ids.add(drone_id)
 
@@ -36,33 +75,80 @@ class DynamicDrones3D:
             self.rebuild_index()
 
     def rebuild_index(self):
-        self._tree = KDTree3D(self.points)
+        stats = active_stats()
+        if stats is not None:
+            stats.add("dynamic.rebuilds")
+        if self._background is not None:
+            self._background.rebuild()
+            return
+        if self._log_index is not None:
+            self._log_index.compact()
+            return
+        self._tree = KDTree3D(list(self.points))
         self._dirty = 0
         self._dirty_ids.clear()
         self._cache_k = 0
         self._cached_topk = []
 
     def _ensure_fresh_tree_for_query(self):
-        if self._tree is None:
+        if self._tree is None and self._log_index is None:
             self.rebuild_index()
         if self._dirty >= self.rebuild_threshold:
             self.rebuild_index()
 
+    def update_many(self, drone_ids, coordinates): # apply a whole frame of position updates
+        """Move every drone in ``drone_ids`` to the matching row of ``coordinates``.
+
+        ``drone_ids`` is a sequence or array of ids and ``coordinates`` an
+        (m, 3) array-like; unknown ids are ignored and a repeated id keeps its
+        last row. The frame is applied in one pass and the index gets one
+        maintenance decision at the end, so a rebuild never lands mid-frame.
+        """
+        import numpy as np
+
+        id_list = np.asarray(drone_ids).tolist()
+        rows = np.asarray(coordinates, dtype=np.float64).reshape(len(id_list), 3)
+        # map/zip keep the per-drone work in C; only the unknown-id filter
+        # falls back to a Python loop.
+        slots = list(map(self._index.get, id_list))
+        updated = list(zip(id_list, rows[:, 0].tolist(), rows[:, 1].tolist(), rows[:, 2].tolist()))
+        if None in slots:
+            kept = [position for position, slot in enumerate(slots) if slot is not None]
+            slots = [slots[position] for position in kept]
+            updated = [updated[position] for position in kept]
+        if not updated:
+            return
+        if self._background is not None:
+            with self._background.lock:
+                deque(map(self.points.__setitem__, slots, updated), maxlen=0)
+                self._background.record(updated)
+            return
+        deque(map(self.points.__setitem__, slots, updated), maxlen=0)
+        if self._log_index is not None:
+            self._log_index.insert_many(updated)
+            self._incremental.update_many(updated)
+            return
+        self._dirty += len(updated)
+        self._dirty_ids.update(map(itemgetter(0), updated))
+
+        if self._dirty >= self.rebuild_threshold:
+            self.rebuild_index()
+
     def batch_random_walk(self, fraction: float = 0.01, step: float = 1.0, seed=None): # simulation of movement of drones 
-        if seed is not None:
-            random.seed(seed)
+        import numpy as np
 
         n = len(self.points)
         if n == 0:
             return
-        m = max(1, int(n * fraction))
-        selected_ids = random.sample(list(self._index.keys()), m)
-
-        for drone_id in selected_ids:
-            idx = self._index[drone_id]
-            point = self.points[idx]
-            new_coordinates = [coordinate + random.uniform(-step, step) for coordinate in point[1:]]
-            self.update_drone_point(drone_id, (new_coordinates[0], new_coordinates[1], new_coordinates[2]))
+        # Without a seed the walk is drawn from the random module's state, so
+        # random.seed keeps runs reproducible.
+        rng = np.random.default_rng(seed if seed is not None else random.getrandbits(64))
+        m = min(n, max(1, int(n * fraction)))
+        slots = rng.choice(n, size=m, replace=False).tolist()
+        selected = list(map(self.points.__getitem__, slots))
+        coordinates = np.fromiter(chain.from_iterable(selected), np.float64, count=4 * m).reshape(m, 4)[:, 1:]
+        coordinates += rng.uniform(-step, step, size=(m, 3))
+        self.update_many(list(map(itemgetter(0), selected)), coordinates)
 
     def _squared_distance(self, point_a: Point3D, point_b: Point3D) -> float:
         dx = point_a[1] - point_b[1]
@@ -75,43 +161,50 @@ class DynamicDrones3D:
         return (ia, ib) if ia <= ib else (ib, ia)
 
     def _ensure_topk_cache(self, k: int):
-        if k <= self._cache_k and self._cached_topk:
+        # An empty cache is a valid answer too (every pair may touch a moved
+        # drone), so only k decides. A larger k is filled to at least twice
+        # the old one, so a k that keeps growing costs O(log k) passes.
+        if k <= self._cache_k:
             return
+        k = max(k, 2 * self._cache_k)
         self._ensure_fresh_tree_for_query()
         if not self.points or len(self.points) < 2:
             self._cache_k = k
             self._cached_topk = []
             return
         if self._tree is None:
-            self._tree = KDTree3D(self.points)
+            self._tree = KDTree3D(list(self.points))
 
         neighbor_k = max(k + 1, 32)
 
-        seen_pairs = set()
-        candidate_pairs = []
-
-        for point in self.points:
-            neighbors = self._tree.find_nearest_neighbors(point, k=neighbor_k + 1)
-            for distance, neighbor in neighbors:
-                if neighbor[0] == point[0]:
-                    continue
-                pair_key = self._pair_key(point, neighbor)
-                if pair_key in seen_pairs:
-                    continue
-                seen_pairs.add(pair_key)
-                if point[0] <= neighbor[0]:
-                    candidate_pairs.append((distance, (point, neighbor)))
-                else:
-                    candidate_pairs.append((distance, (neighbor, point)))
-
-        self._cached_topk = heapq.nsmallest(
-            k,
-            candidate_pairs,
-            key=lambda x: (x[0], x[1][0][0], x[1][1][0]),
-        )
+        # Stream the candidates through a k-heap whose k-th distance bounds
+        # the next chunk's search, so memory stays O(n + k). Pairs with a
+        # moved drone are measured against the stale tree and current_topk
+        # recomputes them anyway, so they would only take up cache slots.
+        best_pairs = BoundedPairHeap(k)
+        dirty_ids = self._dirty_ids
+        id_to_point = {p[0]: p for p in self.points}
+        for start in range(0, len(self.points), _QUERY_CHUNK):
+            chunk = self.points[start : start + _QUERY_CHUNK]
+            distances, neighbor_ids = self._tree.query_many(
+                chunk, k=neighbor_k + 1, max_radius=best_pairs.kth_distance() + 1e-12
+            )
+            for point, row_distances, row_ids in zip(chunk, distances.tolist(), neighbor_ids.tolist()):
+                for distance, neighbor_id in zip(row_distances, row_ids):
+                    if neighbor_id < 0:
+                        break
+                    if point[0] in dirty_ids or neighbor_id in dirty_ids:
+                        continue
+                    best_pairs.push(distance, point, id_to_point[neighbor_id])
+
+        self._cached_topk = best_pairs.pairs()
         self._cache_k = k
 
     def current_topk(self, k: int): # current top k closest pairs of points
+        if self._incremental is not None:
+            return self._incremental.topk(k)
+        if self._background is not None:
+            return self._background.topk(k)
         self._ensure_fresh_tree_for_query()
         if k <= 0 or len(self.points) < 2:
             return []
@@ -120,7 +213,9 @@ class DynamicDrones3D:
             self._ensure_topk_cache(k)
             return self._cached_topk[:k]
 
-        id_to_point = {p[0]: p for p in self.points}
+        # Looked up through _index rather than an id -> point dict, which
+        # would cost O(n) per query.
+        points, slot = self.points, self._index
 
         self._ensure_topk_cache(max(k, self._cache_k))
 
@@ -128,48 +223,47 @@ class DynamicDrones3D:
         for d, (a, b) in self._cached_topk:
             if a[0] in self._dirty_ids or b[0] in self._dirty_ids:
                 continue
-            aa = id_to_point[a[0]]
-            bb = id_to_point[b[0]]
+            aa = points[slot[a[0]]]
+            bb = points[slot[b[0]]]
             dist = math.sqrt(self._squared_distance(aa, bb))
             base.append((dist, (aa, bb)))
 
         neighbor_k = max(k + 1, 32)
         seen = {self._pair_key(pair[0], pair[1]) for _, pair in base}
 
-        dirty_points = [id_to_point[i] for i in self._dirty_ids if i in id_to_point]
-
-        for i in range(len(dirty_points)):
-            for j in range(i + 1, len(dirty_points)):
-                a = dirty_points[i]
-                b = dirty_points[j]
-                key = self._pair_key(a, b)
-                if key in seen:
-                    continue
-                seen.add(key)
-                dist = math.sqrt(self._squared_distance(a, b))
-                if a[0] <= b[0]:
-                    base.append((dist, (a, b)))
-                else:
-                    base.append((dist, (b, a)))
+        dirty_points = [points[slot[i]] for i in self._dirty_ids if i in slot]
+
+        def add_neighbors(queries, neighbor_ids):
+            for p, row_ids in zip(queries, neighbor_ids.tolist()):
+                for q_id in row_ids:
+                    if q_id < 0:
+                        break
+                    q = points[slot[q_id]]
+                    key = self._pair_key(p, q)
+                    if key in seen:
+                        continue
+                    seen.add(key)
+                    dist = math.sqrt(self._squared_distance(p, q))
+                    if p[0] <= q[0]:
+                        base.append((dist, (p, q)))
+                    else:
+                        base.append((dist, (q, p)))
+
+        # Moved drones against each other, from a tree of their current
+        # positions: a pair in the top k has each drone among the other's
+        # k + 1 nearest moved drones, so the nearest neighbor_k suffice.
+        if len(dirty_points) > 1:
+            _, neighbor_ids = KDTree3D(list(dirty_points)).query_many(
+                dirty_points, k=min(neighbor_k, len(dirty_points) - 1)
+            )
+            add_neighbors(dirty_points, neighbor_ids)
 
         if self._tree is None:
-            self._tree = KDTree3D(self.points)
-
-        for p in dirty_points:
-            neighs = self._tree.find_nearest_neighbors(p, k=neighbor_k + 1)
-            for _, q_old in neighs:
-                if q_old[0] == p[0]:
-                    continue
-                q = id_to_point.get(q_old[0], q_old)
-                key = self._pair_key(p, q)
-                if key in seen:
-                    continue
-                seen.add(key)
-                dist = math.sqrt(self._squared_distance(p, q))
-                if p[0] <= q[0]:
-                    base.append((dist, (p, q)))
-                else:
-                    base.append((dist, (q, p)))
+            self._tree = KDTree3D(list(self.points))
+
+        # Moved drones against the tree, whose other points are current.
+        _, neighbor_ids = self._tree.query_many(dirty_points, k=neighbor_k + 1)
+        add_neighbors(dirty_points, neighbor_ids)
 
         return heapq.nsmallest(
             k,
@@ -177,6 +271,11 @@ class DynamicDrones3D:
             key=lambda x: (x[0], x[1][0][0], x[1][1][0]),
         )
 
+    def wait_for_rebuild(self, timeout: Optional[float] = None):
+        # Only background mode rebuilds asynchronously; elsewhere this returns at once.
+        if self._background is not None:
+            self._background.wait(timeout)
+
     def current_closest(self): # current closest pair of points
         res = self.current_topk(1)
         if not res:
@@ -184,9 +283,32 @@ class DynamicDrones3D:
         d, pair = res[0]
         return pair, d
 
+    def predicted_topk(self, velocities, k: int, horizon: float, slices: int = 1): # top k pairs by closest approach within horizon
+        # velocities maps drone id -> (vx, vy, vz), a missing id standing still,
+        # or is an (n, 3) array-like in the order of self.points; drones fly
+        # straight from where they are now. Returns (distance, time, (a, b)).
+        from src.task4_dynamic.kinetic_topk import find_topk_approaches
+
+        points = list(self.points)
+        if isinstance(velocities, dict):
+            velocities = [velocities.get(point[0], (0.0, 0.0, 0.0)) for point in points]
+        return find_topk_approaches(points, velocities, k, horizon, slices=slices)
+
+    def predicted_closest(self, velocities, horizon: float, slices: int = 1): # pair that comes closest within horizon
+        res = self.predicted_topk(velocities, 1, horizon, slices)
+        if not res:
+            return None, float("inf"), 0.0
+        d, t, pair = res[0]
+        return pair, d, t
+
 if __name__ == "__main__":
     pts = [(i, float(i), float(i), float(i)) for i in range(100)]
     dyn = DynamicDrones3D(pts, rebuild_threshold=10)
     dyn.update_drone_point(3, (0.05, 0.05, 0.05))
     print(dyn.current_closest())
     print(dyn.current_topk(5))
+    for mode in ("logarithmic", "background"):
+        dyn = DynamicDrones3D(pts, rebuild_threshold=10, index=mode)
+        dyn.update_drone_point(3, (0.05, 0.05, 0.05))
+        print(dyn.current_closest())
+        print(dyn.current_topk(5))
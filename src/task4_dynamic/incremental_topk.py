@@ -0,0 +1,144 @@
+"""Top-k closest pairs kept current under drone moves, repaired per moved drone."""
+
+import heapq
+import math
+from typing import Dict, List, Set, Tuple
+
+from src.common.instrumentation import active_stats
+from src.task2_3d.range_join_3d import find_pairs_within_chunks_3d
+from src.task3_topk.dualtree_topk import find_topk_pairs_dualtree
+from src.task4_dynamic.logarithmic_index import LogarithmicIndex3D
+
+Point3D = Tuple[int, float, float, float]
+PairOut = Tuple[float, Tuple[Point3D, Point3D]]
+
+
+class IncrementalTopK:
+    """Every pair at most ``radius`` apart, from which the top k are read.
+
+    The pair set is complete for its radius, so while it holds at least k
+    pairs its k smallest are the exact answer. A moved drone only repairs
+    its own pairs: they are dropped and re-found with one ball query on the
+    index, which must already hold the new position. Moves are queued and
+    repaired at the next ``topk`` call, so a query costs O(moves since the
+    last query + pairs held), independent of fleet size. When moves thin the
+    set out below k, or k grows, the radius is widened with one exact top-2k
+    pass over the whole fleet, O(n log n) and counted in the instrumentation;
+    when it holds far more than needed, it is cut back in place.
+    """
+
+    def __init__(self, index: LogarithmicIndex3D):
+        self._index = index
+        self.radius = -1.0  # nothing collected yet
+        self._pairs: Dict[Tuple[int, int], float] = {}
+        self._partners: Dict[int, Set[int]] = {}
+        self._members: Dict[int, Point3D] = {}
+        self._pending: Dict[int, Point3D] = {}
+
+    def update(self, point: Point3D):
+        """Record a drone's new position; its pairs are repaired lazily."""
+        self._pending[point[0]] = point
+
+    def update_many(self, points: List[Point3D]):
+        """``update`` for a whole batch."""
+        self._pending.update((point[0], point) for point in points)
+
+    def _drop(self, drone_id: int):
+        for partner in self._partners.pop(drone_id, ()):
+            del self._pairs[(drone_id, partner) if drone_id < partner else (partner, drone_id)]
+            partner_set = self._partners[partner]
+            partner_set.discard(drone_id)
+            if not partner_set:
+                del self._partners[partner]
+                del self._members[partner]
+        self._members.pop(drone_id, None)
+
+    def _add(self, distance: float, point_a: Point3D, point_b: Point3D):
+        id_a, id_b = point_a[0], point_b[0]
+        self._pairs[(id_a, id_b) if id_a < id_b else (id_b, id_a)] = distance
+        self._partners.setdefault(id_a, set()).add(id_b)
+        self._partners.setdefault(id_b, set()).add(id_a)
+        self._members[id_a] = point_a
+        self._members[id_b] = point_b
+
+    def _repair_pending(self):
+        pending, self._pending = self._pending, {}
+        for drone_id, point in pending.items():
+            self._drop(drone_id)
+            if drone_id in self._index and self.radius >= 0:
+                for distance, other in self._index.within(point, self.radius):
+                    self._add(distance, point, other)
+
+    def _widen(self, k: int):
+        # The one step whose cost grows with the fleet: an exact top-2k
+        # dual-tree pass over every point, counted as incremental_topk.widens.
+        # Pairs outside the current radius can lie between drones that never
+        # moved, so no repair of the moved ones alone could find them.
+        stats = active_stats()
+        if stats is not None:
+            stats.add("incremental_topk.widens")
+        points = self._index.points()
+        target = 2 * k
+        widest = find_topk_pairs_dualtree(points, target)
+        if len(widest) < target:
+            # That was every pair there is; an infinite radius keeps it so.
+            self.radius = math.inf
+            for distance, (point_a, point_b) in widest:
+                self._add(distance, point_a, point_b)
+            return
+        # Every pair closer than the 2k-th is among the top 2k, so those are
+        # the complete set for the largest distance below it. Known pairs are
+        # within the old radius and so among them.
+        cutoff = widest[-1][0]
+        closer = [pair for pair in widest if pair[0] < cutoff]
+        if len(closer) >= k and closer[-1][0] >= self.radius:
+            self.radius = closer[-1][0]
+            for distance, (point_a, point_b) in closer:
+                self._add(distance, point_a, point_b)
+            return
+        # Too many pairs tie at the cutoff; only a self-join collects them all.
+        if stats is not None:
+            stats.add("incremental_topk.widen_joins")
+        self.radius = max(self.radius, cutoff)
+        for index_a, index_b, distances in find_pairs_within_chunks_3d(points, self.radius):
+            for a, b, distance in zip(index_a.tolist(), index_b.tolist(), distances.tolist()):
+                self._add(distance, points[a], points[b])
+
+    def _narrow(self, k: int):
+        # Keep the pairs up to the 2k-th smallest distance; ties at that
+        # distance stay too, so the set is still complete for the new radius.
+        keep = 2 * k
+        cutoff = heapq.nsmallest(keep, self._pairs.values())[-1]
+        for (id_a, id_b), distance in list(self._pairs.items()):
+            if distance > cutoff:
+                del self._pairs[(id_a, id_b)]
+                for drone_id, partner in ((id_a, id_b), (id_b, id_a)):
+                    partner_set = self._partners[drone_id]
+                    partner_set.discard(partner)
+                    if not partner_set:
+                        del self._partners[drone_id]
+                        del self._members[drone_id]
+        self.radius = cutoff
+
+    def topk(self, k: int) -> List[PairOut]:
+        """Exact top-k pairs, ordered like ``find_topk_pairs_baseline``."""
+        if k <= 0:
+            return []
+        self._repair_pending()
+        if len(self._pairs) < k and self.radius < math.inf:
+            self._widen(k)
+        elif len(self._pairs) > 8 * k:
+            self._narrow(k)
+        members = self._members
+        best = heapq.nsmallest(k, self._pairs.items(), key=lambda item: (item[1], item[0]))
+        return [(distance, (members[id_a], members[id_b])) for (id_a, id_b), distance in best]
+
+
+if __name__ == "__main__":
+    pts = [(i, float(i), float(i), float(i)) for i in range(100)]
+    index = LogarithmicIndex3D(pts)
+    tracker = IncrementalTopK(index)
+    print(tracker.topk(3))
+    index.insert((3, 0.05, 0.05, 0.05))
+    tracker.update((3, 0.05, 0.05, 0.05))
+    print(tracker.topk(3))
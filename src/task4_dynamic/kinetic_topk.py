@@ -0,0 +1,244 @@
+"""Top-k pairs by closest approach within a time horizon, for drones flying straight at constant velocity."""
+
+import heapq
+import math
+from typing import List, Tuple
+
+from src.common.point_store import PointStore, point_arrays
+
+Point3D = Tuple[int, float, float, float]
+ApproachOut = Tuple[float, float, Tuple[Point3D, Point3D]]
+
+
+def closest_approach(positions_a, velocities_a, positions_b, velocities_b, horizon: float):
+    """Per row, ``(distance, time)`` of closest approach over ``[0, horizon]`` (NumPy arrays, (m, 3) in).
+
+    The gap ``dp + dv * t`` is smallest at ``t = -dp.dv / |dv|^2``, clamped to
+    the horizon; pairs with equal velocities keep their gap and report 0.
+    """
+    import numpy as np
+
+    dp = positions_b - positions_a
+    dv = velocities_b - velocities_a
+    speed_sq = np.einsum("ij,ij->i", dv, dv)
+    closing = -np.einsum("ij,ij->i", dp, dv)
+    moving = speed_sq > 0
+    times = np.zeros(dp.shape[0])
+    # + 0.0 turns a clipped -0.0 into 0.0
+    times[moving] = np.clip(closing[moving] / speed_sq[moving], 0.0, horizon) + 0.0
+    gap = dp + dv * times[:, None]
+    return np.sqrt(np.einsum("ij,ij->i", gap, gap)), times
+
+
+class _SweptBoxTree:
+    """Bucketed KD-tree over drones, split on their mid-horizon positions.
+
+    Each node's box holds every position its drones pass through over the
+    horizon, the union of their swept segments' boxes, so the distance
+    between two boxes bounds every approach between their drones from below.
+    Node ``i`` owns ``perm[node_lo[i]:node_hi[i]]``; ranges of at most
+    ``leaf_size`` drones are leaves.
+    """
+
+    def __init__(self, midpoints, sweep_min, sweep_max, leaf_size: int):
+        import numpy as np
+
+        self.perm = np.arange(midpoints.shape[0])
+        self.node_lo, self.node_hi = [], []
+        self.node_left, self.node_right = [], []
+        self.box_min, self.box_max = [], []
+        pending = [(0, midpoints.shape[0], -1, False)]
+        while pending:
+            lo, hi, parent, is_right = pending.pop()
+            node = len(self.node_lo)
+            segment = self.perm[lo:hi]
+            self.node_lo.append(lo)
+            self.node_hi.append(hi)
+            self.node_left.append(-1)
+            self.node_right.append(-1)
+            self.box_min.append(sweep_min[segment].min(axis=0).tolist())
+            self.box_max.append(sweep_max[segment].max(axis=0).tolist())
+            if parent >= 0:
+                if is_right:
+                    self.node_right[parent] = node
+                else:
+                    self.node_left[parent] = node
+            if hi - lo > leaf_size:
+                points = midpoints[segment]
+                axis = int(np.argmax(points.max(axis=0) - points.min(axis=0)))
+                mid = (lo + hi) // 2
+                self.perm[lo:hi] = segment[np.argpartition(points[:, axis], mid - lo)]
+                pending.append((mid, hi, node, True))
+                pending.append((lo, mid, node, False))
+
+    def box_distance_sq(self, node_a: int, node_b: int) -> float:
+        min_a, max_a = self.box_min[node_a], self.box_max[node_a]
+        min_b, max_b = self.box_min[node_b], self.box_max[node_b]
+        distance_sq = 0.0
+        for axis in range(3):
+            if min_b[axis] > max_a[axis]:
+                gap = min_b[axis] - max_a[axis]
+                distance_sq += gap * gap
+            elif min_a[axis] > max_b[axis]:
+                gap = min_a[axis] - max_b[axis]
+                distance_sq += gap * gap
+        return distance_sq
+
+
+def find_topk_approaches(
+    points: List[Point3D], velocities, k: int, horizon: float, slices: int = 1, leaf_size: int = 32
+) -> List[ApproachOut]:
+    """The k pairs that come closest within ``horizon``, as ``(distance, time, (a, b))`` (needs NumPy).
+
+    Drone ``i`` is at ``points[i] + velocities[i] * t`` for ``t`` in
+    ``[0, horizon]``; ``velocities`` is an (n, 3) array-like in the order of
+    ``points``. ``time`` is when the pair is closest (the earliest such time
+    for pairs that keep their distance). Each of ``slices`` equal spans of
+    the horizon gets one best-first dual-tree pass over the drones' swept
+    boxes, stopping once the nearest remaining box pair is farther than the
+    k-th approach found so far, instead of stepping the fleet through time
+    and querying each frame. More slices mean smaller boxes to prune with
+    and more trees to build; they pay off once drones sweep past several
+    neighbours per horizon. Pairs are ordered by (distance, smaller id,
+    larger id), ``a[0] < b[0]``; with ``horizon=0`` the answer is the top-k
+    closest pairs of the current positions. A ``PointStore`` is read in
+    place and its pairs are given as rows.
+    """
+    if horizon < 0:
+        raise ValueError("horizon must be non-negative")
+    if slices < 1:
+        raise ValueError("slices must be at least 1")
+    if k <= 0 or len(points) < 2:
+        return []
+    import numpy as np
+
+    ids, coordinates = point_arrays(points, 3)
+    velocities = np.asarray(velocities, dtype=np.float64).reshape(-1, 3)
+    if velocities.shape[0] != coordinates.shape[0]:
+        raise ValueError("velocities must have one row per point")
+
+    # Best approach per pair over the slices so far, keyed by (smaller id, larger id).
+    # A pair's approach is the best of its slices, so its true rank can only
+    # improve on what a slice reports, and any pair in the final top k is in
+    # the top k of the slice holding its closest moment.
+    found = {}
+    bound = math.inf
+    for piece in range(slices):
+        start = horizon * piece / slices
+        stop = horizon * (piece + 1) / slices
+        for distance, id_lo, id_hi, time, row_a, row_b in _search_slice(
+            ids, coordinates + velocities * start, velocities, k, stop - start, leaf_size, bound
+        ):
+            time += start
+            known = found.get((id_lo, id_hi))
+            if known is None or (distance, time) < known[:2]:
+                found[(id_lo, id_hi)] = (distance, time, row_a, row_b)
+        if len(found) >= k:
+            bound = heapq.nsmallest(k, (entry[0] for entry in found.values()))[-1]
+
+    as_rows = isinstance(points, PointStore)
+    result = []
+    for (id_lo, id_hi), (distance, time, row_a, row_b) in heapq.nsmallest(
+        k, found.items(), key=lambda item: (item[1][0], item[0])
+    ):
+        result.append((distance, time, (row_a, row_b) if as_rows else (points[row_a], points[row_b])))
+    return result
+
+
+def _search_slice(ids, coordinates, velocities, k: int, horizon: float, leaf_size: int, bound: float):
+    # The best k approaches over [0, horizon] no farther than bound, as
+    # (distance, smaller id, larger id, time, row of smaller id, row of larger id).
+    import numpy as np
+
+    ends = coordinates + velocities * horizon
+    tree = _SweptBoxTree(
+        coordinates + velocities * (horizon / 2),
+        np.minimum(coordinates, ends),
+        np.maximum(coordinates, ends),
+        max(1, leaf_size),
+    )
+    perm = tree.perm
+    ordered = coordinates[perm]
+    ordered_velocities = velocities[perm]
+    ordered_ids = ids[perm]
+    node_lo, node_hi = tree.node_lo, tree.node_hi
+    node_left, node_right = tree.node_left, tree.node_right
+
+    # Max-heap of the best k approaches on (distance, smaller id, larger id),
+    # kept negated; entries carry the time and the two slots in tree order.
+    best: List[Tuple[float, int, int, float, int, int]] = []
+
+    def kth_distance() -> float:
+        return -best[0][0] if len(best) >= k else bound
+
+    def leaf_pair(node_a: int, node_b: int):
+        slots_a = np.arange(node_lo[node_a], node_hi[node_a])
+        slots_b = np.arange(node_lo[node_b], node_hi[node_b])
+        if node_a == node_b:
+            first, second = np.triu_indices(slots_a.size, 1)
+            slots_a, slots_b = slots_a[first], slots_a[second]
+        else:
+            slots_a, slots_b = np.broadcast_arrays(slots_a[:, None], slots_b[None, :])
+            slots_a, slots_b = slots_a.ravel(), slots_b.ravel()
+        distances, times = closest_approach(
+            ordered[slots_a], ordered_velocities[slots_a], ordered[slots_b], ordered_velocities[slots_b], horizon
+        )
+        keep = distances <= kth_distance()
+        if not keep.any():
+            return
+        slots_a, slots_b, distances, times = slots_a[keep], slots_b[keep], distances[keep], times[keep]
+        if distances.size > k:
+            keep = distances <= np.partition(distances, k - 1)[k - 1]
+            slots_a, slots_b, distances, times = slots_a[keep], slots_b[keep], distances[keep], times[keep]
+        ids_a, ids_b = ordered_ids[slots_a], ordered_ids[slots_b]
+        for distance, time, slot_a, slot_b, id_a, id_b in zip(
+            distances.tolist(), times.tolist(), slots_a.tolist(), slots_b.tolist(), ids_a.tolist(), ids_b.tolist()
+        ):
+            if id_a > id_b:
+                id_a, id_b = id_b, id_a
+                slot_a, slot_b = slot_b, slot_a
+            entry = (-distance, -id_a, -id_b, time, slot_a, slot_b)
+            if len(best) < k:
+                heapq.heappush(best, entry)
+            elif entry[:3] > best[0][:3]:
+                heapq.heapreplace(best, entry)
+
+    # Same walk as find_topk_pairs_dualtree: a node paired with itself covers
+    # the pairs inside it, distinct nodes the pairs across them.
+    pending = [(0.0, 0, 0)]
+    while pending:
+        distance_sq, node_a, node_b = heapq.heappop(pending)
+        if math.sqrt(distance_sq) > kth_distance():
+            break
+        a_is_leaf = node_left[node_a] < 0
+        b_is_leaf = node_left[node_b] < 0
+        if node_a == node_b:
+            if a_is_leaf:
+                leaf_pair(node_a, node_a)
+                continue
+            left, right = node_left[node_a], node_right[node_a]
+            heapq.heappush(pending, (0.0, left, left))
+            heapq.heappush(pending, (0.0, right, right))
+            heapq.heappush(pending, (tree.box_distance_sq(left, right), left, right))
+        elif a_is_leaf and b_is_leaf:
+            leaf_pair(node_a, node_b)
+        else:
+            if b_is_leaf or (
+                not a_is_leaf and node_hi[node_a] - node_lo[node_a] >= node_hi[node_b] - node_lo[node_b]
+            ):
+                node_a, node_b = node_b, node_a
+            for child in (node_left[node_b], node_right[node_b]):
+                child_distance_sq = tree.box_distance_sq(node_a, child)
+                if math.sqrt(child_distance_sq) <= kth_distance():
+                    heapq.heappush(pending, (child_distance_sq, node_a, child))
+
+    return [
+        (-neg_distance, -neg_lo, -neg_hi, time, int(perm[slot_a]), int(perm[slot_b]))
+        for neg_distance, neg_lo, neg_hi, time, slot_a, slot_b in best
+    ]
+
+
+if __name__ == "__main__":
+    pts = [(0, 0, 0, 0), (1, 10, 0, 0), (2, 0, 5, 0), (3, 50, 50, 50)]
+    vels = [(1, 0, 0), (-1, 0, 0), (0, 0, 0), (0, 0, 0)]
+    print(find_topk_approaches(pts, vels, 2, horizon=10))
@@ -0,0 +1,215 @@
+"""Bentley–Saxe logarithmic method: a dynamic point index made of static KD-trees."""
+
+import heapq
+import math
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from src.common.instrumentation import active_stats
+from src.task2_3d.kdtree_3d import KDTree3D
+
+Point3D = Tuple[int, float, float, float]
+
+_BUFFER = -1  # home of drones that sit in the unsorted insert buffer
+
+
+class LogarithmicIndex3D:
+    """Dynamic nearest-neighbour index over drones that keep moving.
+
+    New positions go into a small unsorted buffer. A full buffer is merged
+    with the occupied levels below the first free one, like a binary carry,
+    so level ``i`` holds a ``KDTree3D`` of at most ``buffer_size * 2**i``
+    points and every point is rebuilt O(log n) times over its life: updates
+    cost O(log^2 n) amortised instead of a whole-tree rebuild. A moved drone
+    leaves a tombstone in its old tree, which only means the entry no longer
+    matches ``_home``; a tree that is half tombstones is rebuilt on its own.
+    """
+
+    def __init__(self, points: List[Point3D], buffer_size: int = 64):
+        if buffer_size < 1:
+            raise ValueError("buffer_size must be positive")
+        self.buffer_size = buffer_size
+        self._buffer: Dict[int, Point3D] = {}
+        self._levels: List[Optional[KDTree3D]] = []
+        self._level_points: List[List[Point3D]] = []
+        self._level_dead: List[int] = []
+        self._home: Dict[int, int] = {}
+        latest = {point[0]: point for point in points}
+        self._place(list(latest.values()), 0)
+
+    def __len__(self) -> int:
+        return len(self._home)
+
+    def __contains__(self, drone_id: int) -> bool:
+        return drone_id in self._home
+
+    def _capacity(self, level: int) -> int:
+        return self.buffer_size << level
+
+    def _live(self, level: int) -> List[Point3D]:
+        home = self._home
+        return [point for point in self._level_points[level] if home.get(point[0]) == level]
+
+    def _place(self, points: List[Point3D], level: int):
+        # Store ``points`` as one tree at the first level from ``level`` on
+        # that is free and large enough.
+        while level < len(self._levels) and (
+            self._levels[level] is not None or len(points) > self._capacity(level)
+        ):
+            level += 1
+        while len(points) > self._capacity(level):
+            level += 1
+        while len(self._levels) <= level:
+            self._levels.append(None)
+            self._level_points.append([])
+            self._level_dead.append(0)
+        self._levels[level] = KDTree3D(points) if points else None
+        self._level_points[level] = points
+        self._level_dead[level] = 0
+        stats = active_stats()
+        if stats is not None:
+            stats.add("logarithmic.level_builds")
+            stats.add("logarithmic.points_rebuilt", len(points))
+        for point in points:
+            self._home[point[0]] = level
+
+    def _flush(self):
+        carry = list(self._buffer.values())
+        self._buffer.clear()
+        level = 0
+        while level < len(self._levels) and (
+            self._levels[level] is not None or len(carry) > self._capacity(level)
+        ):
+            if self._levels[level] is not None:
+                carry.extend(self._live(level))
+                self._levels[level] = None
+                self._level_points[level] = []
+                self._level_dead[level] = 0
+            level += 1
+        self._place(carry, level)
+
+    def _discard(self, drone_id: int) -> bool:
+        level = self._home.pop(drone_id, None)
+        if level is None:
+            return False
+        if level == _BUFFER:
+            del self._buffer[drone_id]
+        else:
+            self._level_dead[level] += 1
+        return True
+
+    def _maintain(self):
+        if len(self._buffer) >= self.buffer_size:
+            self._flush()
+        for level in range(len(self._levels)):
+            if 2 * self._level_dead[level] > len(self._level_points[level]):
+                # Half of this tree is tombstones: rebuild it from its live
+                # drones, which the deletions since its last build have paid for.
+                live = self._live(level)
+                self._levels[level] = KDTree3D(live) if live else None
+                self._level_points[level] = live
+                self._level_dead[level] = 0
+                stats = active_stats()
+                if stats is not None:
+                    stats.add("logarithmic.level_builds")
+                    stats.add("logarithmic.points_rebuilt", len(live))
+
+    def insert(self, point: Point3D):
+        """Add a drone, or move it if its id is already indexed."""
+        self._discard(point[0])
+        self._buffer[point[0]] = point
+        self._home[point[0]] = _BUFFER
+        self._maintain()
+
+    def insert_many(self, points: List[Point3D]):
+        """``insert`` for a whole batch, with one round of merges at the end."""
+        buffer, home = self._buffer, self._home
+        for point in points:
+            self._discard(point[0])
+            buffer[point[0]] = point
+            home[point[0]] = _BUFFER
+        self._maintain()
+
+    def remove(self, drone_id: int) -> bool:
+        """Drop a drone; returns False if it was not indexed."""
+        removed = self._discard(drone_id)
+        self._maintain()
+        return removed
+
+    def compact(self):
+        """Rebuild every live drone into a single tree, clearing all tombstones."""
+        live = list(self._buffer.values())
+        for level in range(len(self._levels)):
+            if self._levels[level] is not None:
+                live.extend(self._live(level))
+        self._buffer.clear()
+        self._levels, self._level_points, self._level_dead = [], [], []
+        self._place(live, 0)
+
+    def points(self) -> List[Point3D]:
+        """Current position of every indexed drone."""
+        live = list(self._buffer.values())
+        for level in range(len(self._levels)):
+            if self._levels[level] is not None:
+                live.extend(self._live(level))
+        return live
+
+    def _iter_level(self, level: int, query_point: Point3D) -> Iterator[Tuple[float, Point3D]]:
+        home = self._home
+        for distance, point in self._levels[level].iter_nearest_neighbors(query_point):
+            if home.get(point[0]) == level:
+                yield distance, point
+
+    def nearest(
+        self, query_point: Point3D, k: int = 1, max_radius: Optional[float] = None
+    ) -> List[Tuple[float, Point3D]]:
+        """k nearest other drones as ``(distance, point)``, ordered by (distance, id).
+
+        Merges the lazy nearest-first walks of every level with the buffer, so
+        each tree is only expanded as far as the k-th answer.
+        """
+        if k <= 0:
+            return []
+        qx, qy, qz = query_point[1], query_point[2], query_point[3]
+        buffered = []
+        for point in self._buffer.values():
+            if point[0] != query_point[0]:
+                dx = qx - point[1]
+                dy = qy - point[2]
+                dz = qz - point[3]
+                buffered.append((math.sqrt(dx * dx + dy * dy + dz * dz), point))
+        buffered.sort(key=lambda item: (item[0], item[1][0]))
+        streams = [buffered] + [
+            self._iter_level(level, query_point) for level in range(len(self._levels)) if self._levels[level] is not None
+        ]
+        result = []
+        for distance, point in heapq.merge(*streams, key=lambda item: (item[0], item[1][0])):
+            if max_radius is not None and distance > max_radius:
+                break
+            result.append((distance, point))
+            if len(result) == k:
+                break
+        return result
+
+    def within(self, query_point: Point3D, radius: float) -> Iterator[Tuple[float, Point3D]]:
+        """Yield ``(distance, point)`` for every other drone within ``radius``, unordered."""
+        home = self._home
+        qx, qy, qz = query_point[1], query_point[2], query_point[3]
+        for point in list(self._buffer.values()):
+            if point[0] != query_point[0]:
+                dx = qx - point[1]
+                dy = qy - point[2]
+                dz = qz - point[3]
+                distance = math.sqrt(dx * dx + dy * dy + dz * dz)
+                if distance <= radius:
+                    yield distance, point
+        for level in range(len(self._levels)):
+            if self._levels[level] is not None:
+                for distance, point in self._levels[level].iter_within(query_point, radius):
+                    if home.get(point[0]) == level:
+                        yield distance, point
+
+
+if __name__ == "__main__":
+    index = LogarithmicIndex3D([(i, float(i), float(i), float(i)) for i in range(100)], buffer_size=8)
+    index.insert((3, 0.05, 0.05, 0.05))
+    print(index.nearest((0, 0.0, 0.0, 0.0), k=3))
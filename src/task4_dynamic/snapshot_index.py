@@ -0,0 +1,177 @@
+"""Double-buffered KD-tree snapshots, rebuilt on a background thread."""
+
+import heapq
+import math
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from src.common.instrumentation import active_stats
+from src.task2_3d.kdtree_3d import KDTree3D
+from src.task3_topk.topk_kdtree import find_top_k_pairs
+
+Point3D = Tuple[int, float, float, float]
+PairOut = Tuple[float, Tuple[Point3D, Point3D]]
+
+_INITIAL_TOPK = 32  # pairs cached in the first snapshot, before any query has said which k it wants
+
+
+class _Snapshot:
+    """A KD-tree and the positions it was built from; the positions never change.
+
+    ``points`` is indexed by drone slot, like ``DynamicDrones3D.points``. The
+    top-k cache is only ever replaced whole, so readers need no lock.
+    """
+
+    def __init__(self, points: List[Point3D], topk_k: int):
+        self.points = points
+        self.tree = KDTree3D(list(points))
+        # Builds the tree's batch index here rather than on the first query.
+        self.tree.query_many(points[:1], k=1)
+        self._cache: Tuple[int, List[PairOut]] = (0, [])
+        if topk_k > 0:
+            self.topk(topk_k)
+
+    def topk(self, k: int) -> List[PairOut]:
+        cached_k, pairs = self._cache
+        if cached_k < k:
+            pairs = find_top_k_pairs(self.points, k, method="dualtree")
+            self._cache = (k, pairs)
+        return pairs
+
+
+class SnapshotIndex3D:
+    """Queries read an immutable snapshot while the next one is built in the background.
+
+    The owner keeps mutating its position list, holding ``lock``, and reports
+    each moved drone through ``record``. Once ``rebuild_threshold`` drones
+    have moved since the current snapshot, a copy of the positions is taken
+    and a daemon thread builds the next snapshot from it (tree and top-k
+    cache) off the query path; publishing it is a single reference swap.
+    The positions are copied on that thread too, so the updater only pays
+    for the moved set. Queries combine the snapshot with the drones moved
+    since it was copied, like ``DynamicDrones3D``'s rebuild mode does with
+    its dirty set.
+
+    Each snapshot caches the top 2k for twice the largest k asked for so
+    far, ``_INITIAL_TOPK`` for the first one, which is built before the
+    constructor returns. A query for a k beyond the cache runs one exact
+    top-2k pass on its own thread, once per snapshot. A build that raises
+    leaves the old snapshot in place and its exception is raised from the
+    next ``wait`` or ``topk``.
+    """
+
+    def __init__(self, points: List[Point3D], slot: Dict[int, int], rebuild_threshold: int):
+        self.lock = threading.Lock()
+        self.rebuild_threshold = rebuild_threshold
+        self._points = points
+        self._slot = slot
+        self._snapshot = _Snapshot(list(points), _INITIAL_TOPK)
+        self._moved: Dict[int, Point3D] = {}
+        self._builder: Optional[threading.Thread] = None
+        self._topk_hint = _INITIAL_TOPK // 2
+        self._error: Optional[BaseException] = None
+
+    def record(self, points: List[Point3D]):
+        """Note new positions already written to the owner's list; hold ``lock``."""
+        self._moved.update((point[0], point) for point in points)
+        if len(self._moved) >= self.rebuild_threshold:
+            self._start_build()
+
+    def rebuild(self):
+        """Start a background rebuild unless one is already running."""
+        with self.lock:
+            self._start_build()
+
+    def wait(self, timeout: Optional[float] = None):
+        """Block until the running rebuild, if any, has been published; raise what a failed one raised."""
+        builder = self._builder
+        if builder is not None:
+            builder.join(timeout)
+        self._raise_build_error()
+
+    def _raise_build_error(self):
+        with self.lock:
+            error, self._error = self._error, None
+        if error is not None:
+            raise error
+
+    def _start_build(self):
+        if self._builder is not None:
+            return
+        stats = active_stats()
+        if stats is not None:
+            stats.add("dynamic.snapshot_builds")
+        copied = dict(self._moved)
+        # Twice the largest k asked for, so drones moving after the copy
+        # still leave enough cached pairs.
+        self._builder = threading.Thread(target=self._build, args=(copied, 2 * self._topk_hint), daemon=True)
+        self._builder.start()
+
+    def _build(self, copied: Dict[int, Point3D], topk_k: int):
+        try:
+            # Copied without the lock, after the moved set: a drone that moves
+            # in between has a newer point in _moved than in copied, so it
+            # stays moved and the snapshot's position for it is never used.
+            snapshot = _Snapshot(list(self._points), topk_k)
+        except Exception as error:
+            with self.lock:
+                self._builder = None
+                self._error = error
+            return
+        with self.lock:
+            self._snapshot = snapshot
+            # Drones that have not moved again since the copy are now clean.
+            for drone_id, point in copied.items():
+                if self._moved.get(drone_id) is point:
+                    del self._moved[drone_id]
+            self._builder = None
+            if len(self._moved) >= self.rebuild_threshold:
+                self._start_build()
+
+    def topk(self, k: int) -> List[PairOut]:
+        """Top-k pairs over the current positions, ordered like ``find_topk_pairs_baseline``."""
+        self._raise_build_error()
+        if k <= 0 or len(self._points) < 2:
+            return []
+        with self.lock:
+            snapshot = self._snapshot
+            moved = dict(self._moved)
+            self._topk_hint = max(self._topk_hint, k)
+        slot = self._slot
+
+        def current(drone_id: int) -> Point3D:
+            point = moved.get(drone_id)
+            return point if point is not None else snapshot.points[slot[drone_id]]
+
+        def pair_out(point_a: Point3D, point_b: Point3D) -> PairOut:
+            dx = point_a[1] - point_b[1]
+            dy = point_a[2] - point_b[2]
+            dz = point_a[3] - point_b[3]
+            if point_a[0] > point_b[0]:
+                point_a, point_b = point_b, point_a
+            return math.sqrt(dx * dx + dy * dy + dz * dz), (point_a, point_b)
+
+        # Cached pairs of unmoved drones are still exact; every pair with a
+        # moved drone comes from its nearest moved drones or its neighbours in
+        # the snapshot tree.
+        base = [pair for pair in snapshot.topk(2 * k) if pair[1][0][0] not in moved and pair[1][1][0] not in moved]
+        seen = {(pair[1][0][0], pair[1][1][0]) for pair in base}
+        moved_points = list(moved.values())
+        if moved_points:
+            neighbor_k = max(k + 1, 32)
+            # Two moved drones can only form a top-k pair if one is among the
+            # other's k nearest moved drones, so a small tree over them replaces
+            # the all-pairs loop.
+            moved_tree = KDTree3D(list(moved_points))
+            for tree, lookup in ((moved_tree, moved.__getitem__), (snapshot.tree, current)):
+                _, neighbor_ids = tree.query_many(moved_points, k=neighbor_k + 1)
+                for point, row_ids in zip(moved_points, neighbor_ids.tolist()):
+                    for neighbor_id in row_ids:
+                        if neighbor_id < 0:
+                            break
+                        key = (point[0], neighbor_id) if point[0] < neighbor_id else (neighbor_id, point[0])
+                        if key in seen:
+                            continue
+                        seen.add(key)
+                        base.append(pair_out(point, lookup(neighbor_id)))
+        return heapq.nsmallest(k, base, key=lambda pair: (pair[0], pair[1][0][0], pair[1][1][0]))
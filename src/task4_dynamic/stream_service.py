@@ -0,0 +1,308 @@
+"""asyncio front-end that feeds DynamicDrones3D from a line stream and serves top-k queries.
+
+One command per line, one JSON reply line per query command:
+
+    U <id> <x> <y> <z>   position update, no reply
+    Q <k>                top-k closest pairs, 1 <= k <= max_k: {"tick", "pairs": [[distance, id_a, id_b], ...]}
+    C                    closest pair: {"tick", "distance", "pair": [id_a, id_b] or null}
+    S                    the service's counters as JSON
+
+Updates wait in a dict keyed by drone id, so a drone reported several
+times within a tick costs one update, and every ``tick`` seconds the
+waiting ones are applied as one ``update_many`` batch. All work on the
+drones (batches, the rebuilds they trigger, queries) runs in a
+single-thread executor, so the event loop keeps reading while it runs and
+the drones are never touched by two threads at once. Queries for the same
+k arriving within one tick share one ``current_topk`` call. When
+``max_pending`` distinct drones are waiting, readers stop until the next
+batch is taken, which is the backpressure a fast producer feels.
+
+    python -m src.task4_dynamic.stream_service --n 10000 --port 8765
+    python -m src.task4_dynamic.stream_service --n 10000 --stdin < commands.txt
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import sys
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional, Tuple
+
+from src.task4_dynamic.dynamic_kdtree import DynamicDrones3D
+
+_LATENCY_WINDOW = 10_000  # recent latencies kept per counter for the percentiles
+
+
+def _percentiles(samples) -> Dict[str, Optional[float]]:
+    # nearest-rank, as in benchmarks.harness.percentile
+    ordered = sorted(samples)
+    if not ordered:
+        return {"p50": None, "p99": None, "max": None}
+    return {
+        "p50": ordered[max(0, math.ceil(0.50 * len(ordered)) - 1)],
+        "p99": ordered[max(0, math.ceil(0.99 * len(ordered)) - 1)],
+        "max": ordered[-1],
+    }
+
+
+class DroneStreamService:
+    """Coalesces position updates into per-tick batches and shares query results within a tick.
+
+    ``tick`` is the batching interval in seconds and ``max_pending`` the
+    number of distinct waiting drones at which ``update`` starts to wait.
+    ``max_k`` caps the k a query may ask for, since ``current_topk`` holds
+    arrays with k columns per drone.
+    Use ``start()`` / ``stop()`` (or ``async with``) around the handlers.
+    """
+
+    def __init__(self, drones: DynamicDrones3D, tick: float = 0.01, max_pending: int = 100_000, max_k: int = 10_000):
+        if tick <= 0:
+            raise ValueError("tick must be positive")
+        if max_pending < 1:
+            raise ValueError("max_pending must be at least 1")
+        if max_k < 1:
+            raise ValueError("max_k must be at least 1")
+        self.drones = drones
+        self.tick_interval = tick
+        self.max_pending = max_pending
+        self.max_k = max_k
+        self.tick = 0  # batches submitted so far; names the state queries see
+        self._pending: Dict[int, Tuple[float, float, float]] = {}
+        self._room: Optional[asyncio.Event] = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="drones")
+        self._ticker: Optional[asyncio.Task] = None
+        self._stopping: Optional[asyncio.Event] = None
+        self._shared: Dict[Tuple[int, int], asyncio.Future] = {}
+        self.counters = {
+            "updates_received": 0,
+            "updates_coalesced": 0,
+            "updates_applied": 0,
+            "batches": 0,
+            "backpressure_waits": 0,
+            "queries": 0,
+            "queries_shared": 0,
+            "bad_lines": 0,
+            "failed_batches": 0,
+            "failed_queries": 0,
+        }
+        self._batch_latency = deque(maxlen=_LATENCY_WINDOW)
+        self._query_latency = deque(maxlen=_LATENCY_WINDOW)
+        self._backpressure_wait = deque(maxlen=_LATENCY_WINDOW)
+
+    async def start(self):
+        self._room = asyncio.Event()
+        self._room.set()
+        self._stopping = asyncio.Event()
+        self._ticker = asyncio.get_running_loop().create_task(self._tick_loop())
+
+    async def stop(self):
+        # wakes the ticker from its sleep and lets it finish a batch it has
+        # started, applies what is still waiting, then releases the executor
+        self._stopping.set()
+        if self._ticker is not None:
+            await self._ticker
+            self._ticker = None
+        await self.flush()
+        self._executor.shutdown(wait=True)
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.stop()
+
+    async def update(self, drone_id: int, coords: Tuple[float, float, float]):
+        """Queue a position; a later one for the same drone within the tick replaces it."""
+        while len(self._pending) >= self.max_pending and drone_id not in self._pending:
+            self.counters["backpressure_waits"] += 1
+            self._room.clear()
+            t0 = time.perf_counter()
+            await self._room.wait()
+            self._backpressure_wait.append(time.perf_counter() - t0)
+        self.counters["updates_received"] += 1
+        if drone_id in self._pending:
+            self.counters["updates_coalesced"] += 1
+        self._pending[drone_id] = coords
+
+    async def flush(self):
+        """Apply every waiting update now as one batch."""
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, {}
+        if self._room is not None:
+            self._room.set()
+        # The executor runs jobs in submission order, so a query submitted from
+        # here on runs after this batch and must be keyed by the new tick.
+        self.tick += 1
+        t0 = time.perf_counter()
+        await self._run(self.drones.update_many, list(batch), list(batch.values()))
+        self._batch_latency.append(time.perf_counter() - t0)
+        self.counters["updates_applied"] += len(batch)
+        self.counters["batches"] += 1
+
+    async def _tick_loop(self):
+        while not self._stopping.is_set():
+            try:
+                await asyncio.wait_for(self._stopping.wait(), self.tick_interval)
+                break
+            except asyncio.TimeoutError:
+                pass
+            # a failed batch is counted and reported; the ticker keeps going
+            try:
+                await self.flush()
+            except Exception as exc:
+                self.counters["failed_batches"] += 1
+                print(f"batch failed: {exc!r}", file=sys.stderr)
+
+    def _run(self, fn, *args):
+        return asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    async def topk(self, k: int):
+        """``(tick, pairs)``: ``current_topk(k)`` after the last submitted batch, shared within the tick."""
+        self.counters["queries"] += 1
+        t0 = time.perf_counter()
+        key = (self.tick, k)
+        shared = self._shared.get(key)
+        if shared is not None:
+            self.counters["queries_shared"] += 1
+        else:
+            # only this tick's results can still be shared
+            self._shared = {entry: future for entry, future in self._shared.items() if entry[0] == self.tick}
+            shared = self._shared[key] = asyncio.ensure_future(self._run(self.drones.current_topk, k))
+        try:
+            pairs = await asyncio.shield(shared)
+        except Exception:
+            # a failed result is not shared with later queries
+            if self._shared.get(key) is shared:
+                del self._shared[key]
+            raise
+        self._query_latency.append(time.perf_counter() - t0)
+        return key[0], pairs
+
+    def stats(self) -> Dict[str, object]:
+        """Counters plus p50 / p99 / max seconds of batches, queries and backpressure waits."""
+        return {
+            **self.counters,
+            "tick": self.tick,
+            "pending": len(self._pending),
+            "batch_seconds": _percentiles(self._batch_latency),
+            "query_seconds": _percentiles(self._query_latency),
+            "backpressure_seconds": _percentiles(self._backpressure_wait),
+        }
+
+    async def _query_reply(self, k: int, single: bool) -> str:
+        # an error raised by the drones in the executor becomes an error reply,
+        # so it neither ends the connection nor passes for a bad command
+        try:
+            tick, pairs = await self.topk(k)
+        except Exception as exc:
+            self.counters["failed_queries"] += 1
+            return json.dumps({"error": f"query failed: {exc!r}"})
+        if not single:
+            return json.dumps({"tick": tick, "pairs": [[d, a[0], b[0]] for d, (a, b) in pairs]})
+        if not pairs:
+            return json.dumps({"tick": tick, "distance": None, "pair": None})
+        d, (a, b) = pairs[0]
+        return json.dumps({"tick": tick, "distance": d, "pair": [a[0], b[0]]})
+
+    async def handle_line(self, line: str) -> Optional[str]:
+        """Run one protocol line; the JSON reply, or ``None`` for updates and blank lines."""
+        parts = line.split()
+        if not parts:
+            return None
+        command = parts[0].upper()
+        try:
+            if command == "U" and len(parts) == 5:
+                await self.update(int(parts[1]), (float(parts[2]), float(parts[3]), float(parts[4])))
+                return None
+            if command == "Q" and len(parts) == 2:
+                k = int(parts[1])
+                if not 1 <= k <= self.max_k:
+                    raise ValueError(f"k must be between 1 and {self.max_k}")
+                return await self._query_reply(k, single=False)
+            if command == "C" and len(parts) == 1:
+                return await self._query_reply(1, single=True)
+            if command == "S" and len(parts) == 1:
+                return json.dumps(self.stats())
+        except ValueError:
+            pass
+        self.counters["bad_lines"] += 1
+        return json.dumps({"error": f"bad command: {line.strip()}"})
+
+    async def serve_stream(self, reader: asyncio.StreamReader, writer):
+        """Answer one connection (or stdin) line by line until it closes."""
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                reply = await self.handle_line(line.decode(errors="replace"))
+                if reply is not None:
+                    writer.write(reply.encode() + b"\n")
+                    await writer.drain()
+        finally:
+            if hasattr(writer, "close"):
+                writer.close()
+
+
+async def _stdin_reader() -> asyncio.StreamReader:
+    loop = asyncio.get_running_loop()
+    reader = asyncio.StreamReader()
+    await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), sys.stdin)
+    return reader
+
+
+class _StdoutWriter:
+    def write(self, data: bytes):
+        sys.stdout.buffer.write(data)
+
+    async def drain(self):
+        sys.stdout.buffer.flush()
+
+
+async def _main(args):
+    from utils.workloads import generate_workload
+
+    drones = DynamicDrones3D(
+        generate_workload(args.workload, args.n, dims=3, seed=args.seed).to_points(),
+        rebuild_threshold=args.rebuild_threshold,
+        index=args.index,
+    )
+    async with DroneStreamService(
+        drones, tick=args.tick, max_pending=args.max_pending, max_k=args.max_k
+    ) as service:
+        if args.stdin:
+            await service.serve_stream(await _stdin_reader(), _StdoutWriter())
+            return
+        server = await asyncio.start_server(service.serve_stream, args.host, args.port)
+        async with server:
+            print(f"serving on {args.host}:{args.port}", file=sys.stderr)
+            await server.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Line-protocol ingest and top-k query service over DynamicDrones3D")
+    parser.add_argument("--n", type=int, default=10_000, help="drones in the starting fleet")
+    parser.add_argument("--workload", default="uniform")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--index", choices=("rebuild", "logarithmic", "background"), default="rebuild")
+    parser.add_argument("--rebuild-threshold", type=int, default=1_000)
+    parser.add_argument("--tick", type=float, default=0.01, help="seconds between update batches")
+    parser.add_argument("--max-pending", type=int, default=100_000)
+    parser.add_argument("--max-k", type=int, default=10_000, help="largest k a Q command may ask for")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--stdin", action="store_true", help="read commands from stdin, reply on stdout")
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(_main(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
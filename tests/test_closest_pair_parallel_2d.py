@@ -0,0 +1,30 @@
+import random
+
+import pytest
+
+from src.task1_2d.closest_pair_dc import find_closest_pair_2d
+
+
+def _lattice(side, seed):
+    # every neighbour pair ties at distance 1, ids shuffled against position
+    rng = random.Random(seed)
+    ids = list(range(side * side))
+    rng.shuffle(ids)
+    points = [(ids[i], float(i % side), float(i // side)) for i in range(side * side)]
+    rng.shuffle(points)
+    return points
+
+
+def _duplicates(count, seed):
+    # many drones share each position, so the best distance is 0 many times over
+    rng = random.Random(seed)
+    positions = [(float(rng.randrange(20)), float(rng.randrange(20))) for _ in range(count // 5)]
+    ids = list(range(count))
+    rng.shuffle(ids)
+    return [(ids[i], *rng.choice(positions)) for i in range(count)]
+
+
+@pytest.mark.parametrize("workers", [2, 3])
+@pytest.mark.parametrize("points", [_lattice(5, 1), _lattice(12, 2), _duplicates(5, 3), _duplicates(300, 4)])
+def test_parallel_matches_serial_on_ties(points, workers):
+    assert find_closest_pair_2d(list(points), workers=workers) == find_closest_pair_2d(list(points))
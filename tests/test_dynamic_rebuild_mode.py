@@ -0,0 +1,40 @@
+import random
+
+from src.task3_topk.topk_kdtree import find_topk_pairs_baseline
+from src.task4_dynamic.dynamic_kdtree import DynamicDrones3D
+
+
+def _answer(pairs):
+    return [(round(distance, 9), a[0], b[0]) for distance, (a, b) in pairs]
+
+
+def test_pairs_among_moved_drones_are_found():
+    rng = random.Random(3)
+    points = [(i, rng.uniform(0, 100), rng.uniform(0, 100), rng.uniform(0, 100)) for i in range(500)]
+    drones = DynamicDrones3D(points, rebuild_threshold=1000)
+    drones.current_topk(10)
+    # 60 drones gather far from the fleet, so their closest pairs are all
+    # between moved drones the tree still has at their old positions
+    for drone_id in range(0, 300, 5):
+        drones.update_drone_point(drone_id, (rng.uniform(500, 502), rng.uniform(500, 502), rng.uniform(500, 502)))
+    for k in (1, 10, 40):
+        assert _answer(drones.current_topk(k)) == _answer(find_topk_pairs_baseline(sorted(drones.points), k))
+
+
+def test_growing_k_refills_the_cache_geometrically():
+    points = [(i, i + 0.001 * i * i, 0.0, 0.0) for i in range(300)]
+    drones = DynamicDrones3D(points)
+    drones.current_topk(1)
+    tree = drones._tree
+    query_many = tree.query_many
+    passes = []
+
+    def counting_query_many(*args, **kwargs):
+        passes.append(kwargs.get("k"))
+        return query_many(*args, **kwargs)
+
+    tree.query_many = counting_query_many
+    for k in range(2, 65):
+        assert _answer(drones.current_topk(k)) == _answer(find_topk_pairs_baseline(sorted(points), k))
+    # one pass per doubling of k: 2, 4, 8, 16, 32, 64
+    assert len(passes) == 6
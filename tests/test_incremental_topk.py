@@ -0,0 +1,46 @@
+import random
+
+import pytest
+
+from src.common.instrumentation import collect_stats
+from src.task3_topk.topk_kdtree import find_topk_pairs_baseline
+from src.task4_dynamic.incremental_topk import IncrementalTopK
+from src.task4_dynamic.logarithmic_index import LogarithmicIndex3D
+
+
+def _answer(pairs):
+    return [(round(distance, 9), a[0], b[0]) for distance, (a, b) in pairs]
+
+
+@pytest.mark.parametrize("spacing", [None, 1.0])
+def test_matches_baseline_through_moves_and_growing_k(spacing):
+    rng = random.Random(5)
+    if spacing is None:
+        points = [(i, rng.uniform(0, 50), rng.uniform(0, 50), rng.uniform(0, 50)) for i in range(400)]
+    else:
+        # a lattice, where many pairs tie at the cutoff
+        points = [(i, float(i % 8), float(i // 8 % 8), float(i // 64)) for i in range(400)]
+    index = LogarithmicIndex3D(points)
+    tracker = IncrementalTopK(index)
+    current = {point[0]: point for point in points}
+    for step, k in enumerate([3, 3, 10, 10, 40, 5, 60]):
+        for _ in range(20):
+            drone_id = rng.randrange(400)
+            point = (drone_id, rng.uniform(0, 50), rng.uniform(0, 50), rng.uniform(0, 50))
+            current[drone_id] = point
+            index.insert(point)
+            tracker.update(point)
+        expected = find_topk_pairs_baseline(sorted(current.values()), k)
+        assert _answer(tracker.topk(k)) == _answer(expected), step
+
+
+def test_widening_is_counted():
+    # gaps all differ, so no pair ties at a cutoff
+    points = [(i, i + 0.001 * i * i, 0.0, 0.0) for i in range(200)]
+    tracker = IncrementalTopK(LogarithmicIndex3D(points))
+    with collect_stats() as stats:
+        tracker.topk(5)
+        tracker.topk(5)
+        tracker.topk(50)
+    assert stats["incremental_topk.widens"] == 2
+    assert stats["incremental_topk.widen_joins"] == 0
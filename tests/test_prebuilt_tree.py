@@ -0,0 +1,50 @@
+import random
+
+import pytest
+
+from src.task2_3d.kdtree_3d import KDTree3D, find_closest_pair_3d
+from src.task2_3d.kdtree_file import load_kdtree, points_fingerprint, save_kdtree
+from src.task3_topk.topk_kdtree import find_top_k_pairs
+
+
+def _points(count, seed):
+    rng = random.Random(seed)
+    return [(i, rng.uniform(0, 100), rng.uniform(0, 100), rng.uniform(0, 100)) for i in range(count)]
+
+
+def test_tree_over_the_same_points_in_another_order_is_used():
+    points = _points(500, 1)
+    tree = KDTree3D(list(points))
+    shuffled = list(points)
+    random.Random(2).shuffle(shuffled)
+    expected = find_top_k_pairs(list(points), 5, method="optimized")
+    assert find_top_k_pairs(shuffled, 5, method="optimized", tree=tree) == expected
+    assert find_closest_pair_3d(shuffled, tree=tree) == find_closest_pair_3d(list(points))
+
+
+def test_tree_over_other_points_of_the_same_count_is_rejected():
+    tree = KDTree3D(_points(500, 1))
+    moved = _points(500, 1)
+    moved[7] = (7, 1.0, 2.0, 3.0)
+    with pytest.raises(ValueError, match="same points"):
+        find_top_k_pairs(moved, 5, method="optimized", tree=tree)
+    with pytest.raises(ValueError, match="same points"):
+        find_closest_pair_3d(moved, tree=tree)
+
+
+@pytest.mark.parametrize("options", [{"method": "dualtree"}, {"method": "approx"}, {"workers": 2}])
+def test_tree_with_an_engine_that_cannot_use_it_is_rejected(options):
+    points = _points(100, 3)
+    with pytest.raises(ValueError, match="prebuilt tree"):
+        find_top_k_pairs(list(points), 5, tree=KDTree3D(list(points)), **options)
+
+
+def test_loaded_tree_carries_its_file_fingerprint(tmp_path):
+    points = _points(300, 4)
+    path = tmp_path / "tree.kd"
+    save_kdtree(KDTree3D(list(points)), path)
+    tree = load_kdtree(path)
+    assert tree.fingerprint() == points_fingerprint(points) == KDTree3D(list(points)).fingerprint()
+    assert find_top_k_pairs(list(points), 3, method="optimized", tree=tree) == find_top_k_pairs(
+        list(points), 3, method="optimized"
+    )
@@ -0,0 +1,44 @@
+import itertools
+import math
+import random
+
+import pytest
+
+from src.task1_2d.range_join_2d import find_pairs_within_chunks_2d
+from src.task2_3d.range_join_3d import find_pairs_within_chunks_3d
+
+
+def _clustered(count, dims, seed):
+    # a few crowded spots, so single cell pairs hold far more than a chunk
+    rng = random.Random(seed)
+    spots = [tuple(rng.uniform(0, 10) for _ in range(dims)) for _ in range(4)]
+    return [(i, *(c + rng.uniform(-0.05, 0.05) for c in rng.choice(spots))) for i in range(count)]
+
+
+def _brute_force(points, radius):
+    return {
+        (min(a, b), max(a, b))
+        for a, b in itertools.combinations(range(len(points)), 2)
+        if math.dist(points[a][1:], points[b][1:]) <= radius
+    }
+
+
+@pytest.mark.parametrize("dims, join", [(2, find_pairs_within_chunks_2d), (3, find_pairs_within_chunks_3d)])
+@pytest.mark.parametrize("chunk_size", [1, 97, 1 << 16])
+def test_chunks_report_every_pair_once(dims, join, chunk_size):
+    points = _clustered(300, dims, seed=dims)
+    found = []
+    for index_a, index_b, distances in join(points, 0.3, chunk_size=chunk_size):
+        assert len(distances) <= chunk_size
+        found.extend((min(a, b), max(a, b)) for a, b in zip(index_a.tolist(), index_b.tolist()))
+    assert len(found) == len(set(found))
+    assert set(found) == _brute_force(points, 0.3)
+
+
+@pytest.mark.parametrize("dims, join", [(2, find_pairs_within_chunks_2d), (3, find_pairs_within_chunks_3d)])
+def test_one_crowded_cell_is_split_over_chunks(dims, join):
+    # 200 drones on one spot: 40000 candidates in a single cell pair
+    points = [(i, *([1.0] * dims)) for i in range(200)]
+    chunks = list(join(points, 1.0, chunk_size=1000))
+    assert len(chunks) == 40
+    assert sum(len(distances) for _, _, distances in chunks) == 200 * 199 // 2
@@ -0,0 +1,56 @@
+import random
+
+import pytest
+
+from src.task3_topk.topk_kdtree import find_topk_pairs_baseline
+from src.task4_dynamic import snapshot_index
+from src.task4_dynamic.dynamic_kdtree import DynamicDrones3D
+
+
+def _points(count, seed):
+    rng = random.Random(seed)
+    return [(i, rng.uniform(0, 50), rng.uniform(0, 50), rng.uniform(0, 50)) for i in range(count)]
+
+
+def _answer(pairs):
+    return [(round(distance, 9), a[0], b[0]) for distance, (a, b) in pairs]
+
+
+def _no_topk_pass(*args, **kwargs):
+    raise AssertionError("top-k pass on the query thread")
+
+
+def test_first_query_is_served_from_the_first_snapshot(monkeypatch):
+    points = _points(400, 1)
+    drones = DynamicDrones3D(points, index="background")
+    monkeypatch.setattr(snapshot_index, "find_top_k_pairs", _no_topk_pass)
+    assert _answer(drones.current_topk(10)) == _answer(find_topk_pairs_baseline(list(points), 10))
+
+
+def test_failed_build_is_raised_and_the_old_snapshot_kept(monkeypatch):
+    points = _points(400, 2)
+    drones = DynamicDrones3D(points, rebuild_threshold=10, index="background")
+    drones.current_topk(5)
+
+    def broken(*args, **kwargs):
+        raise MemoryError("no room for the snapshot")
+
+    monkeypatch.setattr(snapshot_index, "find_top_k_pairs", broken)
+    rng = random.Random(3)
+    for drone_id in range(10):
+        drones.update_drone_point(drone_id, (rng.uniform(0, 50), rng.uniform(0, 50), rng.uniform(0, 50)))
+    with pytest.raises(MemoryError):
+        drones.wait_for_rebuild()
+    # reported once; queries go on from the old snapshot and the moved drones
+    assert _answer(drones.current_topk(5)) == _answer(find_topk_pairs_baseline(sorted(drones.points), 5))
+
+
+def test_rebuilt_snapshots_match_the_baseline():
+    drones = DynamicDrones3D(_points(600, 4), rebuild_threshold=25, index="background")
+    rng = random.Random(5)
+    for step in range(8):
+        for _ in range(40):
+            drones.update_drone_point(rng.randrange(600), (rng.uniform(0, 50), rng.uniform(0, 50), rng.uniform(0, 50)))
+        if step % 2:
+            drones.wait_for_rebuild()
+        assert _answer(drones.current_topk(8)) == _answer(find_topk_pairs_baseline(sorted(drones.points), 8))
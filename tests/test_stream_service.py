@@ -0,0 +1,165 @@
+import asyncio
+import json
+import threading
+import time
+
+from src.task4_dynamic.dynamic_kdtree import DynamicDrones3D
+from src.task4_dynamic.stream_service import DroneStreamService
+
+
+def _drones():
+    return DynamicDrones3D([(i, float(i), 0.0, 0.0) for i in range(10)])
+
+
+def test_query_behind_slow_batch_reports_its_tick():
+    drones = _drones()
+    update_many = drones.update_many
+    started, release = threading.Event(), threading.Event()
+
+    def slow_update_many(drone_ids, coordinates):
+        started.set()
+        release.wait(5)
+        update_many(drone_ids, coordinates)
+
+    drones.update_many = slow_update_many
+
+    async def run():
+        # a tick this long leaves batching to the explicit flush
+        async with DroneStreamService(drones, tick=3600) as service:
+            await service.handle_line("U 9 0.5 0 0")
+            batch = asyncio.ensure_future(service.flush())
+            await asyncio.get_running_loop().run_in_executor(None, started.wait, 5)
+            query = asyncio.ensure_future(service.handle_line("C"))
+            await asyncio.sleep(0.05)
+            release.set()
+            await batch
+            return json.loads(await query)
+
+    reply = asyncio.run(run())
+    # the query ran on the moved drone, so it is named by the batch's tick
+    assert reply["tick"] == 1
+    assert reply["pair"] == [0, 9]
+    assert reply["distance"] == 0.5
+
+
+def test_failed_query_is_an_error_reply_and_not_shared():
+    drones = _drones()
+    current_topk = drones.current_topk
+    calls = []
+
+    def flaky_current_topk(k):
+        calls.append(k)
+        if len(calls) == 1:
+            raise RuntimeError("index broke")
+        return current_topk(k)
+
+    drones.current_topk = flaky_current_topk
+
+    async def run():
+        async with DroneStreamService(drones, tick=3600) as service:
+            first = json.loads(await service.handle_line("Q 1"))
+            second = json.loads(await service.handle_line("Q 1"))
+            return first, second, service.counters
+
+    first, second, counters = asyncio.run(run())
+    assert "query failed" in first["error"]
+    assert second["tick"] == 0 and second["pairs"] == [[1.0, 0, 1]]
+    assert counters["failed_queries"] == 1 and counters["bad_lines"] == 0
+
+
+def test_value_error_from_the_drones_is_not_a_bad_command():
+    drones = _drones()
+
+    def broken_current_topk(k):
+        raise ValueError("index broke")
+
+    drones.current_topk = broken_current_topk
+
+    async def run():
+        async with DroneStreamService(drones, tick=3600) as service:
+            return json.loads(await service.handle_line("C")), service.counters
+
+    reply, counters = asyncio.run(run())
+    assert "query failed" in reply["error"]
+    assert counters["failed_queries"] == 1 and counters["bad_lines"] == 0
+
+
+def test_k_outside_the_cap_is_a_bad_command():
+    async def run():
+        async with DroneStreamService(_drones(), tick=3600, max_k=5) as service:
+            replies = [json.loads(await service.handle_line(line)) for line in ("Q 6", "Q 0", "Q 5")]
+            return replies, service.counters
+
+    (too_many, zero, capped), counters = asyncio.run(run())
+    assert too_many["error"].startswith("bad command") and zero["error"].startswith("bad command")
+    assert len(capped["pairs"]) == 5
+    assert counters["bad_lines"] == 2
+
+
+def test_failed_batch_does_not_stop_the_ticker():
+    drones = _drones()
+    update_many = drones.update_many
+    calls = []
+
+    def flaky_update_many(drone_ids, coordinates):
+        calls.append(list(drone_ids))
+        if len(calls) == 1:
+            raise RuntimeError("batch broke")
+        update_many(drone_ids, coordinates)
+
+    drones.update_many = flaky_update_many
+
+    async def run():
+        async with DroneStreamService(drones, tick=0.01) as service:
+            await service.handle_line("U 9 0.5 0 0")
+            while not calls:
+                await asyncio.sleep(0.01)
+            await service.handle_line("U 8 0.25 0 0")
+            while len(calls) < 2:
+                await asyncio.sleep(0.01)
+            await asyncio.sleep(0.05)
+            return json.loads(await service.handle_line("C")), service.counters
+
+    reply, counters = asyncio.run(run())
+    assert counters["failed_batches"] == 1 and counters["batches"] == 1
+    assert reply["pair"] == [0, 8]
+
+
+def test_stop_does_not_wait_out_the_tick():
+    async def run():
+        service = DroneStreamService(_drones(), tick=3600)
+        await service.start()
+        await service.handle_line("U 9 0.5 0 0")
+        t0 = time.perf_counter()
+        await service.stop()
+        return time.perf_counter() - t0, service.counters
+
+    seconds, counters = asyncio.run(run())
+    assert seconds < 1.0
+    # stop still applies what was waiting
+    assert counters["updates_applied"] == 1
+
+
+def test_undecodable_line_is_a_bad_command():
+    class Writer:
+        def __init__(self):
+            self.data = b""
+
+        def write(self, data):
+            self.data += data
+
+        async def drain(self):
+            pass
+
+    async def run():
+        async with DroneStreamService(_drones(), tick=3600) as service:
+            reader = asyncio.StreamReader()
+            reader.feed_data(b"Q \xff\xfe\nC\n")
+            reader.feed_eof()
+            writer = Writer()
+            await service.serve_stream(reader, writer)
+            return [json.loads(line) for line in writer.data.splitlines()]
+
+    bad, closest = asyncio.run(run())
+    assert bad["error"].startswith("bad command")
+    assert closest["pair"] == [0, 1]
@@ -0,0 +1,27 @@
+import pytest
+
+from src.task3_topk.dualtree_topk import find_topk_pairs_dualtree
+from src.task3_topk.topk_approx import find_topk_pairs_approx
+from src.task3_topk.topk_kdtree import find_topk_pairs_baseline
+from utils.workloads import generate_workload
+
+
+@pytest.mark.parametrize("workload", ["uniform", "duplicates"])
+@pytest.mark.parametrize("epsilon", [0.2, 1.0, 3.0])
+def test_each_distance_within_the_factor(workload, epsilon):
+    points = generate_workload(workload, 800, dims=3, seed=1).to_points()
+    exact = find_topk_pairs_baseline(list(points), 50)
+    found = find_topk_pairs_approx(list(points), 50, epsilon, leaf_size=8)
+    assert len(found) == len(exact)
+    for (distance, _), (true_distance, _) in zip(found, exact):
+        assert distance <= true_distance * (1 + epsilon) + 1e-12
+
+
+def test_zero_epsilon_is_the_exact_dualtree_answer():
+    points = generate_workload("uniform", 2000, dims=3, seed=2).to_points()
+    assert find_topk_pairs_approx(list(points), 100, 0.0) == find_topk_pairs_dualtree(list(points), 100)
+
+
+def test_negative_epsilon_is_rejected():
+    with pytest.raises(ValueError):
+        find_topk_pairs_approx([(0, 0.0, 0.0, 0.0), (1, 1.0, 0.0, 0.0)], 1, -0.1)
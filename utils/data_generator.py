@@ -15,3 +15,30 @@ def generate_drone_points_3d(point_count, bound=1000, seed=None):
         for index in range(point_count)
     ]
 
+
+# Vectorized generation with NumPy. A seed gives the same drones whether they
+# are made in one piece or streamed in chunks (a different stream from the
+# random-module generators above).
+
+def generate_drone_chunks(point_count, dims=3, bound=1000, seed=None, chunk_size=1 << 20):
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    for start in range(0, point_count, chunk_size):
+        stop = min(point_count, start + chunk_size)
+        yield np.arange(start, stop, dtype=np.int64), rng.random((stop - start, dims)) * bound
+
+def generate_drone_store(point_count, dims=3, bound=1000, seed=None):
+    import numpy as np
+    from src.common.point_store import PointStore
+
+    coordinates = np.random.default_rng(seed).random((point_count, dims)) * bound
+    return PointStore(np.arange(point_count, dtype=np.int64), coordinates)
+
+def generate_drone_snapshot(path, point_count, dims=3, bound=1000, seed=None, chunk_size=1 << 20):
+    # streams to disk, so memory stays at one chunk whatever point_count is
+    from utils.drone_snapshot import SnapshotWriter
+
+    with SnapshotWriter(path, dims) as writer:
+        for ids, coordinates in generate_drone_chunks(point_count, dims, bound, seed, chunk_size):
+            writer.write(ids, coordinates)
@@ -0,0 +1,123 @@
+# Binary drone snapshots: a fixed header, then one fixed-width record per drone
+
+import os
+import struct
+
+from src.common.point_store import PointStore, point_arrays
+
+# magic, format version, dims, point count; padded so records start aligned
+_HEADER = struct.Struct("<8sIIQ")
+_HEADER_SIZE = 64
+_MAGIC = b"DRONESNP"
+_VERSION = 1
+_FIELDS = ("x", "y", "z")
+
+
+def snapshot_dtype(dims: int = 3):
+    """NumPy record type of one drone: little-endian int64 ``id`` then float64 coordinates."""
+    import numpy as np
+
+    if dims not in (2, 3):
+        raise ValueError("dims must be 2 or 3")
+    return np.dtype([("id", "<i8")] + [(name, "<f8") for name in _FIELDS[:dims]])
+
+
+def read_snapshot_header(path):
+    """``(dims, point_count)`` of a snapshot file; raises ``ValueError`` if it is not one."""
+    with open(path, "rb") as handle:
+        header = handle.read(_HEADER_SIZE)
+    if len(header) < _HEADER_SIZE:
+        raise ValueError(f"{path}: not a drone snapshot")
+    magic, version, dims, point_count = _HEADER.unpack_from(header)
+    if magic != _MAGIC:
+        raise ValueError(f"{path}: not a drone snapshot")
+    if version != _VERSION:
+        raise ValueError(f"{path}: unsupported snapshot version {version}")
+    expected = _HEADER_SIZE + point_count * snapshot_dtype(dims).itemsize
+    if os.path.getsize(path) < expected:
+        raise ValueError(f"{path}: truncated snapshot, expected {expected} bytes")
+    return dims, point_count
+
+
+class SnapshotWriter:
+    """Appends drones to a snapshot file chunk by chunk; the header count is written on ``close``.
+
+    ``write(ids, coordinates)`` takes one chunk as arrays, ``write_points``
+    a list of tuples or a ``PointStore``. Use as a context manager.
+    """
+
+    def __init__(self, path, dims: int = 3):
+        self.path = path
+        self.dims = dims
+        self.point_count = 0
+        self._dtype = snapshot_dtype(dims)
+        self._file = open(path, "wb")
+        self._write_header()
+
+    def _write_header(self):
+        self._file.seek(0)
+        self._file.write(_HEADER.pack(_MAGIC, _VERSION, self.dims, self.point_count).ljust(_HEADER_SIZE, b"\0"))
+        self._file.seek(0, os.SEEK_END)
+
+    def write(self, ids, coordinates):
+        import numpy as np
+
+        coordinates = np.asarray(coordinates, dtype=np.float64).reshape(-1, self.dims)
+        records = np.empty(coordinates.shape[0], dtype=self._dtype)
+        records["id"] = ids
+        for axis, name in enumerate(_FIELDS[: self.dims]):
+            records[name] = coordinates[:, axis]
+        records.tofile(self._file)
+        self.point_count += records.size
+
+    def write_points(self, points):
+        self.write(*point_arrays(points, self.dims))
+
+    def close(self):
+        if not self._file.closed:
+            self._write_header()
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def write_snapshot(path, points, dims: int = 3):
+    """Write a list of tuples or a ``PointStore`` as one snapshot file."""
+    with SnapshotWriter(path, dims) as writer:
+        writer.write_points(points)
+
+
+def open_snapshot(path):
+    """The snapshot's records as a read-only ``np.memmap`` of ``snapshot_dtype(dims)``."""
+    import numpy as np
+
+    dims, point_count = read_snapshot_header(path)
+    if point_count == 0:
+        return np.empty(0, dtype=snapshot_dtype(dims))
+    return np.memmap(path, dtype=snapshot_dtype(dims), mode="r", offset=_HEADER_SIZE, shape=(point_count,))
+
+
+def load_snapshot(path) -> PointStore:
+    """A ``PointStore`` over the memory-mapped file, with nothing copied or read up front.
+
+    The id and coordinate arrays are strided views of the records, so pages
+    are read as the engines touch them and the file must outlive the store.
+    """
+    import numpy as np
+
+    records = open_snapshot(path)
+    dims = len(records.dtype.names) - 1
+    # Every field is 8 bytes wide, so the records also read as an (n, 1 + dims) float64 grid.
+    grid = records.view(np.float64).reshape(-1, 1 + dims)
+    return PointStore(records["id"], grid[:, 1:])
+
+
+def iter_snapshot(path, chunk_size: int = 1 << 20):
+    """The snapshot as consecutive ``PointStore`` views of at most ``chunk_size`` drones."""
+    store = load_snapshot(path)
+    for start in range(0, len(store), chunk_size):
+        yield store[start : start + chunk_size]
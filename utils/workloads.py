@@ -0,0 +1,133 @@
+# Seeded, vectorized drone workloads beyond the uniform cube, and presets for benchmarks to sweep.
+# Every generator returns a PointStore with ids 0..n-1 in shuffled spatial order,
+# all points inside [0, bound] per axis.
+
+from src.common.point_store import PointStore
+
+
+def _store(rng, coordinates, bound):
+    import numpy as np
+
+    coordinates = np.clip(coordinates, 0.0, bound)[rng.permutation(coordinates.shape[0])]
+    return PointStore(np.arange(coordinates.shape[0], dtype=np.int64), coordinates)
+
+
+def _split_counts(rng, point_count, weights):
+    # point_count drawn across groups with the given weights, every point placed
+    import numpy as np
+
+    weights = np.asarray(weights, dtype=np.float64)
+    return rng.multinomial(point_count, weights / weights.sum())
+
+
+def uniform_cube(point_count, dims=3, bound=1000, seed=None):
+    """Uniform in the cube, the same drones as ``generate_drone_store``."""
+    from utils.data_generator import generate_drone_store
+
+    return generate_drone_store(point_count, dims, bound, seed)
+
+
+def gaussian_swarms(point_count, dims=3, bound=1000, seed=None, swarm_count=8, spread=0.01):
+    """Gaussian swarms around uniform centres, standard deviation ``spread * bound``."""
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    centres = rng.random((swarm_count, dims)) * bound
+    owner = np.repeat(np.arange(swarm_count), _split_counts(rng, point_count, np.ones(swarm_count)))
+    coordinates = centres[owner] + rng.normal(0.0, spread * bound, (point_count, dims))
+    return _store(rng, coordinates, bound)
+
+
+def lattice_formations(point_count, dims=3, bound=1000, seed=None, formation_count=4, spacing=1.0, jitter=0.0):
+    """Formations flying on square lattices ``spacing`` apart, so equal distances tie everywhere.
+
+    ``jitter`` adds uniform noise of that size per axis, for nearly tied ones.
+    """
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    counts = _split_counts(rng, point_count, np.ones(formation_count))
+    pieces = []
+    for count in counts.tolist():
+        side = max(1, int(np.ceil(count ** (1.0 / dims))))
+        cells = np.stack(np.unravel_index(np.arange(count), (side,) * dims), axis=1) * spacing
+        origin = rng.random(dims) * max(bound - side * spacing, 0.0)
+        pieces.append(origin + cells)
+    coordinates = np.concatenate(pieces) if pieces else np.empty((0, dims))
+    if jitter:
+        coordinates = coordinates + rng.uniform(-jitter, jitter, coordinates.shape)
+    return _store(rng, coordinates, bound)
+
+
+def corridor_traffic(point_count, dims=3, bound=1000, seed=None, corridor_count=6, width=0.005):
+    """Drones along straight corridors between random endpoints, ``width * bound`` across."""
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    starts = rng.random((corridor_count, dims)) * bound
+    ends = rng.random((corridor_count, dims)) * bound
+    owner = np.repeat(np.arange(corridor_count), _split_counts(rng, point_count, np.linalg.norm(ends - starts, axis=1)))
+    along = rng.random((point_count, 1))
+    coordinates = starts[owner] + along * (ends - starts)[owner]
+    coordinates += rng.normal(0.0, width * bound, (point_count, dims))
+    return _store(rng, coordinates, bound)
+
+
+def altitude_bands(point_count, dims=3, bound=1000, seed=None, band_count=5, thickness=0.001):
+    """Uniform positions with the last axis held to a few flight levels ``thickness * bound`` thick."""
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    coordinates = rng.random((point_count, dims)) * bound
+    levels = (np.arange(band_count) + 0.5) * bound / band_count
+    coordinates[:, -1] = levels[rng.integers(0, band_count, point_count)]
+    coordinates[:, -1] += rng.uniform(-0.5, 0.5, point_count) * thickness * bound
+    return _store(rng, coordinates, bound)
+
+
+def coincident_fleet(point_count, dims=3, bound=1000, seed=None, distinct_fraction=0.01):
+    """Drones drawn from a small pool of positions, so most share theirs exactly with others."""
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    pool = rng.random((max(1, int(point_count * distinct_fraction)), dims)) * bound
+    return _store(rng, pool[rng.integers(0, pool.shape[0], point_count)], bound)
+
+
+def heavy_tailed(point_count, dims=3, bound=1000, seed=None, cluster_count=16, alpha=1.2, scale=0.001):
+    """Clusters with Pareto sizes and Pareto radial spread, so density spans many orders of magnitude.
+
+    Smaller ``alpha`` means heavier tails: a few clusters take most drones
+    and each is packed far tighter at its core than at its edge.
+    """
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    centres = rng.random((cluster_count, dims)) * bound
+    owner = np.repeat(np.arange(cluster_count), _split_counts(rng, point_count, rng.pareto(alpha, cluster_count) + 1e-9))
+    directions = rng.normal(size=(point_count, dims))
+    directions /= np.maximum(np.linalg.norm(directions, axis=1, keepdims=True), 1e-300)
+    radii = rng.pareto(alpha, (point_count, 1)) * scale * bound
+    return _store(rng, centres[owner] + directions * radii, bound)
+
+
+# name -> (generator, keyword arguments); every preset also takes point_count, dims, bound and seed
+WORKLOAD_PRESETS = {
+    "uniform": (uniform_cube, {}),
+    "swarms": (gaussian_swarms, {}),
+    "tight_swarms": (gaussian_swarms, {"swarm_count": 3, "spread": 0.001}),
+    "formations": (lattice_formations, {}),
+    "formations_jitter": (lattice_formations, {"jitter": 1e-6}),
+    "corridors": (corridor_traffic, {}),
+    "altitude_bands": (altitude_bands, {}),
+    "duplicates": (coincident_fleet, {}),
+    "heavy_tail": (heavy_tailed, {}),
+}
+
+
+def generate_workload(name, point_count, dims=3, bound=1000, seed=None, **overrides):
+    """The preset ``name`` as a ``PointStore``; ``overrides`` replace its keyword arguments."""
+    if name not in WORKLOAD_PRESETS:
+        raise ValueError("workload must be one of: " + ", ".join(WORKLOAD_PRESETS))
+    generator, params = WORKLOAD_PRESETS[name]
+    return generator(point_count, dims, bound, seed, **{**params, **overrides})